@@ -0,0 +1,124 @@
+"""Benchmark corpus: source snippets with recorded model responses.
+
+Sizes are small (a function), medium (a few hundred lines) and huge (a
+few thousand lines), generated from templates so the corpus needs no data
+files. Each entry carries the response a model returned for it, which the
+stub AI client replays.
+"""
+
+from typing import Dict, List
+
+PYTHON_FUNCTION = '''
+def process_orders_{i}(orders, discount={d}):
+    """Total the open orders, applying a discount to large ones."""
+    total = 0
+    for order in orders:
+        if order.get("status") != "open":
+            continue
+        amount = order["quantity"] * order["price"]
+        if amount > 100:
+            amount = amount * (1 - discount)
+        total += amount
+    return round(total, 2)
+'''
+
+PYTHON_CLASS = '''
+class Inventory{i}:
+    def __init__(self):
+        self.items = {{}}
+
+    def add(self, name, count=1):
+        self.items[name] = self.items.get(name, 0) + count
+        return self.items[name]
+
+    def remove(self, name, count=1):
+        if self.items.get(name, 0) < count:
+            raise ValueError("not enough " + name)
+        self.items[name] -= count
+        return self.items[name]
+'''
+
+JAVASCRIPT_FUNCTION = '''
+function processOrders{i}(orders, discount = {d}) {{
+  let total = 0;
+  for (const order of orders) {{
+    if (order.status !== "open") {{
+      continue;
+    }}
+    let amount = order.quantity * order.price;
+    if (amount > 100) {{
+      amount = amount * (1 - discount);
+    }}
+    total += amount;
+  }}
+  return Math.round(total * 100) / 100;
+}}
+'''
+
+JAVASCRIPT_CLASS = '''
+class Inventory{i} {{
+  constructor() {{
+    this.items = {{}};
+  }}
+
+  add(name, count = 1) {{
+    this.items[name] = (this.items[name] || 0) + count;
+    return this.items[name];
+  }}
+
+  remove(name, count = 1) {{
+    if ((this.items[name] || 0) < count) {{
+      throw new Error("not enough " + name);
+    }}
+    this.items[name] -= count;
+    return this.items[name];
+  }}
+}}
+'''
+
+# Units per size class; each unit is one function plus one class
+SIZES = {
+    "small": 1,
+    "medium": 12,
+    "huge": 150
+}
+
+def _render(function_template: str, class_template: str, units: int) -> str:
+    parts = []
+    for i in range(units):
+        discount = f"0.{(i % 9) + 1}"
+        parts.append(function_template.format(i=i, d=discount))
+        parts.append(class_template.format(i=i))
+    return "".join(parts).strip() + "\n"
+
+def _model_reply(code: str, language: str) -> str:
+    # Models usually wrap code in a fenced block, which post-processing strips
+    return f"```{language}\n{code}```"
+
+def build_corpus(sizes: List[str] = None) -> List[Dict]:
+    """Conversion requests in both directions for each size class"""
+
+    corpus = []
+    for size in sizes or list(SIZES):
+        units = SIZES[size]
+        python_code = _render(PYTHON_FUNCTION, PYTHON_CLASS, units)
+        javascript_code = _render(JAVASCRIPT_FUNCTION, JAVASCRIPT_CLASS, units)
+
+        corpus.append({
+            "name": f"{size}-python-to-javascript",
+            "size": size,
+            "source_code": python_code,
+            "source_language": "python",
+            "target_language": "javascript",
+            "response": _model_reply(javascript_code, "javascript")
+        })
+        corpus.append({
+            "name": f"{size}-javascript-to-python",
+            "size": size,
+            "source_code": javascript_code,
+            # Exercise language detection on one direction
+            "source_language": "auto",
+            "target_language": "python",
+            "response": _model_reply(python_code, "python")
+        })
+    return corpus
@@ -0,0 +1,403 @@
+"""Benchmark and profile the code conversion pipeline.
+
+Mounts the conversion router on a bare FastAPI app (no database, Redis or
+auth), swaps AIClient for StubAIClient and sends the corpus through
+/convert and /batch-convert in-process. Every pipeline stage is timed, so
+the report separates time spent in our code from (simulated) model time.
+With --allocations a sequential pass runs under tracemalloc and records
+per-stage peak memory. With --verify-execution every conversion also runs
+the execution equivalence check against an in-process stub backend.
+
+Usage (from services/ai-service):
+
+    python -m benchmarks.run_benchmark --concurrency 1,4,16 --iterations 5 \
+        --model-latency 0.5 --output conversion-bench.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI
+
+from .corpus import SIZES, build_corpus
+from .stub_ai_client import StubAIClient
+
+BENCH_USER = {"user_id": "benchmark-user", "email": "bench@example.com"}
+
+# Conversion options sent with every request
+REQUEST_OPTIONS: Dict = {}
+
+# Stage currently running in this task, used to tell the two analyses apart
+_current_stage: contextvars.ContextVar = contextvars.ContextVar("current_stage", default=None)
+
+class StageRecorder:
+    """Collects wall time and, while tracemalloc runs, peak memory per pipeline stage"""
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {}
+        self.peaks: Dict[str, List[int]] = {}
+        # Highest traced memory seen in nested stages, one slot per open stage.
+        # Only meaningful when stages don't interleave (the sequential allocation pass).
+        self._peak_stack: List[int] = []
+
+    def reset(self):
+        self.timings = {}
+        self.peaks = {}
+        self._peak_stack = []
+
+    def record(self, stage: str, elapsed: float, peak: Optional[int]):
+        self.timings.setdefault(stage, []).append(elapsed)
+        if peak is not None:
+            self.peaks.setdefault(stage, []).append(peak)
+
+    def wrap(self, stage, func):
+        """Time `func`; `stage` may be a callable picking the name from the enclosing stage"""
+
+        def start():
+            name = stage(_current_stage.get()) if callable(stage) else stage
+            token = _current_stage.set(name)
+            base = None
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                # reset_peak below would hide the enclosing stage's peak so far
+                if self._peak_stack:
+                    self._peak_stack[-1] = max(self._peak_stack[-1], peak)
+                tracemalloc.reset_peak()
+                base = current
+                self._peak_stack.append(0)
+            return name, token, base, time.perf_counter()
+
+        def finish(name, token, base, began):
+            elapsed = time.perf_counter() - began
+            peak = None
+            if base is not None and self._peak_stack:
+                absolute = max(tracemalloc.get_traced_memory()[1], self._peak_stack.pop())
+                if self._peak_stack:
+                    self._peak_stack[-1] = max(self._peak_stack[-1], absolute)
+                peak = absolute - base
+            _current_stage.reset(token)
+            self.record(name, elapsed, peak)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                state = start()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    finish(*state)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            state = start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish(*state)
+        return wrapper
+
+    def summary(self) -> Dict[str, Dict]:
+        stages = {}
+        for stage, values in self.timings.items():
+            stages[stage] = {
+                "calls": len(values),
+                "total_ms": round(sum(values) * 1000, 2),
+                "mean_ms": round(statistics.fmean(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3)
+            }
+            if stage in self.peaks:
+                peaks = self.peaks[stage]
+                stages[stage]["peak_alloc_kb_mean"] = round(statistics.fmean(peaks) / 1024, 1)
+                stages[stage]["peak_alloc_kb_max"] = round(max(peaks) / 1024, 1)
+        return stages
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def instrument(code_conversion, recorder: StageRecorder, stub: StubAIClient):
+    """Patch the conversion module so every stage reports to `recorder`"""
+
+    from src.services.analysis_cache import AnalysisService
+    from src.services.equivalence_checker import EquivalenceChecker
+    from src.services.fast_language_detector import FastLanguageDetector
+
+    converter = code_conversion.CodeConverter
+    converter.convert_code = recorder.wrap("total", converter.convert_code)
+    converter._build_conversion_prompt = recorder.wrap("prompt", converter._build_conversion_prompt)
+    converter._post_process_conversion = recorder.wrap("post_process", converter._post_process_conversion)
+    converter._validate_syntax = recorder.wrap("syntax_validation", converter._validate_syntax)
+    # Includes the analysis of the converted code, also reported as analysis_target
+    converter._check_logic_preservation = recorder.wrap("logic_check", converter._check_logic_preservation)
+    converter._save_conversion_history = recorder.wrap("history", converter._save_conversion_history)
+
+    AnalysisService.analyze_code = recorder.wrap(
+        lambda parent: "analysis_target" if parent == "logic_check" else "analysis",
+        AnalysisService.analyze_code
+    )
+    FastLanguageDetector.detect_language = recorder.wrap("detection", FastLanguageDetector.detect_language)
+    EquivalenceChecker.check = recorder.wrap("equivalence", EquivalenceChecker.check)
+
+    stub.generate_code = recorder.wrap("model", stub.generate_code)
+    code_conversion.AIClient = lambda: stub
+
+def install_stub_execution():
+    """Route equivalence checks to a stub backend whose runs all print the input's length"""
+
+    from src.services.equivalence_checker import (
+        EquivalenceChecker, StubExecutionBackend, set_equivalence_checker
+    )
+
+    backend = StubExecutionBackend(lambda code, language, input_data: f"{len(input_data or '')}\n")
+    set_equivalence_checker(EquivalenceChecker(backend))
+    REQUEST_OPTIONS["verify_execution"] = True
+    return backend
+
+def build_app(code_conversion) -> FastAPI:
+    app = FastAPI()
+    app.include_router(code_conversion.router, prefix="/api/v1/conversion")
+    app.dependency_overrides[code_conversion.get_current_user] = lambda: BENCH_USER
+    return app
+
+def clear_caches():
+    """Drop memoized analysis so every request pays for it"""
+
+    from src.services.analysis_cache import get_analysis_service
+    get_analysis_service().clear()
+
+async def _run_workers(concurrency: int, requests: List, send) -> Dict:
+    latencies: List[float] = []
+    errors: List[str] = []
+    queue = iter(requests)
+
+    async def worker():
+        for request in queue:
+            start = time.perf_counter()
+            try:
+                await send(request)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "elapsed": time.perf_counter() - wall_start,
+        "cpu": time.process_time() - cpu_start
+    }
+
+def _request_body(entry: Dict) -> Dict:
+    return {
+        "source_code": entry["source_code"],
+        "source_language": entry["source_language"],
+        "target_language": entry["target_language"],
+        "options": dict(REQUEST_OPTIONS)
+    }
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    recorder: StageRecorder,
+    stub: StubAIClient,
+    endpoint: str,
+    corpus: List[Dict],
+    size: str,
+    concurrency: int,
+    iterations: int,
+    cold: bool
+) -> Dict:
+    entries = [entry for entry in corpus if entry["size"] == size]
+
+    if endpoint == "convert":
+        requests = [_request_body(entry) for entry in entries] * iterations
+        conversions_per_request = 1
+
+        async def send(body):
+            if cold:
+                clear_caches()
+            response = await client.post("/api/v1/conversion/convert", json=body)
+            response.raise_for_status()
+    else:
+        batch = [_request_body(entry) for entry in entries]
+        requests = [batch] * iterations
+        conversions_per_request = len(batch)
+
+        async def send(body):
+            if cold:
+                clear_caches()
+            response = await client.post("/api/v1/conversion/batch-convert", json=body)
+            response.raise_for_status()
+            if response.json()["failed"]:
+                raise RuntimeError(f"{response.json()['failed']} conversions in the batch failed")
+
+    recorder.reset()
+    stub.model_time = 0.0
+    outcome = await _run_workers(concurrency, requests, send)
+    latencies = outcome["latencies"]
+    stages = recorder.summary()
+
+    conversions = len(latencies) * conversions_per_request
+    total_ms = stages.get("total", {}).get("total_ms", 0.0)
+    model_ms = stages.get("model", {}).get("total_ms", 0.0)
+    cpu_ms = outcome["cpu"] * 1000
+
+    return {
+        "endpoint": endpoint,
+        "size": size,
+        "concurrency": concurrency,
+        "requests": len(requests),
+        "succeeded": len(latencies),
+        "errors": len(outcome["errors"]),
+        "error_samples": sorted(set(outcome["errors"]))[:5],
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "throughput_conversions_per_s": round(conversions / outcome["elapsed"], 2) if outcome["elapsed"] else 0.0,
+        # CPU spent in this process; conversions one worker could sustain if the model were free
+        "cpu_ms_per_conversion": round(cpu_ms / conversions, 3) if conversions else 0.0,
+        "max_conversions_per_s_per_worker": round(conversions * 1000 / cpu_ms, 1) if cpu_ms else 0.0,
+        "own_code_ms_per_conversion": round((total_ms - model_ms) / conversions, 3) if conversions else 0.0,
+        "model_ms_per_conversion": round(model_ms / conversions, 3) if conversions else 0.0,
+        "stages": stages
+    }
+
+async def profile_allocations(client: httpx.AsyncClient, recorder: StageRecorder, corpus: List[Dict]) -> Dict:
+    """One sequential pass per entry under tracemalloc; work done in the CPU pool is not traced"""
+
+    clear_caches()
+    recorder.reset()
+    tracemalloc.start()
+    try:
+        for entry in corpus:
+            response = await client.post("/api/v1/conversion/convert", json=_request_body(entry))
+            response.raise_for_status()
+    finally:
+        tracemalloc.stop()
+    return recorder.summary()
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+async def run_benchmarks(args) -> Dict:
+    # The history store opens its database on first use; keep it out of the tree
+    history_dir = tempfile.mkdtemp(prefix="conversion-bench-")
+    os.environ.setdefault("CONVERSION_HISTORY_DB", os.path.join(history_dir, "history.db"))
+
+    from src.routers import code_conversion
+    from src.services.conversion_history import close_history_store, get_history_store
+    from src.services.cpu_pool import get_cpu_pool, shutdown_cpu_pool
+
+    corpus = build_corpus(args.sizes)
+    if args.responses:
+        stub = StubAIClient.from_file(args.responses, latency=args.model_latency, jitter=args.model_jitter)
+    else:
+        stub = StubAIClient(corpus, latency=args.model_latency, jitter=args.model_jitter)
+
+    recorder = StageRecorder()
+    instrument(code_conversion, recorder, stub)
+    execution_backend = install_stub_execution() if args.verify_execution else None
+    app = build_app(code_conversion)
+
+    await get_history_store().start()
+    results = []
+    allocations = None
+
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            # Warm-up: start CPU pool workers and import lazily loaded parsers
+            for entry in corpus:
+                await client.post("/api/v1/conversion/convert", json=_request_body(entry))
+
+            for endpoint in args.endpoints:
+                for size in args.sizes:
+                    for concurrency in args.concurrency:
+                        result = await run_scenario(
+                            client, recorder, stub, endpoint, corpus, size,
+                            concurrency, args.iterations, args.cold
+                        )
+                        results.append(result)
+                        print(
+                            f"{endpoint:13} {size:6} c={concurrency:<3} "
+                            f"p50={result['p50_ms']:>9.2f}ms p99={result['p99_ms']:>9.2f}ms "
+                            f"{result['throughput_conversions_per_s']:>8.2f} conv/s "
+                            f"own={result['own_code_ms_per_conversion']:.2f}ms/conv "
+                            f"errors={result['errors']}",
+                            file=sys.stderr
+                        )
+
+            if args.allocations:
+                allocations = await profile_allocations(client, recorder, corpus)
+    finally:
+        await close_history_store()
+        cpu_pool_stats = get_cpu_pool().get_stats()
+        shutdown_cpu_pool()
+
+    return {
+        "service": "ai-service",
+        "pipeline": "code-conversion",
+        "revision": _git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "model_latency_s": args.model_latency,
+        "cold_caches": args.cold,
+        "stub_execution_runs": len(execution_backend.calls) if execution_backend else None,
+        "corpus": [
+            {"name": entry["name"], "bytes": len(entry["source_code"])} for entry in corpus
+        ],
+        "results": results,
+        "allocations": allocations,
+        "cpu_pool": cpu_pool_stats
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16",
+                        type=lambda value: [int(item) for item in value.split(",")])
+    parser.add_argument("--iterations", type=int, default=5, help="Passes over the corpus per scenario")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        type=lambda value: value.split(","))
+    parser.add_argument("--endpoints", default="convert,batch-convert",
+                        type=lambda value: value.split(","))
+    parser.add_argument("--model-latency", type=float, default=0.0, help="Simulated model time in seconds")
+    parser.add_argument("--model-jitter", type=float, default=0.0)
+    parser.add_argument("--responses", help="JSON list of recorded {source_code, response} pairs")
+    parser.add_argument("--cold", action="store_true", help="Clear the analysis cache before each request")
+    parser.add_argument("--allocations", action="store_true", help="Add a tracemalloc pass with per-stage peaks")
+    parser.add_argument("--verify-execution", action="store_true",
+                        help="Run the equivalence check on every conversion, against a stub execution backend")
+    parser.add_argument("--output", default="conversion-bench.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Drop-in replacement for services.ai_client.AIClient that replays recorded responses."""
+
+import asyncio
+import json
+import random
+from typing import Dict, List, Optional
+
+class StubAIClient:
+    """Returns the recorded response whose source code appears in the prompt.
+
+    `latency` is the simulated model time in seconds, with +/- `jitter`
+    applied uniformly. The delay is an asyncio sleep, like waiting on a
+    real provider, so it never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        recordings: List[Dict],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        default_response: str = "// no recorded response\n"
+    ):
+        # Longest sources first so a snippet contained in a bigger one doesn't shadow it
+        self.recordings = sorted(recordings, key=lambda item: len(item["source_code"]), reverse=True)
+        self.latency = latency
+        self.jitter = jitter
+        self.default_response = default_response
+        self.calls = 0
+        self.model_time = 0.0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "StubAIClient":
+        """Load recordings saved as a JSON list of {source_code, response}"""
+
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def _lookup(self, prompt: str) -> str:
+        for recording in self.recordings:
+            if recording["source_code"] in prompt:
+                return recording["response"]
+        return self.default_response
+
+    async def generate_code(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.1,
+        **kwargs
+    ) -> str:
+        self.calls += 1
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        self.model_time += delay
+        return self._lookup(prompt)
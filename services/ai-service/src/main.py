@@ -4,6 +4,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import uvicorn
 import asyncio
 import logging
+from typing import Optional
 from contextlib import asynccontextmanager
 
 from .routers import code_analysis, code_conversion, code_generation, chat, optimization
@@ -12,23 +13,41 @@ from .core.database import init_db
 from .core.redis_client import init_redis
 from .middleware.auth import verify_token
 from .middleware.rate_limit import RateLimitMiddleware
+from .middleware.token_budget import enforce_token_budget
+from .services.cpu_pool import shutdown_cpu_pool
+from .services.equivalence_checker import close_equivalence_checker
+from .services.conversion_history import get_history_store, close_history_store
+from .services.conversion_jobs import get_job_manager, stop_job_manager
+from .services.tracing import TracingMiddleware, configure_tracer, get_tracer
 from .utils.logger import setup_logger
 
 # Setup logging
 logger = setup_logger(__name__)
 
+# Sampling and export come from TRACE_SAMPLE_RATE / TRACE_EXPORTER / TRACE_FILE; set the same
+# TRACE_TRUST_TOKEN here and in the execution-service so it follows our sampling decisions
+configure_tracer("ai-service")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting AI Service...")
     await init_db()
     await init_redis()
+    await get_history_store().start()
+    await get_job_manager().start(code_conversion.run_conversion_job)
     logger.info("AI Service started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down AI Service...")
+    await stop_job_manager()
+    # Flush queued history writes before the process exits
+    await close_history_store()
+    shutdown_cpu_pool()
+    await close_equivalence_checker()
+    get_tracer().close()
 
 app = FastAPI(
     title="AI Code Assistant Service",
@@ -47,10 +66,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the editor read why a model call was refused and when to retry
+    expose_headers=[
+        "Retry-After", "X-TokenBudget-Limit", "X-TokenBudget-Remaining",
+        "X-TokenBudget-Reset", "X-TokenBudget-Cost"
+    ],
 )
 
 app.add_middleware(RateLimitMiddleware)
 
+# Outermost, so rate limiting, auth and budget checks are inside the request's trace
+app.add_middleware(TracingMiddleware)
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -60,40 +87,50 @@ async def health_check():
         "version": "1.0.0"
     }
 
-# Include routers
+@app.get("/api/v1/traces", dependencies=[Depends(verify_token)])
+async def get_traces(trace_id: Optional[str] = None, limit: int = 500):
+    """Recently sampled spans, optionally for one trace"""
+    
+    tracer = get_tracer()
+    return {
+        "spans": tracer.find(trace_id, min(limit, 5000)),
+        "stats": tracer.get_stats()
+    }
+
+# Include routers; their POSTs are charged to the authenticated user's token budget
 app.include_router(
     code_analysis.router,
     prefix="/api/v1/analysis",
     tags=["Code Analysis"],
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(enforce_token_budget)]
 )
 
 app.include_router(
     code_conversion.router,
     prefix="/api/v1/conversion",
     tags=["Code Conversion"],
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(enforce_token_budget)]
 )
 
 app.include_router(
     code_generation.router,
     prefix="/api/v1/generation",
     tags=["Code Generation"],
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(enforce_token_budget)]
 )
 
 app.include_router(
     chat.router,
     prefix="/api/v1/chat",
     tags=["AI Chat"],
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(enforce_token_budget)]
 )
 
 app.include_router(
     optimization.router,
     prefix="/api/v1/optimization",
     tags=["Code Optimization"],
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(enforce_token_budget)]
 )
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from .auth import get_current_user
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Prompt scaffolding (system prompt, analysis, instructions) added to every model call
+PROMPT_OVERHEAD_TOKENS = 300
+
+# Completion estimate, mirroring PromptBudget in services/prompt_templates.py
+COMPLETION_RATIO = 1.5
+MIN_COMPLETION_TOKENS = 256
+MAX_COMPLETION_TOKENS = 4000
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+class TokenBudget:
+    """Charge estimated model tokens against per-user token buckets.
+
+    Applied as the `enforce_token_budget` dependency of the model-backed
+    routers, so it runs after authentication and buckets are keyed by the
+    authenticated user id; rotating a token does not reset the budget, and
+    requests with bad tokens never reach it. Only POSTs not listed in
+    `exempt_paths` are charged. The cost is an estimate made from the
+    request body before the handler runs (prompt tokens plus the expected
+    completion, per item for batch bodies) and is not reconciled with the
+    usage the model reports. Charged responses carry X-TokenBudget-* headers
+    with the remaining budget; refusals are 429s with the same headers.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 200000,
+        refill_per_second: float = 200000 / 3600,
+        max_users: int = 100000,
+        exempt_paths: Iterable[str] = ()
+    ):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_users = max_users
+        self.exempt_paths = set(exempt_paths)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def is_charged(self, request: Request) -> bool:
+        return request.method == "POST" and request.url.path not in self.exempt_paths
+
+    async def enforce(self, request: Request, response: Response, user_id: str):
+        """Charge a request to its user, or raise a 429 when the budget is spent"""
+
+        if not self.is_charged(request):
+            return
+
+        cost = self.estimate_cost(await request.body())
+        allowed, remaining, reset_after = self._charge(user_id, cost)
+
+        budget_headers = {
+            "X-TokenBudget-Limit": str(self.capacity),
+            "X-TokenBudget-Remaining": str(int(remaining)),
+            "X-TokenBudget-Reset": str(math.ceil(reset_after)),
+            "X-TokenBudget-Cost": str(cost)
+        }
+
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "message": "Token budget exceeded",
+                    "estimated_tokens": cost,
+                    "remaining_tokens": int(remaining),
+                    "retry_after": math.ceil(reset_after)
+                },
+                headers={**budget_headers, "Retry-After": str(math.ceil(reset_after))}
+            )
+
+        response.headers.update(budget_headers)
+
+    @classmethod
+    def estimate_cost(cls, body: bytes) -> int:
+        """Estimate prompt plus completion tokens for a request body; a JSON list is one prompt per item"""
+
+        try:
+            items = json.loads(body) if body[:1] == b"[" else None
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            return sum(cls._estimate_prompt(len(json.dumps(item))) for item in items)
+        return cls._estimate_prompt(len(body))
+
+    @staticmethod
+    def _estimate_prompt(size: int) -> int:
+        # About four bytes of code per token
+        source_tokens = math.ceil(size / 4)
+        completion = int(source_tokens * COMPLETION_RATIO) + 128
+        completion = max(MIN_COMPLETION_TOKENS, min(completion, MAX_COMPLETION_TOKENS))
+        return PROMPT_OVERHEAD_TOKENS + source_tokens + completion
+
+    def _charge(self, user_key: str, cost: int) -> Tuple[bool, float, float]:
+        """Take `cost` tokens from a user's bucket; returns (allowed, remaining, seconds until refilled)"""
+
+        now = time.monotonic()
+        bucket = self._buckets.get(user_key)
+        if bucket is None:
+            bucket = TokenBucket(self.capacity, now)
+            self._buckets[user_key] = bucket
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_key)
+            bucket.tokens = min(
+                self.capacity,
+                bucket.tokens + (now - bucket.updated_at) * self.refill_per_second
+            )
+            bucket.updated_at = now
+
+        allowed = bucket.tokens >= cost
+        if allowed:
+            bucket.tokens -= cost
+
+        # Requests larger than the whole bucket can never pass; report a full refill
+        missing = (min(cost, self.capacity) - bucket.tokens) if not allowed else (self.capacity - bucket.tokens)
+        reset_after = max(0.0, missing) / self.refill_per_second
+        return allowed, bucket.tokens, reset_after
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"tracked_users": len(self._buckets)}
+
+_token_budget: Optional[TokenBudget] = None
+
+def get_token_budget() -> TokenBudget:
+    """Get the process-wide token budget"""
+
+    global _token_budget
+    if _token_budget is None:
+        _token_budget = TokenBudget()
+    return _token_budget
+
+async def enforce_token_budget(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    """Router dependency that charges model-backed requests to the authenticated user"""
+
+    await get_token_budget().enforce(request, response, current_user["user_id"])
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request
+from fastapi.encoders import jsonable_encoder
 from typing import List, Dict, Any, Optional
 import asyncio
 import json
@@ -6,8 +7,17 @@ from datetime import datetime
 
 from ..models.conversion import ConversionRequest, ConversionResponse, ConversionHistory
 from ..services.ai_client import AIClient
-from ..services.code_analyzer import CodeAnalyzer
-from ..services.language_detector import LanguageDetector
+from ..services.analysis_cache import get_analysis_service
+from ..services.cpu_pool import get_cpu_pool, format_python_code, CPUTaskRejected
+from ..services.syntax_validation import get_syntax_validators
+from ..services.equivalence_checker import get_equivalence_checker
+from ..services.prompt_templates import CONVERSION_TEMPLATES, get_generic_template, get_prompt_builder
+from ..services.fast_language_detector import get_language_detector
+from ..services.conversion_history import get_history_store
+from ..services.conversion_jobs import get_job_manager, JobRejected, JobStatus
+from ..services.adaptive_concurrency import get_model_limiter, ConcurrencyLimitExceeded
+from ..services.static_payload import CachedJSONPayload
+from ..services.tracing import get_tracer
 from ..core.database import get_db
 from ..middleware.auth import get_current_user
 from ..utils.logger import get_logger
@@ -15,53 +25,58 @@ from ..utils.logger import get_logger
 router = APIRouter()
 logger = get_logger(__name__)
 
+# Languages available for conversion
+SUPPORTED_LANGUAGES = {
+    "javascript": {"name": "JavaScript", "extensions": [".js", ".mjs"]},
+    "typescript": {"name": "TypeScript", "extensions": [".ts"]},
+    "python": {"name": "Python", "extensions": [".py"]},
+    "java": {"name": "Java", "extensions": [".java"]},
+    "cpp": {"name": "C++", "extensions": [".cpp", ".cc", ".cxx"]},
+    "c": {"name": "C", "extensions": [".c"]},
+    "csharp": {"name": "C#", "extensions": [".cs"]},
+    "go": {"name": "Go", "extensions": [".go"]},
+    "rust": {"name": "Rust", "extensions": [".rs"]},
+    "php": {"name": "PHP", "extensions": [".php"]},
+    "ruby": {"name": "Ruby", "extensions": [".rb"]},
+    "swift": {"name": "Swift", "extensions": [".swift"]},
+    "kotlin": {"name": "Kotlin", "extensions": [".kt"]},
+    "scala": {"name": "Scala", "extensions": [".scala"]},
+    "r": {"name": "R", "extensions": [".r", ".R"]},
+    "matlab": {"name": "MATLAB", "extensions": [".m"]},
+    "sql": {"name": "SQL", "extensions": [".sql"]},
+    "html": {"name": "HTML", "extensions": [".html", ".htm"]},
+    "css": {"name": "CSS", "extensions": [".css"]}
+}
+
+def _build_supported_languages(languages: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "supported_languages": languages,
+        "total_count": len(languages)
+    }
+
+# Serialized once; call supported_languages_payload.invalidate() after changing SUPPORTED_LANGUAGES
+supported_languages_payload = CachedJSONPayload(_build_supported_languages)
+
+# Options that control validation rather than the conversion itself
+VALIDATION_OPTIONS = {"verify_execution", "test_inputs"}
+# Options that only help detect the source language
+DETECTION_OPTIONS = {"filename"}
+
 class CodeConverter:
     def __init__(self):
         self.ai_client = AIClient()
-        self.code_analyzer = CodeAnalyzer()
-        self.language_detector = LanguageDetector()
-        
+        # Shared, memoized analysis so repeated inputs are analyzed once
+        self.code_analyzer = get_analysis_service()
+        self.language_detector = get_language_detector()
+        self.cpu_pool = get_cpu_pool()
+        self.syntax_validators = get_syntax_validators()
+        self.prompt_builder = get_prompt_builder()
+        self.history_store = get_history_store()
+        self.model_limiter = get_model_limiter()
+        self.tracer = get_tracer()
+
         # Language-specific conversion templates
-        self.conversion_templates = {
-            "javascript_to_python": {
-                "system_prompt": """You are an expert code converter. Convert JavaScript code to Python while maintaining:
-1. Exact functionality and logic
-2. Proper Python conventions (snake_case, PEP 8)
-3. Appropriate Python libraries and patterns
-4. Error handling and edge cases
-5. Comments explaining complex conversions
-
-Provide clean, production-ready Python code.""",
-                "examples": [
-                    {
-                        "input": "function fibonacci(n) { return n <= 1 ? n : fibonacci(n-1) + fibonacci(n-2); }",
-                        "output": "def fibonacci(n):\n    return n if n <= 1 else fibonacci(n-1) + fibonacci(n-2)"
-                    }
-                ]
-            },
-            "python_to_javascript": {
-                "system_prompt": """Convert Python code to JavaScript while maintaining:
-1. Exact functionality and logic
-2. Modern JavaScript conventions (camelCase, ES6+)
-3. Appropriate JavaScript patterns and libraries
-4. Proper error handling
-5. Comments for complex conversions
-
-Provide clean, modern JavaScript code.""",
-                "examples": []
-            },
-            "java_to_cpp": {
-                "system_prompt": """Convert Java code to C++ while maintaining:
-1. Exact functionality and logic
-2. Proper C++ conventions and best practices
-3. Memory management considerations
-4. STL usage where appropriate
-5. Header file organization
-
-Provide clean, efficient C++ code.""",
-                "examples": []
-            }
-        }
+        self.conversion_templates = CONVERSION_TEMPLATES
 
     async def convert_code(
         self,
@@ -75,8 +90,15 @@ Provide clean, efficient C++ code.""",
         
         try:
             # Detect source language if not provided
+            detected = None
             if source_language == "auto":
-                detected = await self.language_detector.detect_language(source_code)
+                with self.tracer.span("conversion.detect") as span:
+                    detected = await self.language_detector.detect_language(
+                        source_code,
+                        filename=(options or {}).get("filename")
+                    )
+                    if span is not None:
+                        span.set(language=detected.language, method=detected.method)
                 source_language = detected.language
                 confidence = detected.confidence
             else:
@@ -96,46 +118,59 @@ Provide clean, efficient C++ code.""",
                 )
 
             # Analyze source code
-            analysis = await self.code_analyzer.analyze_code(source_code, source_language)
+            with self.tracer.span("conversion.analyze", language=source_language, code_bytes=len(source_code)):
+                analysis = await self.code_analyzer.analyze_code(source_code, source_language)
             
-            # Get conversion template
             template_key = f"{source_language}_to_{target_language}"
-            template = self.conversion_templates.get(
-                template_key,
-                self._get_generic_template(source_language, target_language)
-            )
 
             # Prepare conversion prompt
             prompt = self._build_conversion_prompt(
                 source_code,
                 source_language,
                 target_language,
-                template,
                 analysis,
                 options or {}
             )
 
-            # Perform conversion using AI
-            converted_code = await self.ai_client.generate_code(
-                prompt=prompt,
-                max_tokens=4000,
-                temperature=0.1  # Low temperature for consistent conversions
-            )
+            # Perform conversion using AI, within the adaptive provider concurrency limit
+            try:
+                with self.tracer.span(
+                    "conversion.model_call",
+                    prompt_tokens=prompt["prompt_tokens"],
+                    max_tokens=prompt["max_tokens"]
+                ):
+                    converted_code = await self.model_limiter.call(
+                        lambda: self.ai_client.generate_code(
+                            prompt=prompt["prompt"],
+                            max_tokens=prompt["max_tokens"],
+                            temperature=0.1  # Low temperature for consistent conversions
+                        )
+                    )
+            except ConcurrencyLimitExceeded as e:
+                raise HTTPException(
+                    status_code=503,
+                    detail=str(e),
+                    headers={"Retry-After": "5"}
+                )
 
             # Post-process converted code
-            processed_code = await self._post_process_conversion(
-                converted_code,
-                target_language,
-                options or {}
-            )
+            with self.tracer.span("conversion.post_process", language=target_language):
+                processed_code = await self._post_process_conversion(
+                    converted_code,
+                    target_language,
+                    options or {}
+                )
 
             # Validate converted code
-            validation_result = await self._validate_conversion(
-                source_code,
-                processed_code,
-                source_language,
-                target_language
-            )
+            with self.tracer.span("conversion.validate", language=target_language):
+                validation_result = await self._validate_conversion(
+                    source_code,
+                    processed_code,
+                    source_language,
+                    target_language,
+                    source_analysis=analysis,
+                    options=options or {}
+                )
 
             # Create response
             response = ConversionResponse(
@@ -148,21 +183,24 @@ Provide clean, efficient C++ code.""",
                 metadata={
                     "conversion_time": datetime.utcnow().isoformat(),
                     "template_used": template_key,
+                    "detection_method": detected.method if detected else None,
+                    "prompt_tokens": prompt["prompt_tokens"],
+                    "max_tokens": prompt["max_tokens"],
                     "options": options or {}
                 }
             )
 
-            # Save to history (background task)
-            asyncio.create_task(
-                self._save_conversion_history(
-                    user_id,
-                    source_code,
-                    response
-                )
+            # Save to history (queued, written in batches by the history store)
+            self._save_conversion_history(
+                user_id,
+                source_code,
+                response
             )
 
             return response
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Code conversion failed: {str(e)}")
             raise HTTPException(
@@ -172,83 +210,33 @@ Provide clean, efficient C++ code.""",
 
     def _is_supported_language(self, language: str) -> bool:
         """Check if language is supported for conversion"""
-        supported_languages = {
-            "javascript", "python", "java", "cpp", "c", "csharp",
-            "go", "rust", "typescript", "php", "ruby", "swift",
-            "kotlin", "scala", "r", "matlab", "sql", "html", "css"
-        }
-        return language.lower() in supported_languages
+        return language.lower() in SUPPORTED_LANGUAGES
 
     def _get_generic_template(self, source_lang: str, target_lang: str) -> Dict[str, Any]:
         """Get generic conversion template for unsupported language pairs"""
-        return {
-            "system_prompt": f"""You are an expert programmer. Convert {source_lang} code to {target_lang} while:
-1. Maintaining exact functionality and logic
-2. Following {target_lang} best practices and conventions
-3. Using appropriate libraries and patterns for {target_lang}
-4. Handling errors and edge cases properly
-5. Adding comments for complex conversions
-
-Provide clean, production-ready {target_lang} code.""",
-            "examples": []
-        }
+        return get_generic_template(source_lang, target_lang)
 
     def _build_conversion_prompt(
         self,
         source_code: str,
         source_lang: str,
         target_lang: str,
-        template: Dict[str, Any],
         analysis: Dict[str, Any],
         options: Dict[str, Any]
-    ) -> str:
-        """Build the conversion prompt for AI"""
-        
-        prompt_parts = [
-            template["system_prompt"],
-            "",
-            f"Source Language: {source_lang}",
-            f"Target Language: {target_lang}",
-            "",
-            "Code Analysis:",
-            f"- Complexity: {analysis.get('complexity', 'Unknown')}",
-            f"- Functions: {len(analysis.get('functions', []))}",
-            f"- Classes: {len(analysis.get('classes', []))}",
-            f"- Dependencies: {', '.join(analysis.get('dependencies', []))}",
-            ""
-        ]
-
-        # Add examples if available
-        if template.get("examples"):
-            prompt_parts.append("Examples:")
-            for i, example in enumerate(template["examples"], 1):
-                prompt_parts.extend([
-                    f"Example {i}:",
-                    f"Input ({source_lang}):",
-                    example["input"],
-                    f"Output ({target_lang}):",
-                    example["output"],
-                    ""
-                ])
-
-        # Add conversion options
-        if options:
-            prompt_parts.append("Conversion Options:")
-            for key, value in options.items():
-                prompt_parts.append(f"- {key}: {value}")
-            prompt_parts.append("")
-
-        # Add source code
-        prompt_parts.extend([
-            f"Convert the following {source_lang} code to {target_lang}:",
-            "```" + source_lang,
-            source_code,
-            "```",
-            "",
-            f"Provide only the converted {target_lang} code without explanations:"
-        ])
+    ) -> Dict[str, Any]:
+        """Build the conversion prompt for AI and size the completion"""
 
-        return "\n".join(prompt_parts)
+        prompt_options = {
+            key: value for key, value in options.items()
+            if key not in VALIDATION_OPTIONS and key not in DETECTION_OPTIONS
+        }
+        return self.prompt_builder.build(
+            source_code,
+            source_lang,
+            target_lang,
+            analysis,
+            prompt_options
+        )
 
     async def _post_process_conversion(
         self,
@@ -269,7 +257,7 @@ Provide clean, production-ready {target_lang} code.""",
 
         # Language-specific post-processing
         if target_language.lower() == "python":
-            converted_code = self._format_python_code(converted_code)
+            converted_code = await self._format_python_code(converted_code)
         elif target_language.lower() in ["javascript", "typescript"]:
             converted_code = self._format_javascript_code(converted_code)
         elif target_language.lower() in ["java"]:
@@ -277,12 +265,13 @@ Provide clean, production-ready {target_lang} code.""",
 
         return converted_code.strip()
 
-    def _format_python_code(self, code: str) -> str:
+    async def _format_python_code(self, code: str) -> str:
         """Format Python code according to PEP 8"""
         try:
-            import autopep8
-            return autopep8.fix_code(code)
-        except ImportError:
+            return await self.cpu_pool.run(format_python_code, code)
+        except CPUTaskRejected as e:
+            # Unformatted output is still usable
+            logger.warning(f"Skipping Python formatting: {str(e)}")
             return code
 
     def _format_javascript_code(self, code: str) -> str:
@@ -300,7 +289,9 @@ Provide clean, production-ready {target_lang} code.""",
         source_code: str,
         converted_code: str,
         source_language: str,
-        target_language: str
+        target_language: str,
+        source_analysis: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Validate the converted code"""
         
@@ -313,16 +304,47 @@ Provide clean, production-ready {target_lang} code.""",
 
         try:
             # Syntax validation
-            syntax_valid = await self._validate_syntax(converted_code, target_language)
-            validation_result["syntax_valid"] = syntax_valid
-
-            if not syntax_valid:
-                validation_result["warnings"].append("Syntax validation failed")
+            syntax = await self._validate_syntax(converted_code, target_language)
+            validation_result["syntax_checked"] = syntax["checked"]
+            validation_result["syntax_errors"] = syntax["errors"]
+
+            if syntax["checked"]:
+                validation_result["syntax_valid"] = syntax["valid"]
+                if not syntax["valid"]:
+                    validation_result["warnings"].append("Syntax validation failed")
+            else:
+                # No parser for this language; report neither success nor a failure we didn't observe
+                validation_result["syntax_valid"] = None
+                validation_result["warnings"].append(
+                    f"Syntax was not checked for {target_language}"
+                )
 
             # Logic preservation check (simplified)
             logic_score = await self._check_logic_preservation(
-                source_code, converted_code, source_language, target_language
+                source_code, converted_code, source_language, target_language,
+                source_analysis=source_analysis
             )
+
+            # Opt-in: run both programs and compare their behaviour
+            if (options or {}).get("verify_execution"):
+                equivalence = await get_equivalence_checker().check(
+                    source_code,
+                    converted_code,
+                    source_language,
+                    target_language,
+                    test_inputs=options.get("test_inputs")
+                )
+                validation_result["execution_equivalence"] = equivalence
+
+                if equivalence["checked"]:
+                    # Observed behaviour is a stronger signal than structure
+                    logic_score = equivalence["score"]
+                    if not equivalence["equivalent"]:
+                        validation_result["warnings"].append(
+                            f"Converted code differs on {equivalence['failed']} "
+                            f"of {equivalence['total']} test inputs"
+                        )
+
             validation_result["logic_preserved"] = logic_score > 0.8
             validation_result["logic_score"] = logic_score
 
@@ -335,27 +357,17 @@ Provide clean, production-ready {target_lang} code.""",
 
         return validation_result
 
-    async def _validate_syntax(self, code: str, language: str) -> bool:
+    async def _validate_syntax(self, code: str, language: str) -> Dict[str, Any]:
         """Validate syntax of converted code"""
-        try:
-            if language.lower() == "python":
-                import ast
-                ast.parse(code)
-                return True
-            elif language.lower() == "javascript":
-                # Use esprima or similar for JS validation
-                return True  # Simplified
-            else:
-                return True  # Simplified for other languages
-        except:
-            return False
+        return await self.syntax_validators.validate(code, language)
 
     async def _check_logic_preservation(
         self,
         source_code: str,
         converted_code: str,
         source_language: str,
-        target_language: str
+        target_language: str,
+        source_analysis: Optional[Dict[str, Any]] = None
     ) -> float:
         """Check if logic is preserved in conversion (simplified)"""
         
@@ -364,8 +376,11 @@ Provide clean, production-ready {target_lang} code.""",
         
         try:
             # Compare code structure and patterns
-            source_analysis = await self.code_analyzer.analyze_code(source_code, source_language)
+            if source_analysis is None:
+                source_analysis = await self.code_analyzer.analyze_code(source_code, source_language)
             target_analysis = await self.code_analyzer.analyze_code(converted_code, target_language)
+            if not source_analysis.get("available", True) or not target_analysis.get("available", True):
+                return 0.5  # Default score
             
             # Simple scoring based on function count and complexity
             source_functions = len(source_analysis.get("functions", []))
@@ -384,7 +399,7 @@ Provide clean, production-ready {target_lang} code.""",
             logger.error(f"Logic preservation check failed: {str(e)}")
             return 0.5  # Default score
 
-    async def _save_conversion_history(
+    def _save_conversion_history(
         self,
         user_id: str,
         source_code: str,
@@ -392,8 +407,15 @@ Provide clean, production-ready {target_lang} code.""",
     ):
         """Save conversion to history"""
         try:
-            # This would save to database in production
-            logger.info(f"Saving conversion history for user {user_id}")
+            self.history_store.record(
+                user_id,
+                source_code,
+                response.converted_code,
+                response.source_language,
+                response.target_language,
+                confidence=response.confidence,
+                metadata=response.metadata
+            )
         except Exception as e:
             logger.error(f"Failed to save conversion history: {str(e)}")
 
@@ -416,50 +438,39 @@ async def convert_code(
     )
 
 @router.get("/supported-languages")
-async def get_supported_languages():
+async def get_supported_languages(request: Request):
     """Get list of supported programming languages"""
     
-    languages = {
-        "javascript": {"name": "JavaScript", "extensions": [".js", ".mjs"]},
-        "typescript": {"name": "TypeScript", "extensions": [".ts"]},
-        "python": {"name": "Python", "extensions": [".py"]},
-        "java": {"name": "Java", "extensions": [".java"]},
-        "cpp": {"name": "C++", "extensions": [".cpp", ".cc", ".cxx"]},
-        "c": {"name": "C", "extensions": [".c"]},
-        "csharp": {"name": "C#", "extensions": [".cs"]},
-        "go": {"name": "Go", "extensions": [".go"]},
-        "rust": {"name": "Rust", "extensions": [".rs"]},
-        "php": {"name": "PHP", "extensions": [".php"]},
-        "ruby": {"name": "Ruby", "extensions": [".rb"]},
-        "swift": {"name": "Swift", "extensions": [".swift"]},
-        "kotlin": {"name": "Kotlin", "extensions": [".kt"]},
-        "scala": {"name": "Scala", "extensions": [".scala"]},
-        "r": {"name": "R", "extensions": [".r", ".R"]},
-        "matlab": {"name": "MATLAB", "extensions": [".m"]},
-        "sql": {"name": "SQL", "extensions": [".sql"]},
-        "html": {"name": "HTML", "extensions": [".html", ".htm"]},
-        "css": {"name": "CSS", "extensions": [".css"]}
-    }
-    
-    return {
-        "supported_languages": languages,
-        "total_count": len(languages)
-    }
+    return supported_languages_payload.response(request, SUPPORTED_LANGUAGES)
 
 @router.get("/conversion-history")
 async def get_conversion_history(
-    limit: int = 10,
-    offset: int = 0,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_code: bool = True,
+    include_total: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get user's conversion history"""
+    """Get user's conversion history, newest first.
+
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    `total` is only counted when `include_total` is set.
+    """
+    
+    try:
+        page = await get_history_store().list_conversions(
+            current_user["user_id"],
+            limit=limit,
+            cursor=cursor,
+            include_code=include_code,
+            include_total=include_total
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    # This would fetch from database in production
     return {
-        "conversions": [],
-        "total": 0,
-        "limit": limit,
-        "offset": offset
+        **page,
+        "limit": limit
     }
 
 @router.post("/batch-convert")
@@ -504,3 +515,106 @@ async def batch_convert_code(
         "successful": sum(1 for r in results if r["success"]),
         "failed": sum(1 for r in results if not r["success"])
     }
+
+async def run_conversion_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Conversion job handler used by the job manager's workers"""
+    
+    request = job["request"]
+    converter = CodeConverter()
+    
+    result = await converter.convert_code(
+        source_code=request["source_code"],
+        source_language=request["source_language"],
+        target_language=request["target_language"],
+        user_id=job["user_id"],
+        options=request.get("options")
+    )
+    
+    return jsonable_encoder(result)
+
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public representation of a job"""
+    
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
+
+async def _get_user_job(job_id: str, user_id: str) -> Dict[str, Any]:
+    job = await get_job_manager().get(job_id)
+    
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Conversion job not found")
+    
+    return job
+
+@router.post("/jobs", status_code=202)
+async def submit_conversion_job(
+    request: ConversionRequest,
+    priority: int = Query(5, ge=0, le=9),
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue a conversion and return a job id to poll (0 is the highest priority)"""
+    
+    try:
+        job = await get_job_manager().submit(
+            current_user["user_id"],
+            jsonable_encoder(request),
+            priority=priority
+        )
+    except JobRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"]
+    }
+
+@router.post("/jobs/batch", status_code=202)
+async def submit_conversion_jobs(
+    requests: List[ConversionRequest],
+    priority: int = Query(5, ge=0, le=9),
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue several conversions as separate jobs"""
+    
+    if len(requests) > 10:  # Limit batch size
+        raise HTTPException(
+            status_code=400,
+            detail="Batch size cannot exceed 10 conversions"
+        )
+    
+    jobs = []
+    for request in requests:
+        try:
+            job = await get_job_manager().submit(
+                current_user["user_id"],
+                jsonable_encoder(request),
+                priority=priority
+            )
+            jobs.append({"job_id": job["job_id"], "status": job["status"]})
+        except JobRejected as e:
+            jobs.append({"job_id": None, "status": JobStatus.FAILED, "error": str(e)})
+    
+    return {"jobs": jobs}
+
+@router.get("/jobs/{job_id}")
+async def get_conversion_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a conversion job; with `wait`, long-poll up to that many seconds for it to finish"""
+    
+    job = await _get_user_job(job_id, current_user["user_id"])
+    
+    if wait and job["status"] not in (JobStatus.COMPLETED, JobStatus.FAILED):
+        job = await get_job_manager().wait(job_id, wait) or job
+    
+    return _job_view(job)
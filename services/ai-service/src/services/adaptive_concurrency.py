@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when a call waits too long for a model slot"""
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on concurrent calls to the upstream AI provider.
+
+    Each successful call below `latency_target` grows the limit by
+    1/limit (about +1 per window of `limit` calls). A slow or failed call
+    multiplies it by `decrease_factor`, at most once per `cooldown` seconds
+    so that one burst of slow responses counts as a single congestion signal.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 20.0,
+        decrease_factor: float = 0.7,
+        cooldown: float = 5.0,
+        max_wait: float = 30.0
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+        self.stats = {
+            "increases": 0,
+            "decreases": 0,
+            "rejected": 0
+        }
+
+    async def acquire(self):
+        """Wait for a free slot under the current limit"""
+
+        async with self._condition:
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.in_flight < int(self.limit)),
+                    timeout=self.max_wait
+                )
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                raise ConcurrencyLimitExceeded(
+                    f"AI provider is saturated ({self.in_flight} calls in flight)"
+                )
+            self.in_flight += 1
+
+    async def release(self, latency: float, success: bool):
+        """Free a slot and adjust the limit from the call's outcome"""
+
+        async with self._condition:
+            self.in_flight -= 1
+
+            now = time.monotonic()
+            if not success or latency > self.latency_target:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.stats["decreases"] += 1
+                    logger.warning(
+                        f"AI provider slow or failing ({latency:.1f}s), "
+                        f"concurrency limit lowered to {int(self.limit)}"
+                    )
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.stats["increases"] += 1
+
+            self._condition.notify_all()
+
+    async def call(self, coro_factory):
+        """Run `coro_factory()` inside a slot and feed its outcome back"""
+
+        await self.acquire()
+        start = time.monotonic()
+        success = False
+        try:
+            result = await coro_factory()
+            success = True
+            return result
+        finally:
+            await self.release(time.monotonic() - start, success)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight
+        }
+
+_model_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+
+def get_model_limiter() -> AdaptiveConcurrencyLimiter:
+    """Get the process-wide limiter for AI provider calls"""
+
+    global _model_limiter
+    if _model_limiter is None:
+        _model_limiter = AdaptiveConcurrencyLimiter()
+    return _model_limiter
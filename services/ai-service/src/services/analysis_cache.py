@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .code_analyzer import CodeAnalyzer
+from . import cpu_pool
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def unavailable_analysis(reason: str) -> Dict[str, Any]:
+    """Stand-in result for code that could not be analyzed in time; never cached"""
+
+    return {
+        "available": False,
+        "reason": reason,
+        "complexity": "Unknown",
+        "functions": [],
+        "classes": [],
+        "dependencies": []
+    }
+
+class AnalysisService:
+    """Memoized front for CodeAnalyzer shared by the conversion, analysis and optimization routers.
+
+    Results are keyed by (sha256 of the code, language) and kept in a bounded LRU.
+    Concurrent requests for the same key share a single in-flight analysis.
+    Cached dictionaries are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        analyzer: Optional[CodeAnalyzer] = None,
+        max_entries: int = 1024,
+        offload_threshold: Optional[int] = 4096
+    ):
+        self.analyzer = analyzer or CodeAnalyzer()
+        self.max_entries = max_entries
+        # Inputs at least this large are analyzed in the CPU pool; None disables offloading
+        self.offload_threshold = offload_threshold
+        self._cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "unavailable": 0
+        }
+
+    @staticmethod
+    def make_key(code: str, language: str) -> Tuple[str, str]:
+        """Build the cache key for a piece of code"""
+        digest = hashlib.sha256(code.encode("utf-8", "surrogatepass")).hexdigest()
+        return digest, language.lower()
+
+    async def analyze_code(self, code: str, language: str) -> Dict[str, Any]:
+        """Analyze code, reusing a previous result for identical input"""
+
+        key = self.make_key(code, language)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return cached
+
+        # Another request is already analyzing this exact input
+        pending = self._in_flight.get(key)
+        while pending is not None:
+            self.stats["hits"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+            # The request that owned the analysis went away; join or start the next one
+            pending = self._in_flight.get(key)
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        try:
+            analysis = await self._run_analysis(code, language)
+            if analysis.get("available", True):
+                self._store(key, analysis)
+            future.set_result(analysis)
+            return analysis
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting on it
+            future.exception()
+            raise
+        finally:
+            # Cancellation skips the handlers above; don't leave waiters on a dead future
+            if not future.done():
+                future.cancel()
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    async def _run_analysis(self, code: str, language: str) -> Dict[str, Any]:
+        """Analyze inline for small inputs and in the CPU pool for large ones"""
+
+        if self.offload_threshold is not None and len(code) >= self.offload_threshold:
+            try:
+                return await cpu_pool.get_cpu_pool().run(cpu_pool.analyze_code, code, language)
+            except cpu_pool.CPUTaskTimeout as e:
+                # Retrying inline would block the event loop for even longer
+                logger.warning(f"Analysis of {len(code)} characters of {language} timed out: {str(e)}")
+                self.stats["unavailable"] += 1
+                return unavailable_analysis("Analysis timed out")
+            except cpu_pool.CPUTaskRejected as e:
+                logger.warning(f"Analysis offload failed, analyzing inline: {str(e)}")
+
+        return await self.analyzer.analyze_code(code, language)
+
+    def _store(self, key: Tuple[str, str], analysis: Dict[str, Any]):
+        """Insert a result and evict the least recently used entries"""
+
+        self._cache[key] = analysis
+        self._cache.move_to_end(key)
+
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, code: str, language: str):
+        """Drop the cached analysis for a piece of code"""
+        self._cache.pop(self.make_key(code, language), None)
+
+    def clear(self):
+        """Drop all cached analyses"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+
+        return {
+            **self.stats,
+            "entries": len(self._cache),
+            "max_entries": self.max_entries
+        }
+
+_analysis_service: Optional[AnalysisService] = None
+
+def get_analysis_service() -> AnalysisService:
+    """Get the process-wide analysis service"""
+
+    global _analysis_service
+    if _analysis_service is None:
+        _analysis_service = AnalysisService()
+    return _analysis_service
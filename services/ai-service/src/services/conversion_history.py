@@ -0,0 +1,322 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+from .tracing import run_in_executor
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS code_blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    source_language TEXT NOT NULL,
+    target_language TEXT NOT NULL,
+    source_hash TEXT NOT NULL REFERENCES code_blobs(hash),
+    output_hash TEXT NOT NULL REFERENCES code_blobs(hash),
+    confidence REAL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conversions_user_created
+    ON conversions (user_id, created_at DESC, id DESC);
+"""
+
+# Queue marker that tells the writer to stop
+_STOP = object()
+
+class ConversionHistoryStore:
+    """Conversion history in SQLite with a write-behind queue.
+
+    `record` only enqueues; a background task writes queued entries in
+    batches. Source and output code are zlib-compressed and stored once per
+    content hash. All SQLite access happens on one dedicated thread.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000
+    ):
+        self.db_path = db_path or os.getenv("CONVERSION_HISTORY_DB", "conversion_history.db")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversion-history")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0
+        }
+
+    async def _run(self, func, *args):
+        return await run_in_executor(self._executor, func, *args)
+
+    def _open(self):
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        self._connection = connection
+
+    async def start(self):
+        """Open the database and start the background writer"""
+
+        if self._connection is None:
+            await self._run(self._open)
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._writer())
+        logger.info(f"Conversion history store ready at {self.db_path}")
+
+    def record(
+        self,
+        user_id: str,
+        source_code: str,
+        converted_code: str,
+        source_language: str,
+        target_language: str,
+        confidence: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """Queue a conversion for persistence without waiting for the write"""
+
+        entry = (
+            user_id, time.time(), source_code, converted_code,
+            source_language, target_language, confidence, metadata or {}
+        )
+        try:
+            self._queue.put_nowait(entry)
+            self.stats["queued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning(f"Conversion history queue full, dropping entry for user {user_id}")
+
+    async def _writer(self):
+        """Drain the queue in batches until the stop marker is seen"""
+
+        while True:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+
+            batch = [entry]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            await self._write_batch(batch)
+            if stopping:
+                return
+
+    async def _write_batch(self, batch: List[Tuple]):
+        try:
+            await self._run(self._insert_batch, batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["dropped"] += len(batch)
+            logger.error(f"Failed to write {len(batch)} conversion history entries: {str(e)}")
+
+    @staticmethod
+    def _blob(code: str) -> Tuple[str, int, bytes]:
+        raw = code.encode("utf-8", "surrogatepass")
+        return hashlib.sha256(raw).hexdigest(), len(raw), zlib.compress(raw, 6)
+
+    def _insert_batch(self, batch: List[Tuple]):
+        blobs = {}
+        rows = []
+
+        for user_id, created_at, source, output, source_lang, target_lang, confidence, metadata in batch:
+            source_hash, source_size, source_data = self._blob(source)
+            output_hash, output_size, output_data = self._blob(output)
+            blobs[source_hash] = (source_hash, source_size, source_data)
+            blobs[output_hash] = (output_hash, output_size, output_data)
+            rows.append((
+                user_id, created_at, source_lang, target_lang,
+                source_hash, output_hash, confidence, json.dumps(metadata, default=str)
+            ))
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO code_blobs (hash, size, data) VALUES (?, ?, ?)",
+                list(blobs.values())
+            )
+            self._connection.executemany(
+                "INSERT INTO conversions (user_id, created_at, source_language, target_language, "
+                "source_hash, output_hash, confidence, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    @staticmethod
+    def encode_cursor(created_at: float, row_id: int) -> str:
+        return base64.urlsafe_b64encode(f"{created_at!r}:{row_id}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[float, int]:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(created_at), int(row_id)
+
+    def _select_page(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[Tuple[float, int]],
+        include_code: bool,
+        include_total: bool
+    ) -> Dict[str, Any]:
+        code_columns = (
+            ", (SELECT data FROM code_blobs WHERE hash = c.source_hash)"
+            ", (SELECT data FROM code_blobs WHERE hash = c.output_hash)"
+            if include_code else ""
+        )
+        query = (
+            "SELECT c.id, c.created_at, c.source_language, c.target_language, "
+            f"c.confidence, c.metadata{code_columns} FROM conversions c WHERE c.user_id = ?"
+        )
+        params: List[Any] = [user_id]
+        if cursor is not None:
+            query += " AND (c.created_at, c.id) < (?, ?)"
+            params.extend(cursor)
+        query += " ORDER BY c.created_at DESC, c.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._connection.execute(query, params).fetchall()
+        # Counting scans all of the user's rows, so it is only done on request
+        total = None
+        if include_total:
+            total = self._connection.execute(
+                "SELECT COUNT(*) FROM conversions WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+        conversions = []
+        for row in rows[:limit]:
+            item = {
+                "id": row[0],
+                "created_at": row[1],
+                "source_language": row[2],
+                "target_language": row[3],
+                "confidence": row[4],
+                "metadata": json.loads(row[5]) if row[5] else {}
+            }
+            if include_code:
+                item["source_code"] = zlib.decompress(row[6]).decode("utf-8", "surrogatepass")
+                item["converted_code"] = zlib.decompress(row[7]).decode("utf-8", "surrogatepass")
+            conversions.append(item)
+
+        has_more = len(rows) > limit
+        next_cursor = None
+        if has_more and conversions:
+            last = conversions[-1]
+            next_cursor = self.encode_cursor(last["created_at"], last["id"])
+
+        return {
+            "conversions": conversions,
+            "total": total,
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        }
+
+    async def list_conversions(
+        self,
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        include_code: bool = True,
+        include_total: bool = False
+    ) -> Dict[str, Any]:
+        """Get a page of a user's conversions, newest first; `total` is None unless requested"""
+
+        if self._connection is None:
+            await self.start()
+
+        decoded = self.decode_cursor(cursor) if cursor else None
+        return await self._run(self._select_page, user_id, limit, decoded, include_code, include_total)
+
+    async def flush(self):
+        """Write everything that is still queued"""
+
+        batch = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is _STOP:
+                continue
+            batch.append(entry)
+            if len(batch) >= self.batch_size:
+                await self._write_batch(batch)
+                batch = []
+        if batch:
+            await self._write_batch(batch)
+
+    async def close(self):
+        """Stop the writer, flush pending entries and close the database"""
+
+        if self._writer_task is not None:
+            # The writer finishes its current batch before it sees the marker
+            await self._queue.put(_STOP)
+            await self._writer_task
+            self._writer_task = None
+
+        # Entries recorded before start(), or after it failed, still need a database
+        if self._connection is None and not self._queue.empty():
+            try:
+                await self._run(self._open)
+            except Exception as e:
+                logger.error(f"Failed to open conversion history database: {str(e)}")
+
+        # Without a connection the queued entries are counted as dropped and logged
+        await self.flush()
+
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+        self._executor.shutdown(wait=True)
+        logger.info(f"Conversion history store closed ({self.stats['written']} entries written)")
+
+_history_store: Optional[ConversionHistoryStore] = None
+
+def get_history_store() -> ConversionHistoryStore:
+    """Get the process-wide conversion history store"""
+
+    global _history_store
+    if _history_store is None:
+        _history_store = ConversionHistoryStore()
+    return _history_store
+
+async def close_history_store():
+    """Flush and close the process-wide store if it was created"""
+
+    global _history_store
+    if _history_store is not None:
+        await _history_store.close()
+        _history_store = None
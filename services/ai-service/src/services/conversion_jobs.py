@@ -0,0 +1,371 @@
+import asyncio
+import collections
+import itertools
+import json
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Deque, Dict, Any, Optional
+
+from ..utils.logger import get_logger
+from .tracing import TRACEPARENT_HEADER, get_tracer
+
+logger = get_logger(__name__)
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+FINISHED_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED}
+
+class JobRejected(Exception):
+    """Raised when a job cannot be accepted"""
+
+class JobBackend:
+    """Storage and queueing for conversion jobs"""
+
+    async def enqueue(self, job: Dict[str, Any]):
+        """Store a new job and make it available to workers"""
+        raise NotImplementedError
+
+    async def requeue(self, job: Dict[str, Any]):
+        """Put a job that could not run yet back in the queue"""
+        raise NotImplementedError
+
+    async def next_job(self) -> Dict[str, Any]:
+        """Wait for the highest-priority queued job"""
+        raise NotImplementedError
+
+    async def save(self, job: Dict[str, Any]):
+        """Persist a job's current state, notifying waiters if it finished"""
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait until a job finishes or the timeout passes, then return its state"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class InProcessJobBackend(JobBackend):
+    """Job backend held in this process's memory"""
+
+    def __init__(self, result_ttl: float = 3600):
+        self.result_ttl = result_ttl
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+
+    async def enqueue(self, job: Dict[str, Any]):
+        self._evict_expired()
+        self._jobs[job["job_id"]] = job
+        self._events[job["job_id"]] = asyncio.Event()
+        await self._queue.put((job["priority"], job["sequence"], job["job_id"]))
+
+    async def requeue(self, job: Dict[str, Any]):
+        await self._queue.put((job["priority"], job["sequence"], job["job_id"]))
+
+    async def next_job(self) -> Dict[str, Any]:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job
+
+    async def save(self, job: Dict[str, Any]):
+        self._jobs[job["job_id"]] = job
+        if job["status"] in FINISHED_STATUSES:
+            event = self._events.get(job["job_id"])
+            if event is not None:
+                event.set()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        event = self._events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._jobs.get(job_id)
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATUSES and (job.get("finished_at") or 0) < cutoff
+        ]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            self._events.pop(job_id, None)
+
+class RedisJobBackend(JobBackend):
+    """Job backend shared between ai-service instances through Redis"""
+
+    QUEUE_KEY = "conversion-jobs:queue"
+    JOB_KEY = "conversion-jobs:job:{}"
+    CHANNEL = "conversion-jobs:done:{}"
+
+    def __init__(self, redis_url: Optional[str] = None, result_ttl: int = 3600):
+        import redis.asyncio as aioredis
+
+        self.redis = aioredis.from_url(
+            redis_url or os.getenv("REDIS_URL", "redis://localhost:6379"),
+            decode_responses=True
+        )
+        self.result_ttl = result_ttl
+
+    @staticmethod
+    def _score(job: Dict[str, Any]) -> float:
+        # Lower priority values first, then submission time (shared across instances)
+        return job["priority"] * 1e10 + job["created_at"]
+
+    async def enqueue(self, job: Dict[str, Any]):
+        await self.save(job)
+        await self.redis.zadd(self.QUEUE_KEY, {job["job_id"]: self._score(job)})
+
+    async def requeue(self, job: Dict[str, Any]):
+        await self.redis.zadd(self.QUEUE_KEY, {job["job_id"]: self._score(job)})
+
+    async def next_job(self) -> Dict[str, Any]:
+        while True:
+            popped = await self.redis.bzpopmin(self.QUEUE_KEY, timeout=5)
+            if not popped:
+                continue
+            job = await self.get(popped[1])
+            if job is not None:
+                return job
+
+    async def save(self, job: Dict[str, Any]):
+        finished = job["status"] in FINISHED_STATUSES
+        # Unfinished jobs never expire, however long they wait in the queue
+        await self.redis.set(
+            self.JOB_KEY.format(job["job_id"]),
+            json.dumps(job, default=str),
+            ex=self.result_ttl if finished else None
+        )
+        if finished:
+            await self.redis.publish(self.CHANNEL.format(job["job_id"]), job["status"])
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.redis.get(self.JOB_KEY.format(job_id))
+        return json.loads(data) if data else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.CHANNEL.format(job_id))
+        try:
+            # Subscribe before checking so a completion in between isn't missed
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return job
+
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=deadline - time.monotonic()
+                )
+                if message is not None:
+                    break
+            return await self.get(job_id)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    async def close(self):
+        await self.redis.close()
+
+class ConversionJobManager:
+    """Bounded worker pool that runs conversion jobs from a JobBackend.
+
+    Jobs run in priority order (0 is highest). Each user may have at most
+    `max_queued_per_user` unfinished jobs and `max_running_per_user` running
+    at once. A job taken from the queue while its user is at the running
+    limit is parked, and goes back in the queue when one of that user's jobs
+    finishes, so it never holds up other users' jobs. Both limits are
+    enforced per manager, i.e. per ai-service process.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[JobBackend] = None,
+        workers: int = 4,
+        max_running_per_user: int = 2,
+        max_queued_per_user: int = 20,
+        job_timeout: float = 600
+    ):
+        self.backend = backend or InProcessJobBackend()
+        self.workers = workers
+        self.max_running_per_user = max_running_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.job_timeout = job_timeout
+        self._handler: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None
+        self._worker_tasks = []
+        self._sequence = itertools.count()
+        self._running_per_user: Dict[str, int] = {}
+        # Jobs taken from the queue while their user was at the running limit
+        self._parked: Dict[str, Deque[Dict[str, Any]]] = {}
+        # Job ids submitted through this manager that may not have finished yet
+        self._unfinished_per_user: Dict[str, set] = {}
+
+    async def start(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        """Start the workers; `handler(job)` performs the conversion and returns its result"""
+
+        self._handler = handler
+        for index in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(index)))
+        logger.info(f"Started {self.workers} conversion job workers")
+
+    async def stop(self):
+        """Stop the workers and release the backend"""
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+        # A shared backend can hand parked jobs to another instance
+        for parked in self._parked.values():
+            for job in parked:
+                await self.backend.requeue(job)
+        self._parked = {}
+        await self.backend.close()
+
+    async def submit(self, user_id: str, request: Dict[str, Any], priority: int = 5) -> Dict[str, Any]:
+        """Queue a conversion and return the new job"""
+
+        unfinished = self._unfinished_per_user.setdefault(user_id, set())
+        if len(unfinished) >= self.max_queued_per_user:
+            # Jobs may have finished on another instance sharing the backend
+            for job_id in list(unfinished):
+                job = await self.backend.get(job_id)
+                if job is None or job["status"] in FINISHED_STATUSES:
+                    unfinished.discard(job_id)
+            if len(unfinished) >= self.max_queued_per_user:
+                raise JobRejected(
+                    f"User already has {self.max_queued_per_user} unfinished conversion jobs"
+                )
+
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "status": JobStatus.QUEUED,
+            "priority": priority,
+            "sequence": next(self._sequence),
+            "request": request,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            # The submitting request's trace, continued by the worker
+            "traceparent": get_tracer().inject().get(TRACEPARENT_HEADER)
+        }
+        unfinished.add(job["job_id"])
+        await self.backend.enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        return await self.backend.wait(job_id, timeout)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self.backend.next_job()
+            user_id = job["user_id"]
+
+            if self._running_per_user.get(user_id, 0) >= self.max_running_per_user:
+                # Hold it aside and take the next job; it is re-admitted when a slot frees up
+                self._parked.setdefault(user_id, collections.deque()).append(job)
+                continue
+
+            self._running_per_user[user_id] = self._running_per_user.get(user_id, 0) + 1
+            try:
+                await self._run(job)
+            finally:
+                self._running_per_user[user_id] -= 1
+                if not self._running_per_user[user_id]:
+                    del self._running_per_user[user_id]
+                unfinished = self._unfinished_per_user.get(user_id)
+                if unfinished is not None:
+                    unfinished.discard(job["job_id"])
+                    if not unfinished:
+                        del self._unfinished_per_user[user_id]
+                await self._readmit(user_id)
+
+    async def _readmit(self, user_id: str):
+        """Return the user's oldest parked job to the queue now that it has a free slot"""
+
+        parked = self._parked.get(user_id)
+        if not parked:
+            return
+        job = parked.popleft()
+        if not parked:
+            del self._parked[user_id]
+        await self.backend.requeue(job)
+
+    async def _run(self, job: Dict[str, Any]):
+        job["status"] = JobStatus.RUNNING
+        job["started_at"] = time.time()
+        await self.backend.save(job)
+
+        try:
+            with get_tracer().start_trace(
+                "conversion.job",
+                traceparent=job.get("traceparent"),
+                # Set by submit() in this service, not by the client
+                trusted=True,
+                job_id=job["job_id"],
+                queued_ms=round((job["started_at"] - job["created_at"]) * 1000, 1)
+            ):
+                job["result"] = await asyncio.wait_for(self._handler(job), timeout=self.job_timeout)
+            job["status"] = JobStatus.COMPLETED
+        except asyncio.TimeoutError:
+            job["status"] = JobStatus.FAILED
+            job["error"] = "Conversion job timed out"
+        except asyncio.CancelledError:
+            job["status"] = JobStatus.FAILED
+            job["error"] = "Conversion job was cancelled"
+            job["finished_at"] = time.time()
+            await self.backend.save(job)
+            raise
+        except Exception as e:
+            logger.error(f"Conversion job {job['job_id']} failed: {str(e)}")
+            job["status"] = JobStatus.FAILED
+            job["error"] = getattr(e, "detail", None) or str(e)
+
+        job["finished_at"] = time.time()
+        await self.backend.save(job)
+
+def _default_backend() -> JobBackend:
+    if os.getenv("CONVERSION_JOB_BACKEND", "inprocess").lower() == "redis":
+        return RedisJobBackend()
+    return InProcessJobBackend()
+
+_job_manager: Optional[ConversionJobManager] = None
+
+def get_job_manager() -> ConversionJobManager:
+    """Get the process-wide conversion job manager"""
+
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = ConversionJobManager(backend=_default_backend())
+    return _job_manager
+
+async def stop_job_manager():
+    """Stop the process-wide job manager if it was created"""
+
+    global _job_manager
+    if _job_manager is not None:
+        await _job_manager.stop()
+        _job_manager = None
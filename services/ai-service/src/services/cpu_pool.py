@@ -0,0 +1,171 @@
+import asyncio
+import ast
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class CPUTaskRejected(Exception):
+    """Raised when a CPU-bound task is refused or its worker fails"""
+
+class CPUTaskTimeout(CPUTaskRejected):
+    """Raised when a CPU-bound task does not finish in time"""
+
+# Worker-side tasks. These run in the pool processes, so they must be
+# module-level functions and only take/return picklable values.
+
+_worker_analyzer = None
+_worker_validators: Dict[str, Any] = {}
+
+def format_python_code(code: str) -> str:
+    """Format Python code according to PEP 8"""
+    try:
+        import autopep8
+        return autopep8.fix_code(code)
+    except ImportError:
+        return code
+
+def check_python_syntax(code: str) -> Optional[str]:
+    """Parse Python code and return the syntax error message, if any"""
+    try:
+        ast.parse(code)
+        return None
+    except SyntaxError as e:
+        return f"Syntax error at line {e.lineno}: {e.msg}"
+    except (ValueError, RecursionError, MemoryError) as e:
+        return str(e)
+
+def check_tree_sitter_syntax(code: str, language: str) -> Optional[Dict[str, Any]]:
+    """Parse code with a tree-sitter grammar, or return None if it is not installed"""
+    # Parsers are not picklable, so each worker loads its own grammar once
+    if language not in _worker_validators:
+        from .syntax_validation import TreeSitterValidator
+        _worker_validators[language] = TreeSitterValidator.load(language)
+    validator = _worker_validators[language]
+    return validator.check(code) if validator is not None else None
+
+def analyze_code(code: str, language: str) -> Dict[str, Any]:
+    """Run CodeAnalyzer inside the worker process"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        from .code_analyzer import CodeAnalyzer
+        _worker_analyzer = CodeAnalyzer()
+    return asyncio.run(_worker_analyzer.analyze_code(code, language))
+
+class CPUWorkerPool:
+    """Process pool that keeps formatting, parsing and analysis off the event loop"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        default_timeout: float = 10.0,
+        max_input_size: int = 2 * 1024 * 1024
+    ):
+        self.max_workers = max_workers or max(1, min(4, multiprocessing.cpu_count() - 1))
+        self.default_timeout = default_timeout
+        self.max_input_size = max_input_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "restarts": 0,
+            "recycles": 0
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn avoids forking the interpreter while the event loop is running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(
+        self,
+        func: Callable,
+        code: str,
+        *args,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Run a worker task on a piece of code and wait for its result"""
+
+        if len(code) > self.max_input_size:
+            self.stats["rejected"] += 1
+            raise CPUTaskRejected(
+                f"Input of {len(code)} characters exceeds the {self.max_input_size} limit"
+            )
+
+        loop = asyncio.get_running_loop()
+        self.stats["submitted"] += 1
+        executor = self._get_executor()
+
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, func, code, *args),
+                timeout=timeout or self.default_timeout
+            )
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self._recycle(executor)
+            raise CPUTaskTimeout(f"{func.__name__} timed out")
+        except BrokenProcessPool:
+            if self._executor is executor:
+                logger.error("CPU worker pool crashed, restarting")
+                self.stats["restarts"] += 1
+                self._executor = None
+            raise CPUTaskRejected(f"{func.__name__} worker crashed")
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Kill the workers of a pool whose task timed out and start a fresh pool.
+
+        A timed-out worker would keep running its task, and a few pathological
+        inputs could otherwise occupy every worker. Other tasks running in the
+        old pool fail with CPUTaskRejected and their callers fall back.
+        """
+
+        if self._executor is not executor:
+            # Already replaced by a concurrent timeout
+            return
+        self._executor = None
+        self.stats["recycles"] += 1
+        logger.warning("CPU task timed out, recycling the worker pool")
+
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return {**self.stats, "max_workers": self.max_workers}
+
+_cpu_pool: Optional[CPUWorkerPool] = None
+
+def get_cpu_pool() -> CPUWorkerPool:
+    """Get the process-wide CPU worker pool"""
+
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = CPUWorkerPool()
+    return _cpu_pool
+
+def shutdown_cpu_pool():
+    """Stop the process-wide CPU worker pool if it was started"""
+
+    global _cpu_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown()
+        _cpu_pool = None
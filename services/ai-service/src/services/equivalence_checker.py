@@ -0,0 +1,266 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from ..utils.logger import get_logger
+from .tracing import get_tracer
+
+logger = get_logger(__name__)
+
+# Languages the execution-service can run, by their ai-service names
+EXECUTABLE_LANGUAGES = {
+    "python", "javascript", "typescript", "java", "cpp", "c", "go", "rust",
+    "php", "ruby", "csharp", "swift", "kotlin", "scala", "r"
+}
+
+# Stdin inputs used when the caller does not supply any
+DEFAULT_TEST_INPUTS = ["", "0\n", "1\n", "10\n"]
+
+MAX_TEST_INPUTS = 10
+
+class ExecutionBackend:
+    """Runs programs for equivalence checks"""
+
+    async def execute_batch(self, runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Execute runs of {code, language, input_data, timeout} and return one result per run"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class HttpExecutionBackend(ExecutionBackend):
+    """Execution backend that calls the execution-service batch endpoint"""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 120.0):
+        self.base_url = (
+            base_url or os.getenv("EXECUTION_SERVICE_URL", "http://execution-service:8002")
+        ).rstrip("/")
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=timeout)
+
+    async def execute_batch(self, runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        tracer = get_tracer()
+        with tracer.span("equivalence.execute_batch", runs=len(runs)):
+            response = await self.client.post("/api/v1/execute/batch", json=runs, headers=tracer.inject())
+            response.raise_for_status()
+            return response.json()["results"]
+
+    async def close(self):
+        await self.client.aclose()
+
+class StubExecutionBackend(ExecutionBackend):
+    """In-process execution backend for tests.
+
+    `handler(code, language, input_data)` returns the stdout of a run, or a
+    full result dict. Every call is recorded in `calls`.
+    """
+
+    def __init__(self, handler: Callable[[str, str, Optional[str]], Any]):
+        self.handler = handler
+        self.calls: List[Dict[str, Any]] = []
+
+    async def execute_batch(self, runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = []
+        for run in runs:
+            self.calls.append(run)
+            result = self.handler(run["code"], run["language"], run.get("input_data"))
+            if not isinstance(result, dict):
+                result = {"status": "completed", "output": result, "error": "", "exit_code": 0}
+            results.append(result)
+        return results
+
+class EquivalenceChecker:
+    """Compare the behaviour of original and converted code by running both"""
+
+    def __init__(
+        self,
+        backend: Optional[ExecutionBackend] = None,
+        max_cache_entries: int = 256,
+        timeout: int = 10
+    ):
+        self.backend = backend or HttpExecutionBackend()
+        self.max_cache_entries = max_cache_entries
+        self.timeout = timeout
+        self._cache: "OrderedDict[Tuple[str, ...], Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def _hash(value: str) -> str:
+        return hashlib.sha256(value.encode("utf-8", "surrogatepass")).hexdigest()
+
+    @staticmethod
+    def _normalize_output(output: Optional[str]) -> str:
+        """Ignore line endings and trailing whitespace when comparing output"""
+        lines = (output or "").replace("\r\n", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+    @staticmethod
+    def _failure_class(result: Dict[str, Any]) -> Optional[str]:
+        """None for a successful run, otherwise how it failed"""
+        if result.get("exit_code") == 0:
+            return None
+        if result.get("exit_code") is None or result.get("status") == "timeout":
+            return "timeout"
+        return "error"
+
+    @classmethod
+    def _outputs_match(cls, original: Dict[str, Any], converted: Dict[str, Any]) -> Optional[bool]:
+        """Compare two runs' output; None when it spilled to the output store and can't be told apart.
+
+        Spilled results carry only the head of their output inline, plus an
+        `output_ref` whose handle is the sha256 of the full output.
+        """
+
+        original_ref = original.get("output_ref")
+        converted_ref = converted.get("output_ref")
+        if original_ref is None and converted_ref is None:
+            return cls._normalize_output(original.get("output")) == cls._normalize_output(converted.get("output"))
+        if original_ref is not None and converted_ref is not None and original_ref["handle"] == converted_ref["handle"]:
+            return True
+
+        # The inline heads can still show a difference; their last lines may be cut short
+        original_lines = cls._normalize_output(original.get("output")).split("\n")[:-1]
+        converted_lines = cls._normalize_output(converted.get("output")).split("\n")[:-1]
+        common = min(len(original_lines), len(converted_lines))
+        if original_lines[:common] != converted_lines[:common]:
+            return False
+        return None
+
+    def _compare(self, original: Dict[str, Any], converted: Dict[str, Any]) -> Optional[bool]:
+        """Whether two runs behaved the same; None when that can't be told.
+
+        Two programs that crash or time out alike tell us nothing about
+        whether the conversion is right, and neither does output that was
+        too large to come back inline, so such cases are inconclusive.
+        """
+
+        original_failure = self._failure_class(original)
+        converted_failure = self._failure_class(converted)
+        if original_failure != converted_failure:
+            return False
+        outputs_match = self._outputs_match(original, converted)
+        if outputs_match is False:
+            return False
+        if original_failure is not None or outputs_match is None:
+            return None
+        return True
+
+    def supports(self, source_language: str, target_language: str) -> bool:
+        return (
+            source_language.lower() in EXECUTABLE_LANGUAGES
+            and target_language.lower() in EXECUTABLE_LANGUAGES
+        )
+
+    async def check(
+        self,
+        source_code: str,
+        converted_code: str,
+        source_language: str,
+        target_language: str,
+        test_inputs: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Run both programs on each input and compare their results"""
+
+        if not self.supports(source_language, target_language):
+            return {
+                "checked": False,
+                "reason": f"Execution of {source_language} -> {target_language} is not supported"
+            }
+
+        inputs = list(test_inputs or DEFAULT_TEST_INPUTS)[:MAX_TEST_INPUTS]
+
+        key = (
+            self._hash(source_code), source_language.lower(),
+            self._hash(converted_code), target_language.lower(),
+            self._hash("\0".join(inputs))
+        )
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        # Original and converted runs for every input go out in one batch
+        runs = []
+        for input_data in inputs:
+            for code, language in ((source_code, source_language), (converted_code, target_language)):
+                runs.append({
+                    "code": code,
+                    "language": language.lower(),
+                    "input_data": input_data or None,
+                    "timeout": self.timeout
+                })
+
+        try:
+            results = await self.backend.execute_batch(runs)
+        except Exception as e:
+            logger.error(f"Equivalence check execution failed: {str(e)}")
+            return {"checked": False, "reason": f"Execution failed: {str(e)}"}
+
+        cases = []
+        for index, input_data in enumerate(inputs):
+            original, converted = results[2 * index], results[2 * index + 1]
+            matches = self._compare(original, converted)
+            cases.append({
+                "input": input_data,
+                "matches": matches,
+                "inconclusive": matches is None,
+                "output_spilled": bool(original.get("output_ref") or converted.get("output_ref")),
+                "original_exit_code": original.get("exit_code"),
+                "converted_exit_code": converted.get("exit_code"),
+                "original_output": original.get("output", ""),
+                "converted_output": converted.get("output", "")
+            })
+
+        passed = sum(1 for case in cases if case["matches"] is True)
+        failed = sum(1 for case in cases if case["matches"] is False)
+        inconclusive = len(cases) - passed - failed
+        if passed + failed == 0:
+            result = {
+                "checked": False,
+                "reason": "No input gave a conclusive comparison (both failed alike or the output was too large)",
+                "inconclusive": inconclusive,
+                "total": len(cases),
+                "cases": cases
+            }
+        else:
+            result = {
+                "checked": True,
+                "equivalent": failed == 0,
+                "score": passed / (passed + failed),
+                "passed": passed,
+                "failed": failed,
+                "inconclusive": inconclusive,
+                "total": len(cases),
+                "cases": cases
+            }
+
+        self._cache[key] = result
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+        return result
+
+_equivalence_checker: Optional[EquivalenceChecker] = None
+
+def get_equivalence_checker() -> EquivalenceChecker:
+    """Get the process-wide equivalence checker"""
+
+    global _equivalence_checker
+    if _equivalence_checker is None:
+        _equivalence_checker = EquivalenceChecker()
+    return _equivalence_checker
+
+def set_equivalence_checker(checker: Optional[EquivalenceChecker]):
+    """Replace the process-wide equivalence checker, e.g. with a stub backend in tests"""
+
+    global _equivalence_checker
+    _equivalence_checker = checker
+
+async def close_equivalence_checker():
+    """Release the process-wide checker's backend connections"""
+
+    global _equivalence_checker
+    if _equivalence_checker is not None:
+        await _equivalence_checker.backend.close()
+        _equivalence_checker = None
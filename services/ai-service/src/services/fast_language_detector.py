@@ -0,0 +1,240 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .language_detector import LanguageDetector
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+EXTENSION_LANGUAGES = {
+    ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript",
+    ".py": "python",
+    ".java": "java",
+    ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp",
+    ".c": "c",
+    ".cs": "csharp",
+    ".go": "go",
+    ".rs": "rust",
+    ".php": "php",
+    ".rb": "ruby",
+    ".swift": "swift",
+    ".kt": "kotlin",
+    ".scala": "scala",
+    ".r": "r",
+    ".sql": "sql",
+    ".html": "html", ".htm": "html",
+    ".css": "css"
+}
+
+SHEBANG_LANGUAGES = {
+    "python": "python",
+    "node": "javascript",
+    "ts-node": "typescript",
+    "ruby": "ruby",
+    "php": "php",
+    "rscript": "r"
+}
+
+# (pattern, weight) pairs; each pattern counts at most MAX_PATTERN_HITS times
+KEYWORD_SIGNALS: Dict[str, List[Tuple[str, int]]] = {
+    "python": [
+        (r"^\s*def \w+\(.*\)\s*(->.*)?:\s*$", 3), (r"^\s*from [\w.]+ import ", 3),
+        (r"^\s*import \w+\s*$", 1), (r"^\s*elif\b", 3), (r"\bself\b", 1),
+        (r"^\s*class \w+(\(.*\))?:\s*$", 3), (r"\bNone\b", 1), (r"if __name__ == ", 5)
+    ],
+    "javascript": [
+        (r"\bfunction\s*\w*\s*\(", 2), (r"\bconst \w+\s*=", 1), (r"\blet \w+\s*=", 1),
+        (r"=>", 1), (r"\bconsole\.log\(", 3), (r"\brequire\(['\"]", 3), (r"===", 2),
+        (r"\bmodule\.exports\b", 4)
+    ],
+    "typescript": [
+        (r":\s*(string|number|boolean|void|any)\b", 3), (r"^\s*(export )?interface \w+", 4),
+        (r"^\s*(export )?type \w+\s*=", 4), (r"\bconsole\.log\(", 1), (r"=>", 1),
+        (r"\b(public|private|readonly) \w+\s*:", 2)
+    ],
+    "java": [
+        (r"\bpublic (final )?class \w+", 3), (r"public static void main\(String", 5),
+        (r"\bSystem\.out\.print", 4), (r"^\s*import java\.", 5), (r"\bprivate \w+(<.*>)? \w+;", 2)
+    ],
+    "cpp": [
+        (r"#include <(iostream|vector|string|map|memory|algorithm)>", 5), (r"\bstd::", 3),
+        (r"\bcout\s*<<", 3), (r"^\s*using namespace std;", 5), (r"\btemplate\s*<", 3)
+    ],
+    "c": [
+        (r"#include <(stdio|stdlib|string)\.h>", 5), (r"\bprintf\(", 2), (r"\bmalloc\(", 2),
+        (r"^\s*int main\s*\(\s*(void)?\s*\)", 2)
+    ],
+    "csharp": [
+        (r"^\s*using System", 5), (r"\bConsole\.Write(Line)?\(", 5), (r"^\s*namespace [\w.]+", 2),
+        (r"\bstatic void Main\(", 4), (r"\{\s*get;\s*set;\s*\}", 4)
+    ],
+    "go": [
+        (r"^\s*package \w+", 4), (r"^\s*func (\(\w+ \*?\w+\) )?\w+\(", 4), (r"\bfmt\.", 3),
+        (r":=", 2), (r"^\s*import \(", 3)
+    ],
+    "rust": [
+        (r"^\s*(pub )?fn \w+", 4), (r"\blet mut\b", 4), (r"\bprintln!\(", 5),
+        (r"^\s*impl\b", 3), (r"^\s*use \w+::", 4), (r"&mut\b", 3)
+    ],
+    "php": [
+        (r"<\?php", 10), (r"\$\w+\s*=", 2), (r"\becho\b", 2), (r"->\w+\(", 1)
+    ],
+    "ruby": [
+        (r"^\s*def \w+[?!]?(\(.*\))?\s*$", 3), (r"^\s*end\s*$", 2), (r"\bputs\b", 3),
+        (r"^\s*require ['\"]", 3), (r"\.each do\b", 4), (r"^\s*module \w+", 2)
+    ],
+    "swift": [
+        (r"^\s*import (Foundation|UIKit|SwiftUI)", 6), (r"^\s*func \w+\(.*\)\s*(->\s*\w+)?\s*\{", 3),
+        (r"\bguard let\b", 5), (r"\bvar \w+\s*:\s*\w+", 1)
+    ],
+    "kotlin": [
+        (r"^\s*fun \w+\(", 4), (r"\bval \w+", 2), (r"\bprintln\(", 1), (r"^\s*data class\b", 5)
+    ],
+    "scala": [
+        (r"^\s*object \w+", 4), (r"^\s*def \w+\(.*\)\s*:\s*\w+\s*=", 4), (r"^\s*case class\b", 5),
+        (r"\bval \w+", 1)
+    ],
+    "sql": [
+        (r"(?i)^\s*select\b.*\bfrom\b", 5), (r"(?i)^\s*(insert into|update \w+ set|create table)\b", 5)
+    ],
+    "html": [
+        (r"(?i)<!doctype html>", 10), (r"(?i)<(html|head|body|div)\b", 3)
+    ],
+    "css": [
+        (r"^\s*[.#]?[\w-]+\s*\{\s*$", 2), (r"^\s*[\w-]+\s*:\s*[^;]+;\s*$", 1)
+    ]
+}
+
+MAX_PATTERN_HITS = 5
+
+class DetectionResult:
+    """Language detection outcome"""
+
+    __slots__ = ("language", "confidence", "method")
+
+    def __init__(self, language: str, confidence: float, method: str):
+        self.language = language
+        self.confidence = confidence
+        self.method = method
+
+class FastLanguageDetector:
+    """Detect languages from cheap signals first, falling back to LanguageDetector.
+
+    Checks run in order: filename extension hint, shebang, then a weighted
+    keyword histogram over the first `sample_size` characters. The heavier
+    detector is only called when the histogram is not confident enough.
+    Results are cached by content hash.
+    """
+
+    def __init__(
+        self,
+        detector: Optional[LanguageDetector] = None,
+        max_entries: int = 4096,
+        sample_size: int = 4096,
+        confidence_threshold: float = 0.8,
+        min_score: int = 4
+    ):
+        self.detector = detector or LanguageDetector()
+        self.max_entries = max_entries
+        self.sample_size = sample_size
+        self.confidence_threshold = confidence_threshold
+        self.min_score = min_score
+        self._signals = {
+            language: [(re.compile(pattern, re.MULTILINE), weight) for pattern, weight in signals]
+            for language, signals in KEYWORD_SIGNALS.items()
+        }
+        self._cache: "OrderedDict[bytes, DetectionResult]" = OrderedDict()
+        self.stats = {
+            "cache_hits": 0,
+            "extension": 0,
+            "shebang": 0,
+            "keywords": 0,
+            "model": 0
+        }
+
+    async def detect_language(self, code: str, filename: Optional[str] = None) -> DetectionResult:
+        """Detect the language of a piece of code"""
+
+        if filename:
+            language = EXTENSION_LANGUAGES.get(os.path.splitext(filename)[1].lower())
+            if language:
+                self.stats["extension"] += 1
+                return DetectionResult(language, 1.0, "extension")
+
+        key = hashlib.sha256(code.encode("utf-8", "surrogatepass")).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return cached
+
+        sample = code[:self.sample_size]
+        result = self._detect_from_shebang(sample) or self._detect_from_keywords(sample)
+
+        if result is None:
+            self.stats["model"] += 1
+            detected = await self.detector.detect_language(code)
+            result = DetectionResult(detected.language, detected.confidence, "model")
+
+        self._cache[key] = result
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+        return result
+
+    def _detect_from_shebang(self, sample: str) -> Optional[DetectionResult]:
+        if not sample.startswith("#!"):
+            return None
+
+        first_line = sample.split("\n", 1)[0].lower()
+        for interpreter, language in SHEBANG_LANGUAGES.items():
+            if interpreter in first_line:
+                self.stats["shebang"] += 1
+                return DetectionResult(language, 0.99, "shebang")
+        return None
+
+    def _detect_from_keywords(self, sample: str) -> Optional[DetectionResult]:
+        scores = {}
+        for language, signals in self._signals.items():
+            score = 0
+            for pattern, weight in signals:
+                hits = 0
+                for _ in pattern.finditer(sample):
+                    hits += 1
+                    if hits >= MAX_PATTERN_HITS:
+                        break
+                score += hits * weight
+            if score:
+                scores[language] = score
+
+        if not scores:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        language, top = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        confidence = top / (top + runner_up)
+
+        if top < self.min_score or confidence < self.confidence_threshold:
+            return None
+
+        self.stats["keywords"] += 1
+        return DetectionResult(language, round(confidence, 3), "keywords")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get detection statistics"""
+        return {**self.stats, "entries": len(self._cache)}
+
+_fast_language_detector: Optional[FastLanguageDetector] = None
+
+def get_language_detector() -> FastLanguageDetector:
+    """Get the process-wide language detector"""
+
+    global _fast_language_detector
+    if _fast_language_detector is None:
+        _fast_language_detector = FastLanguageDetector()
+    return _fast_language_detector
@@ -0,0 +1,274 @@
+import math
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Language-specific conversion templates
+CONVERSION_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "javascript_to_python": {
+        "system_prompt": """You are an expert code converter. Convert JavaScript code to Python while maintaining:
+1. Exact functionality and logic
+2. Proper Python conventions (snake_case, PEP 8)
+3. Appropriate Python libraries and patterns
+4. Error handling and edge cases
+5. Comments explaining complex conversions
+
+Provide clean, production-ready Python code.""",
+        "examples": [
+            {
+                "input": "function fibonacci(n) { return n <= 1 ? n : fibonacci(n-1) + fibonacci(n-2); }",
+                "output": "def fibonacci(n):\n    return n if n <= 1 else fibonacci(n-1) + fibonacci(n-2)"
+            }
+        ]
+    },
+    "python_to_javascript": {
+        "system_prompt": """Convert Python code to JavaScript while maintaining:
+1. Exact functionality and logic
+2. Modern JavaScript conventions (camelCase, ES6+)
+3. Appropriate JavaScript patterns and libraries
+4. Proper error handling
+5. Comments for complex conversions
+
+Provide clean, modern JavaScript code.""",
+        "examples": []
+    },
+    "java_to_cpp": {
+        "system_prompt": """Convert Java code to C++ while maintaining:
+1. Exact functionality and logic
+2. Proper C++ conventions and best practices
+3. Memory management considerations
+4. STL usage where appropriate
+5. Header file organization
+
+Provide clean, efficient C++ code.""",
+        "examples": []
+    }
+}
+
+def get_generic_template(source_lang: str, target_lang: str) -> Dict[str, Any]:
+    """Get generic conversion template for unsupported language pairs"""
+    return {
+        "system_prompt": f"""You are an expert programmer. Convert {source_lang} code to {target_lang} while:
+1. Maintaining exact functionality and logic
+2. Following {target_lang} best practices and conventions
+3. Using appropriate libraries and patterns for {target_lang}
+4. Handling errors and edge cases properly
+5. Adding comments for complex conversions
+
+Provide clean, production-ready {target_lang} code.""",
+        "examples": []
+    }
+
+class TokenCounter:
+    """Count tokens with tiktoken when installed, else estimate from length"""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.info(f"tiktoken unavailable, estimating token counts: {str(e)}")
+            self._encoding = None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # Roughly four characters per token for source code and English
+        return math.ceil(len(text) / 4)
+
+class CompiledPromptTemplate:
+    """A conversion template rendered once for a language pair.
+
+    Only the analysis summary, options and source code vary per request; the
+    static sections are pre-joined and their token counts precomputed.
+    """
+
+    def __init__(
+        self,
+        template: Dict[str, Any],
+        source_lang: str,
+        target_lang: str,
+        counter: TokenCounter
+    ):
+        self.head = "\n".join([
+            template["system_prompt"],
+            "",
+            f"Source Language: {source_lang}",
+            f"Target Language: {target_lang}",
+            ""
+        ])
+        self.examples: List[Tuple[str, int]] = []
+        for i, example in enumerate(template.get("examples", []), 1):
+            rendered = "\n".join([
+                f"Example {i}:",
+                f"Input ({source_lang}):",
+                example["input"],
+                f"Output ({target_lang}):",
+                example["output"],
+                ""
+            ])
+            self.examples.append((rendered, counter.count(rendered) + 1))
+        self.code_open = "\n".join([
+            f"Convert the following {source_lang} code to {target_lang}:",
+            "```" + source_lang
+        ])
+        self.code_close = "\n".join([
+            "```",
+            "",
+            f"Provide only the converted {target_lang} code without explanations:"
+        ])
+        self.fixed_tokens = (
+            counter.count(self.head) + counter.count(self.code_open) + counter.count(self.code_close) + 3
+        )
+
+class PromptBudget:
+    """Token limits for a conversion request"""
+
+    def __init__(
+        self,
+        context_window: int = 16384,
+        max_completion_tokens: int = 4000,
+        min_completion_tokens: int = 256,
+        completion_ratio: float = 1.5
+    ):
+        self.context_window = context_window
+        self.max_completion_tokens = max_completion_tokens
+        self.min_completion_tokens = min_completion_tokens
+        # Converted code is expected to be at most this many times the source size
+        self.completion_ratio = completion_ratio
+
+    def completion_tokens(self, source_tokens: int) -> int:
+        """Size the completion to the input instead of always asking for the maximum"""
+        wanted = int(source_tokens * self.completion_ratio) + 128
+        return max(self.min_completion_tokens, min(wanted, self.max_completion_tokens))
+
+class PromptBuilder:
+    """Build conversion prompts from precompiled templates within a token budget"""
+
+    def __init__(
+        self,
+        templates: Optional[Dict[str, Dict[str, Any]]] = None,
+        budget: Optional[PromptBudget] = None,
+        counter: Optional[TokenCounter] = None
+    ):
+        self.templates = templates if templates is not None else CONVERSION_TEMPLATES
+        self.budget = budget or PromptBudget()
+        self.counter = counter or TokenCounter()
+        self._compiled: Dict[Tuple[str, str], CompiledPromptTemplate] = {}
+
+    def get_template(self, source_lang: str, target_lang: str) -> CompiledPromptTemplate:
+        """Get the compiled template for a language pair, compiling it on first use"""
+
+        key = (source_lang, target_lang)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            template = self.templates.get(
+                f"{source_lang}_to_{target_lang}",
+                get_generic_template(source_lang, target_lang)
+            )
+            compiled = CompiledPromptTemplate(template, source_lang, target_lang, self.counter)
+            self._compiled[key] = compiled
+        return compiled
+
+    def _analysis_section(self, analysis: Dict[str, Any], max_dependencies: Optional[int]) -> str:
+        dependencies = analysis.get("dependencies", [])
+        if max_dependencies is not None and len(dependencies) > max_dependencies:
+            dependencies = list(dependencies[:max_dependencies]) + [
+                f"... {len(dependencies) - max_dependencies} more"
+            ]
+        return "\n".join([
+            "Code Analysis:",
+            f"- Complexity: {analysis.get('complexity', 'Unknown')}",
+            f"- Functions: {len(analysis.get('functions', []))}",
+            f"- Classes: {len(analysis.get('classes', []))}",
+            f"- Dependencies: {', '.join(dependencies)}",
+            ""
+        ])
+
+    def build(
+        self,
+        source_code: str,
+        source_lang: str,
+        target_lang: str,
+        analysis: Dict[str, Any],
+        options: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the prompt and pick max_tokens for the completion.
+
+        The template, source code and options are always included. The analysis
+        summary and then the examples are trimmed when they would not fit.
+        """
+
+        template = self.get_template(source_lang, target_lang)
+
+        source_tokens = self.counter.count(source_code)
+        max_tokens = self.budget.completion_tokens(source_tokens)
+
+        options_section = ""
+        if options:
+            options_section = "\n".join(
+                ["Conversion Options:"] + [f"- {key}: {value}" for key, value in options.items()] + [""]
+            )
+
+        used = template.fixed_tokens + source_tokens + self.counter.count(options_section)
+        available = self.budget.context_window - max_tokens - used
+
+        # Analysis summary: full, then with a short dependency list, then dropped
+        analysis_section = ""
+        if analysis.get("available", True):
+            for max_dependencies in (None, 10):
+                candidate = self._analysis_section(analysis, max_dependencies)
+                tokens = self.counter.count(candidate) + 1
+                if tokens <= available:
+                    analysis_section = candidate
+                    available -= tokens
+                    break
+
+        # Examples in order, as many as fit
+        examples = []
+        for rendered, tokens in template.examples:
+            if tokens > available:
+                break
+            examples.append(rendered)
+            available -= tokens
+
+        prompt_parts = [template.head]
+        if analysis_section:
+            prompt_parts.append(analysis_section)
+        if examples:
+            prompt_parts.append("Examples:")
+            prompt_parts.extend(examples)
+        if options_section:
+            prompt_parts.append(options_section)
+        prompt_parts.extend([template.code_open, source_code, template.code_close])
+
+        prompt_tokens = self.budget.context_window - max_tokens - available
+        if available < 0:
+            # Source alone is over budget; give the model whatever room is left
+            max_tokens = max(self.budget.min_completion_tokens, self.budget.context_window - prompt_tokens)
+            logger.warning(
+                f"Conversion prompt of {prompt_tokens} tokens exceeds the budget for "
+                f"{source_lang} -> {target_lang}"
+            )
+
+        return {
+            "prompt": "\n".join(prompt_parts),
+            "max_tokens": max_tokens,
+            "prompt_tokens": prompt_tokens,
+            "examples_used": len(examples),
+            "analysis_included": bool(analysis_section)
+        }
+
+_prompt_builder: Optional[PromptBuilder] = None
+
+def get_prompt_builder() -> PromptBuilder:
+    """Get the process-wide prompt builder"""
+
+    global _prompt_builder
+    if _prompt_builder is None:
+        _prompt_builder = PromptBuilder()
+    return _prompt_builder
@@ -0,0 +1,198 @@
+import importlib
+from typing import Callable, Dict, Any, List, Optional
+
+from .cpu_pool import get_cpu_pool, check_python_syntax, check_tree_sitter_syntax, CPUTaskRejected
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Grammar names as used by tree_sitter_languages, and the standalone
+# tree_sitter_<module> package that ships the same grammar.
+TREE_SITTER_GRAMMARS = {
+    "javascript": ("javascript", "tree_sitter_javascript", "language"),
+    "typescript": ("typescript", "tree_sitter_typescript", "language_typescript"),
+    "java": ("java", "tree_sitter_java", "language"),
+    "go": ("go", "tree_sitter_go", "language"),
+    "c": ("c", "tree_sitter_c", "language"),
+    "cpp": ("cpp", "tree_sitter_cpp", "language"),
+    "rust": ("rust", "tree_sitter_rust", "language"),
+    "csharp": ("c_sharp", "tree_sitter_c_sharp", "language"),
+}
+
+MAX_REPORTED_ERRORS = 5
+
+# Larger inputs are parsed in the CPU pool instead of on the event loop
+MAX_INLINE_PARSE_SIZE = 64 * 1024
+
+def _unchecked(reason: str) -> Dict[str, Any]:
+    return {"valid": None, "checked": False, "errors": [], "validator": None, "reason": reason}
+
+class SyntaxValidator:
+    """Base class for in-process syntax validators"""
+
+    name = "base"
+
+    async def validate(self, code: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+class PythonSyntaxValidator(SyntaxValidator):
+    """Validate Python with ast.parse in the CPU pool"""
+
+    name = "python-ast"
+
+    async def validate(self, code: str) -> Dict[str, Any]:
+        try:
+            error = await get_cpu_pool().run(check_python_syntax, code)
+        except CPUTaskRejected as e:
+            return _unchecked(str(e))
+
+        return {
+            "valid": error is None,
+            "checked": True,
+            "errors": [error] if error else [],
+            "validator": self.name
+        }
+
+class TreeSitterValidator(SyntaxValidator):
+    """Validate code with a tree-sitter grammar"""
+
+    name = "tree-sitter"
+
+    def __init__(self, parser, language: str):
+        self.parser = parser
+        self.language = language
+
+    @classmethod
+    def load(cls, language: str) -> Optional["TreeSitterValidator"]:
+        """Build a validator for a language, or None if no grammar is installed"""
+
+        grammar, module_name, attribute = TREE_SITTER_GRAMMARS[language]
+
+        # Bundled grammars
+        try:
+            from tree_sitter_languages import get_parser
+            return cls(get_parser(grammar), language)
+        except ImportError:
+            pass
+        except Exception as e:
+            # Installed but built against an incompatible tree_sitter (raises TypeError)
+            logger.info(f"tree_sitter_languages unusable for {language}, trying {module_name}: {str(e)}")
+
+        # Individually packaged grammars (py-tree-sitter >= 0.22)
+        try:
+            from tree_sitter import Language, Parser
+            module = importlib.import_module(module_name)
+            return cls(Parser(Language(getattr(module, attribute)())), language)
+        except (ImportError, AttributeError, TypeError) as e:
+            logger.info(f"No tree-sitter grammar available for {language}: {str(e)}")
+            return None
+
+    async def validate(self, code: str) -> Dict[str, Any]:
+        if len(code) <= MAX_INLINE_PARSE_SIZE:
+            return self.check(code)
+
+        try:
+            result = await get_cpu_pool().run(check_tree_sitter_syntax, code, self.language)
+        except CPUTaskRejected as e:
+            return _unchecked(str(e))
+
+        if result is None:
+            return _unchecked(f"No tree-sitter grammar available for {self.language} in the CPU pool")
+        return result
+
+    def check(self, code: str) -> Dict[str, Any]:
+        """Parse code synchronously and report syntax errors"""
+
+        tree = self.parser.parse(code.encode("utf-8", "surrogatepass"))
+        root = tree.root_node
+
+        errors = self._collect_errors(root) if root.has_error else []
+        return {
+            "valid": not root.has_error,
+            "checked": True,
+            "errors": errors,
+            "validator": self.name
+        }
+
+    def _collect_errors(self, root) -> List[str]:
+        """Describe the first few ERROR and MISSING nodes"""
+
+        errors = []
+        stack = [root]
+
+        while stack and len(errors) < MAX_REPORTED_ERRORS:
+            node = stack.pop()
+            if not node.has_error:
+                continue
+
+            line, column = node.start_point
+            if node.is_missing:
+                errors.append(f"Missing '{node.type}' at line {line + 1}, column {column + 1}")
+            elif node.type == "ERROR":
+                errors.append(f"Unexpected syntax at line {line + 1}, column {column + 1}")
+
+            stack.extend(reversed(node.children))
+
+        return errors
+
+class SyntaxValidatorRegistry:
+    """Language -> validator registry with lazily loaded, cached validators"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Optional[SyntaxValidator]]] = {}
+        self._validators: Dict[str, Optional[SyntaxValidator]] = {}
+
+    def register(self, language: str, factory: Callable[[], Optional[SyntaxValidator]]):
+        """Register a validator factory; it is called on first use only"""
+        language = language.lower()
+        self._factories[language] = factory
+        self._validators.pop(language, None)
+
+    def supports(self, language: str) -> bool:
+        return language.lower() in self._factories
+
+    def get(self, language: str) -> Optional[SyntaxValidator]:
+        """Get the cached validator for a language, loading it if needed"""
+
+        language = language.lower()
+        if language not in self._validators:
+            factory = self._factories.get(language)
+            validator = None
+            if factory is not None:
+                try:
+                    validator = factory()
+                except Exception as e:
+                    logger.error(f"Failed to load syntax validator for {language}: {str(e)}")
+            # Cache misses too, so a missing grammar is only looked up once
+            self._validators[language] = validator
+        return self._validators[language]
+
+    async def validate(self, code: str, language: str) -> Dict[str, Any]:
+        """Validate code syntax for a language"""
+
+        validator = self.get(language)
+        if validator is None:
+            return _unchecked(f"No syntax validator available for {language}")
+
+        try:
+            return await validator.validate(code)
+        except Exception as e:
+            logger.error(f"Syntax validation failed for {language}: {str(e)}")
+            return _unchecked(str(e))
+
+def _default_registry() -> SyntaxValidatorRegistry:
+    registry = SyntaxValidatorRegistry()
+    registry.register("python", PythonSyntaxValidator)
+    for language in TREE_SITTER_GRAMMARS:
+        registry.register(language, lambda language=language: TreeSitterValidator.load(language))
+    return registry
+
+_registry: Optional[SyntaxValidatorRegistry] = None
+
+def get_syntax_validators() -> SyntaxValidatorRegistry:
+    """Get the process-wide validator registry"""
+
+    global _registry
+    if _registry is None:
+        _registry = _default_registry()
+    return _registry
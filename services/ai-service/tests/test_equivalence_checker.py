@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from src.services.equivalence_checker import EquivalenceChecker, StubExecutionBackend
+
+def check(handler, source="original", converted="converted", inputs=None):
+    """Run an equivalence check of two fake programs whose runs `handler` answers"""
+
+    backend = StubExecutionBackend(handler)
+    checker = EquivalenceChecker(backend=backend)
+    result = asyncio.run(checker.check(source, converted, "python", "javascript", test_inputs=inputs))
+    return result, backend
+
+def completed(output, exit_code=0):
+    return {"status": "completed", "output": output, "error": "", "exit_code": exit_code}
+
+def spilled(head, handle, size=1 << 20):
+    return {
+        **completed(head),
+        "output_ref": {"handle": handle, "size": size, "inline_bytes": len(head)}
+    }
+
+def test_matching_outputs_are_equivalent():
+    # Line endings and trailing whitespace don't count
+    result, backend = check(
+        lambda code, language, input_data: "1\r\n2  \n" if code == "original" else "1\n2\n",
+        inputs=["", "5\n"]
+    )
+    
+    assert result["checked"] is True
+    assert result["equivalent"] is True
+    assert result["passed"] == 2 and result["failed"] == 0
+    assert result["score"] == 1.0
+    assert len(backend.calls) == 4
+
+def test_different_outputs_are_not_equivalent():
+    result, _ = check(
+        lambda code, language, input_data: f"{code} {input_data}",
+        inputs=["1\n"]
+    )
+    
+    assert result["equivalent"] is False
+    assert result["failed"] == 1
+    assert result["cases"][0]["matches"] is False
+
+def test_one_side_failing_is_a_mismatch():
+    result, _ = check(
+        lambda code, language, input_data: completed("", 1) if code == "converted" else "ok",
+        inputs=[""]
+    )
+    
+    assert result["equivalent"] is False
+    assert result["score"] == 0.0
+
+def test_both_failing_alike_is_inconclusive():
+    result, _ = check(
+        lambda code, language, input_data: completed("Traceback", 1),
+        inputs=["", "1\n"]
+    )
+    
+    assert result["checked"] is False
+    assert result["inconclusive"] == 2
+    assert all(case["inconclusive"] for case in result["cases"])
+
+def test_both_timing_out_is_inconclusive_but_other_inputs_count():
+    def handler(code, language, input_data):
+        if input_data:
+            return {"status": "timeout", "output": "", "error": "", "exit_code": None}
+        return "same"
+    
+    result, _ = check(handler, inputs=["", "1\n"])
+    
+    assert result["checked"] is True
+    assert result["equivalent"] is True
+    assert (result["passed"], result["failed"], result["inconclusive"]) == (1, 0, 1)
+    assert result["score"] == 1.0
+
+def test_spilled_outputs_with_the_same_handle_match():
+    result, _ = check(
+        lambda code, language, input_data: spilled("x\n" * 10, "a" * 64),
+        inputs=[""]
+    )
+    
+    assert result["equivalent"] is True
+    assert result["cases"][0]["output_spilled"] is True
+
+def test_spilled_outputs_with_equal_heads_are_inconclusive():
+    # Same first 64 KiB, different after it: only the handles differ
+    result, _ = check(
+        lambda code, language, input_data: spilled("x\n" * 10, "a" * 64 if code == "original" else "b" * 64),
+        inputs=[""]
+    )
+    
+    assert result["checked"] is False
+    assert result["cases"][0]["inconclusive"] is True
+
+def test_spilled_outputs_with_different_heads_are_not_equivalent():
+    result, _ = check(
+        lambda code, language, input_data: spilled(f"{code}\nx", code * 8),
+        inputs=[""]
+    )
+    
+    assert result["equivalent"] is False
+
+def test_results_are_cached_by_code_and_inputs():
+    backend = StubExecutionBackend(lambda code, language, input_data: "same")
+    checker = EquivalenceChecker(backend=backend)
+    
+    async def run_twice():
+        first = await checker.check("a", "b", "python", "javascript", test_inputs=["1\n"])
+        second = await checker.check("a", "b", "python", "javascript", test_inputs=["1\n"])
+        return first, second
+    
+    first, second = asyncio.run(run_twice())
+    assert first is second
+    assert len(backend.calls) == 2
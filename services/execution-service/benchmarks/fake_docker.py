@@ -0,0 +1,272 @@
+"""In-process stand-in for the docker SDK client used by the execution service.
+
+Every call sleeps for a configurable latency instead of talking to a daemon.
+The sleeps block the calling thread, as docker-py's HTTP calls do, so event
+loop stalls caused by synchronous Docker calls show up in benchmarks.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+DEFAULT_LATENCIES = {
+    "create": 0.050,
+    "start": 0.030,
+    "put_archive": 0.005,
+    "exec": 0.020,
+    "stats": 0.010,
+    "remove": 0.020,
+    "stop": 0.010,
+    "list": 0.005,
+    "image": 0.001
+}
+
+class ExecResult:
+    def __init__(self, exit_code: int, output: bytes):
+        self.exit_code = exit_code
+        self.output = output
+
+class FakeSocket:
+    """Iterable exec output stream with the `_sock` attribute the executor writes stdin to"""
+
+    def __init__(self, chunks: List[bytes], chunk_delay: float):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._sock = self
+
+    def send(self, data: bytes) -> int:
+        return len(data)
+
+    def shutdown(self, how: int):
+        pass
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield chunk
+
+class FakeAPI:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self._execs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def exec_create(self, container_id: str, command, **kwargs) -> Dict:
+        self.client._sleep("exec")
+        exec_id = uuid.uuid4().hex
+        with self._lock:
+            self._execs[exec_id] = {"container_id": container_id, "command": command}
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id: str, **kwargs) -> FakeSocket:
+        output = self.client.output
+        size = max(1, len(output) // self.client.stream_chunks)
+        chunks = [output[i:i + size] for i in range(0, len(output), size)]
+        return FakeSocket(chunks, self.client.latencies["exec"] / max(1, len(chunks)))
+
+    def exec_inspect(self, exec_id: str) -> Dict:
+        with self._lock:
+            self._execs.pop(exec_id, None)
+        return {"ExitCode": self.client.exit_code, "Running": False}
+
+    def remove_container(self, container_id: str, force: bool = False):
+        self.client._sleep("remove")
+        with self.client._lock:
+            container = self.client._containers.get(container_id)
+        if container is not None:
+            self.client._remove(container)
+
+class FakeEventStream:
+    """Blocking iterator of container events, like docker-py's CancellableStream"""
+
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self.events: queue.Queue = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        with self.client._lock:
+            if self in self.client._event_streams:
+                self.client._event_streams.remove(self)
+        self.events.put(None)
+
+class FakeContainer:
+    def __init__(self, client: "FakeDockerClient", config: Dict):
+        self.client = client
+        self.id = uuid.uuid4().hex + uuid.uuid4().hex
+        self.labels = dict(config.get("labels") or {})
+        self.attrs = {"Config": config}
+        self.status = "created"
+        self.files: Dict[str, int] = {}
+
+    def start(self):
+        self.client._sleep("start")
+        self.status = "running"
+
+    def stop(self, timeout: int = 10):
+        self.client._sleep("stop")
+        self.status = "exited"
+
+    def remove(self, force: bool = False):
+        self.client._sleep("remove")
+        self.client._remove(self)
+
+    def put_archive(self, path: str, data) -> bool:
+        self.client._sleep("put_archive")
+        if not isinstance(data, (bytes, bytearray)):
+            # Drain streamed archives the way the HTTP client would
+            data = b"".join(bytes(chunk) for chunk in data)
+        self.files[path] = self.files.get(path, 0) + len(data)
+        self.client.bytes_uploaded += len(data)
+        return True
+
+    def exec_run(self, command, **kwargs) -> ExecResult:
+        self.client._sleep("exec")
+        return ExecResult(self.client.exit_code, self.client.output)
+
+    def stats(self, stream: bool = False) -> Dict:
+        self.client._sleep("stats")
+        return {
+            "memory_stats": {"usage": 24 * 1024 * 1024},
+            "cpu_stats": {"cpu_usage": {"total_usage": 1000000}}
+        }
+
+    def logs(self, **kwargs) -> bytes:
+        return self.client.output
+
+class FakeContainers:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+
+    def create(self, **config) -> FakeContainer:
+        self.client._sleep("create")
+        container = FakeContainer(self.client, config)
+        with self.client._lock:
+            self.client._containers[container.id] = container
+            self.client.containers_created += 1
+        self.client._emit(container, "create")
+        return container
+
+    def list(self, all: bool = False, filters: Optional[Dict] = None) -> List[FakeContainer]:
+        self.client._sleep("list")
+        with self.client._lock:
+            return list(self.client._containers.values())
+
+    def get(self, container_id: str) -> FakeContainer:
+        with self.client._lock:
+            return self.client._containers[container_id]
+
+class FakeImages:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+
+    def get(self, image: str):
+        self.client._sleep("image")
+        if image in self.client.missing_images:
+            from docker.errors import ImageNotFound
+            raise ImageNotFound(f"No such image: {image}")
+        return {"Id": image}
+
+    def pull(self, image: str):
+        self.client._sleep("image")
+        if image in self.client.missing_images:
+            from docker.errors import NotFound
+            raise NotFound(f"pull access denied for {image}")
+        return {"Id": image}
+
+class FakeDockerClient:
+    """docker.DockerClient look-alike with per-operation latencies in seconds"""
+
+    def __init__(
+        self,
+        latencies: Optional[Dict[str, float]] = None,
+        output: bytes = b"Hello from the fake sandbox\n",
+        exit_code: int = 0,
+        stream_chunks: int = 4,
+        missing_images: Optional[List[str]] = None
+    ):
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.output = output
+        self.exit_code = exit_code
+        self.stream_chunks = stream_chunks
+        # Images that neither exist locally nor can be pulled
+        self.missing_images = set(missing_images or [])
+        # Operation -> exception raised instead of performing it, to simulate a failing daemon
+        self.errors: Dict[str, Exception] = {}
+        self.api = FakeAPI(self)
+        self.containers = FakeContainers(self)
+        self.images = FakeImages(self)
+        self._containers: Dict[str, FakeContainer] = {}
+        self._event_streams: List[FakeEventStream] = []
+        self._lock = threading.Lock()
+        self.containers_created = 0
+        self.bytes_uploaded = 0
+        self.call_counts: Dict[str, int] = {}
+
+    def _sleep(self, operation: str):
+        with self._lock:
+            self.call_counts[operation] = self.call_counts.get(operation, 0) + 1
+        if operation in self.errors:
+            raise self.errors[operation]
+        latency = self.latencies.get(operation, 0)
+        if latency:
+            time.sleep(latency)
+
+    def _remove(self, container: FakeContainer):
+        with self._lock:
+            removed = self._containers.pop(container.id, None)
+        if removed is not None:
+            if container.status == "running":
+                self._emit(container, "die", exitCode="137")
+            self._emit(container, "destroy")
+
+    def _emit(self, container: FakeContainer, action: str, **attributes):
+        now = time.time_ns()
+        event = {
+            "Type": "container",
+            "Action": action,
+            "Actor": {"ID": container.id, "Attributes": {**container.labels, **attributes}},
+            "time": now // 1_000_000_000,
+            "timeNano": now
+        }
+        with self._lock:
+            streams = list(self._event_streams)
+        for stream in streams:
+            stream.events.put(event)
+
+    def events(self, **kwargs) -> FakeEventStream:
+        stream = FakeEventStream(self)
+        with self._lock:
+            self._event_streams.append(stream)
+        return stream
+
+    def ping(self) -> bool:
+        self._sleep("ping")
+        return True
+
+    def close(self):
+        pass
+
+    def get_counters(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": dict(self.call_counts),
+                "containers_created": self.containers_created,
+                "containers_alive": len(self._containers),
+                "bytes_uploaded": self.bytes_uploaded
+            }
+
+    def reset_counters(self):
+        with self._lock:
+            self.call_counts = {}
+            self.containers_created = 0
+            self.bytes_uploaded = 0
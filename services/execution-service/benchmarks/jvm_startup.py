@@ -0,0 +1,182 @@
+"""Measure JVM language startup against a real Docker daemon.
+
+For Java, Kotlin and Scala, runs a hello-world program through the
+language's run command, repeatedly, in one container per variant:
+
+    base      the stock image and commands
+    prepared  the prepared image (CDS archive, tuned flags), cold compiler
+    daemon    the prepared image with the resident compile daemon (Java, Kotlin)
+
+Setup commands (e.g. installing kotlinc in the stock image) are timed
+separately and excluded from the run times. Prepared images are built on
+first use, which takes a few minutes.
+
+Usage (from services/execution-service):
+
+    python -m benchmarks.jvm_startup --languages java,kotlin,scala --runs 10 \
+        --output jvm-startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import docker
+
+from src.services.code_executor import CodeExecutor
+from src.services.container_manager import ContainerManager, WARM_CONTAINER_COMMAND
+from src.services.jvm_startup import (
+    JVM_IMAGES,
+    PREPARED_JVM_CONFIGS,
+    JvmImageBuilder,
+    compile_daemon_ready,
+    start_compile_daemon
+)
+
+from .run_benchmark import _git_revision, percentile
+
+HELLO = {
+    "java": 'public class Main {\n    public static void main(String[] args) {\n        System.out.println("Hello");\n    }\n}\n',
+    "kotlin": 'fun main() {\n    println("Hello")\n}\n',
+    "scala": 'println("Hello")\n'
+}
+
+VARIANTS = ["base", "prepared", "daemon"]
+
+async def _wait_for_daemon(container, timeout: float = 180) -> float:
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    while not compile_daemon_ready(container):
+        if time.monotonic() > deadline:
+            raise RuntimeError("Compile daemon did not become ready")
+        await asyncio.sleep(0.25)
+    return time.perf_counter() - start
+
+async def measure(executor: CodeExecutor, language: str, variant: str, runs: int) -> Dict:
+    config = executor.language_configs[language]
+    if variant != "base":
+        config = executor._prepared_config(config, PREPARED_JVM_CONFIGS[language])
+
+    manager = executor.container_manager
+    execution_id = f"jvm-bench-{uuid.uuid4().hex[:12]}"
+    container = await manager.create_container(
+        image=config["image"],
+        command=WARM_CONTAINER_COMMAND,
+        memory_limit=config["memory_limit"],
+        execution_id=execution_id
+    )
+
+    try:
+        container.start()
+
+        setup_start = time.perf_counter()
+        for setup_cmd in config.get("setup_commands", []):
+            # Package installs need root, which the service's own setup runs lack
+            container.exec_run(["sh", "-c", setup_cmd], user="root", workdir='/app')
+        setup_time = time.perf_counter() - setup_start
+
+        daemon_ready = None
+        if variant == "daemon":
+            start_compile_daemon(container)
+            daemon_ready = await _wait_for_daemon(container)
+
+        executor.code_injector.inject(
+            container,
+            [(executor._code_filename(config), HELLO[language].encode('utf-8'))],
+            config,
+            manager.workspace_for(container)
+        )
+
+        times: List[float] = []
+        failures = 0
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = container.exec_run(config["run_command"], workdir='/app')
+            elapsed = time.perf_counter() - start
+            if result.exit_code == 0 and b"Hello" in result.output:
+                times.append(elapsed)
+            else:
+                failures += 1
+                print(result.output.decode('utf-8', 'replace')[-500:], file=sys.stderr)
+    finally:
+        await manager.cleanup_container(execution_id)
+
+    return {
+        "language": language,
+        "variant": variant,
+        "image": config["image"],
+        "runs": runs,
+        "failures": failures,
+        "first_ms": round(times[0] * 1000, 1) if times else None,
+        "p50_ms": round(percentile(times, 0.50) * 1000, 1),
+        "p90_ms": round(percentile(times, 0.90) * 1000, 1),
+        "mean_ms": round(statistics.fmean(times) * 1000, 1) if times else 0.0,
+        "setup_s": round(setup_time, 2),
+        "daemon_ready_s": round(daemon_ready, 2) if daemon_ready is not None else None
+    }
+
+async def run(args) -> Dict:
+    docker_client = docker.from_env()
+    manager = ContainerManager(docker_client)
+    executor = CodeExecutor(manager)
+
+    builder = JvmImageBuilder(docker_client, executor.code_injector)
+    for name, image in JVM_IMAGES.items():
+        if set(image["languages"]) & set(args.languages):
+            print(f"Preparing {image['tag']}...", file=sys.stderr)
+            builder.ensure(name)
+
+    results = []
+    try:
+        for language in args.languages:
+            for variant in args.variants:
+                if variant == "daemon" and not PREPARED_JVM_CONFIGS[language].get("compile_daemon"):
+                    continue
+                result = await measure(executor, language, variant, args.runs)
+                results.append(result)
+                print(
+                    f"{language:7} {variant:9} first={result['first_ms']}ms "
+                    f"p50={result['p50_ms']}ms p90={result['p90_ms']}ms "
+                    f"failures={result['failures']}",
+                    file=sys.stderr
+                )
+    finally:
+        await manager.cleanup_all_containers()
+
+    return {
+        "service": "execution-service",
+        "benchmark": "jvm-startup",
+        "revision": _git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "results": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--languages", default="java,kotlin,scala",
+                        type=lambda value: value.split(","))
+    parser.add_argument("--variants", default=",".join(VARIANTS),
+                        type=lambda value: value.split(","))
+    parser.add_argument("--runs", type=int, default=10, help="Runs per language and variant")
+    parser.add_argument("--output", default="jvm-startup.json")
+    args = parser.parse_args()
+
+    unknown = set(args.languages) - set(HELLO)
+    if unknown:
+        parser.error(f"Unsupported languages: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
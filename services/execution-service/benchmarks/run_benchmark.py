@@ -0,0 +1,361 @@
+"""Benchmark the execution service against a fake Docker backend.
+
+Runs the real FastAPI app under uvicorn in a background thread, with
+docker.from_env() replaced by FakeDockerClient, and drives /api/v1/execute,
+the WebSocket stream and /api/v1/stats at fixed concurrency levels. The
+server's event loop is sampled to measure how long it was blocked.
+
+Usage (from services/execution-service):
+
+    python -m benchmarks.run_benchmark --concurrency 1,8,32 --requests 200 \
+        --latency create=0.05,exec=0.02 --output bench-results.json
+
+Compare two result files with --compare old.json. With --hosts N the service
+is given N fake Docker hosts through DOCKER_HOSTS, and Docker counters are
+reported per host.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import docker
+import httpx
+import uvicorn
+import websockets
+
+from src.services.stream_protocol import BINARY_SUBPROTOCOL
+
+from .fake_docker import DEFAULT_LATENCIES, FakeDockerClient
+
+SAMPLE_CODE = {
+    "python": 'print("Hello, World!")',
+    "javascript": 'console.log("Hello, World!");',
+    "cpp": '#include <iostream>\nint main() { std::cout << "Hello" << std::endl; }'
+}
+
+# Messages that end a streamed execution
+STREAM_FINAL_TYPES = {"complete", "error", "timeout"}
+
+class LoopMonitor:
+    """Measures how late a periodic timer fires on the server's event loop"""
+
+    def __init__(self, interval: float = 0.005, threshold: float = 0.001):
+        self.interval = interval
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.blocked_time = 0.0
+            self.max_lag = 0.0
+            self.stalls = 0
+            self.samples = 0
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            with self._lock:
+                self.samples += 1
+                if lag > self.threshold:
+                    self.blocked_time += lag
+                    self.stalls += 1
+                self.max_lag = max(self.max_lag, lag)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "blocked_ms": round(self.blocked_time * 1000, 2),
+                "max_lag_ms": round(self.max_lag * 1000, 2),
+                "stalls": self.stalls
+            }
+
+class BenchmarkServer:
+    """The execution service app served by uvicorn on its own thread and event loop"""
+
+    def __init__(self, fake_dockers: List[FakeDockerClient]):
+        self.fake_dockers = fake_dockers
+        self.monitor = LoopMonitor()
+        self.port = self._free_port()
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        # The service creates its clients in the lifespan handler
+        docker.from_env = lambda *args, **kwargs: self.fake_dockers[0]
+        if len(self.fake_dockers) > 1:
+            hosts = {f"fake://{index}": fake for index, fake in enumerate(self.fake_dockers)}
+            os.environ["DOCKER_HOSTS"] = ",".join(f"fake-{index}=fake://{index}" for index in range(len(hosts)))
+            docker.DockerClient = lambda base_url, **kwargs: hosts[base_url]
+
+        from src.main import app
+
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Execution service did not start")
+            time.sleep(0.05)
+
+    async def _serve(self):
+        monitor_task = asyncio.create_task(self.monitor.run())
+        try:
+            await self._server.serve()
+        finally:
+            monitor_task.cancel()
+
+    def reset_counters(self):
+        for fake in self.fake_dockers:
+            fake.reset_counters()
+
+    def get_counters(self) -> Dict:
+        if len(self.fake_dockers) == 1:
+            return self.fake_dockers[0].get_counters()
+        return {f"fake-{index}": fake.get_counters() for index, fake in enumerate(self.fake_dockers)}
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+async def _run_workers(concurrency: int, total: int, request) -> Dict:
+    """Call `request(index)` `total` times with `concurrency` workers; returns latencies and errors"""
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            start = time.perf_counter()
+            try:
+                await request(index)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {"latencies": latencies, "errors": errors, "elapsed": elapsed}
+
+def _execute_request(client: httpx.AsyncClient, language: str):
+    payload = {"code": SAMPLE_CODE[language], "language": language}
+
+    async def request(index: int):
+        response = await client.post("/api/v1/execute", json=payload)
+        response.raise_for_status()
+        if response.json().get("status") != "completed":
+            raise RuntimeError(response.json().get("error") or "execution did not complete")
+
+    return request
+
+def _stream_request(server: BenchmarkServer, language: str, protocol: str):
+    payload = json.dumps({"code": SAMPLE_CODE[language], "language": language})
+    base = server.base_url.replace("http://", "ws://")
+    subprotocols = [BINARY_SUBPROTOCOL] if protocol == "binary" else None
+
+    async def request(index: int):
+        async with websockets.connect(
+            f"{base}/api/v1/execute/stream/bench-{uuid.uuid4().hex}", subprotocols=subprotocols
+        ) as ws:
+            await ws.send(payload)
+            while True:
+                frame = await ws.recv()
+                if isinstance(frame, bytes):
+                    # Binary output frame
+                    continue
+                message = json.loads(frame)
+                if message.get("type") in STREAM_FINAL_TYPES:
+                    if message["type"] != "complete":
+                        raise RuntimeError(message.get("message") or message["type"])
+                    return
+
+    return request
+
+def _stats_request(client: httpx.AsyncClient):
+    async def request(index: int):
+        response = await client.get("/api/v1/stats")
+        response.raise_for_status()
+
+    return request
+
+async def run_scenario(
+    server: BenchmarkServer,
+    client: httpx.AsyncClient,
+    scenario: str,
+    language: str,
+    concurrency: int,
+    total: int,
+    stream_protocol: str = "json"
+) -> Dict:
+    if scenario == "execute":
+        request = _execute_request(client, language)
+    elif scenario == "stream":
+        request = _stream_request(server, language, stream_protocol)
+    else:
+        request = _stats_request(client)
+
+    # Warm-up pass so imports and first-use setup don't skew the numbers
+    await _run_workers(min(concurrency, 2), min(total, 4), request)
+
+    server.monitor.reset()
+    server.reset_counters()
+    outcome = await _run_workers(concurrency, total, request)
+    latencies = outcome["latencies"]
+
+    return {
+        "scenario": scenario,
+        "language": language if scenario != "stats" else None,
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": len(outcome["errors"]),
+        "error_samples": sorted(set(outcome["errors"]))[:5],
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / outcome["elapsed"], 2) if outcome["elapsed"] else 0.0,
+        "event_loop": server.monitor.snapshot(),
+        "docker": server.get_counters()
+    }
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def _parse_latencies(value: str) -> Dict[str, float]:
+    latencies = {}
+    for item in filter(None, value.split(",")):
+        name, _, seconds = item.partition("=")
+        if name not in DEFAULT_LATENCIES:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}; expected one of {sorted(DEFAULT_LATENCIES)}")
+        latencies[name] = float(seconds)
+    return latencies
+
+async def run_benchmarks(args) -> Dict:
+    fake_dockers = [FakeDockerClient(latencies=args.latency) for _ in range(args.hosts)]
+    server = BenchmarkServer(fake_dockers)
+    server.start()
+
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+        async with httpx.AsyncClient(base_url=server.base_url, timeout=120, limits=limits) as client:
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_scenario(
+                        server, client, scenario, args.language, concurrency, args.requests,
+                        args.stream_protocol
+                    )
+                    results.append(result)
+                    print(
+                        f"{scenario:8} c={concurrency:<4} p50={result['p50_ms']:>8.2f}ms "
+                        f"p99={result['p99_ms']:>8.2f}ms {result['throughput_rps']:>8.2f} req/s "
+                        f"loop blocked={result['event_loop']['blocked_ms']:.0f}ms "
+                        f"errors={result['errors']}",
+                        file=sys.stderr
+                    )
+    finally:
+        server.stop()
+
+    return {
+        "service": "execution-service",
+        "revision": _git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "docker_latencies": fake_dockers[0].latencies,
+        "docker_hosts": args.hosts,
+        "stream_protocol": args.stream_protocol,
+        "results": results
+    }
+
+def compare(previous: Dict, current: Dict) -> List[str]:
+    """Summarize p50/p99/throughput changes per scenario between two result files"""
+
+    def key(result):
+        return (result["scenario"], result["language"], result["concurrency"])
+
+    before = {key(result): result for result in previous.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p99_ms", "throughput_rps"):
+            if old[metric]:
+                changes.append(f"{metric} {100 * (result[metric] - old[metric]) / old[metric]:+.1f}%")
+        lines.append(f"{result['scenario']} c={result['concurrency']}: " + ", ".join(changes))
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda value: [int(item) for item in value.split(",")])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--scenarios", default="execute,stream,stats",
+                        type=lambda value: value.split(","))
+    parser.add_argument("--language", default="python", choices=sorted(SAMPLE_CODE))
+    parser.add_argument("--latency", type=_parse_latencies, default={},
+                        help="Fake Docker latencies in seconds, e.g. create=0.05,exec=0.02")
+    parser.add_argument("--stream-protocol", default="json", choices=["json", "binary"],
+                        help="WebSocket protocol for the stream scenario")
+    parser.add_argument("--hosts", type=int, default=1, help="Number of fake Docker hosts")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(json.load(f), report):
+                print(line, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
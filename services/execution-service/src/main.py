@@ -1,40 +1,81 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
-import docker
 import json
+import os
 import uuid
-from typing import Dict, List
-from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from contextlib import aclosing, asynccontextmanager
 
 from .models.execution import ExecutionRequest, ExecutionResponse, ExecutionStatus
+from .models.prewarm import PrewarmRequest, CodeChangedRequest, check_session_id
+from .models.project import ProjectExecutionRequest, BlobCheckRequest, BlobUploadRequest
+from .models.output import StoredOutputExecutionResponse
 from .services.code_executor import CodeExecutor
-from .services.container_manager import ContainerManager
+from .services.container_manager import ContainerManager, CapacityExceeded, WarmContainerBusy
+from .services.docker_hosts import DockerHostPool
+from .services.output_store import OutputBlobStore, is_output_handle
+from .services.sandbox import ProcessSandboxBackend
+from .services.stream_protocol import encoder_for, negotiate
+from .services.project_store import MissingProjectBlobs
+from .services.tracing import (
+    TRACE_TOKEN_HEADER, TRACEPARENT_HEADER, TracingMiddleware, configure_tracer, get_tracer, run_in_executor
+)
 from .core.config import settings
 from .utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# TRACE_SAMPLE_RATE / TRACE_EXPORTER / TRACE_FILE; the sampling decisions of callers that
+# send TRACE_TRUST_TOKEN (the ai-service) take precedence
+configure_tracer("execution-service")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Code Execution Service...")
     
-    # Initialize Docker client
+    # Initialize Docker clients, one per host in DOCKER_HOSTS (default: the local daemon)
     try:
-        docker_client = docker.from_env()
-        app.state.docker_client = docker_client
-        logger.info("Docker client initialized")
+        docker_hosts = DockerHostPool.from_env()
+        app.state.docker_hosts = docker_hosts
+        logger.info(f"Docker clients initialized for {len(docker_hosts.hosts)} host(s)")
     except Exception as e:
         logger.error(f"Failed to initialize Docker client: {e}")
         raise
     
     # Initialize container manager
-    app.state.container_manager = ContainerManager(docker_client)
+    app.state.container_manager = ContainerManager(
+        docker_hosts,
+        workspace_root=os.getenv("EXECUTION_WORKSPACE_ROOT") or None,
+        process_backend=ProcessSandboxBackend.from_env()
+    )
     
     # Initialize code executor
-    app.state.code_executor = CodeExecutor(app.state.container_manager)
+    app.state.code_executor = CodeExecutor(
+        app.state.container_manager,
+        process_languages=[
+            language.strip()
+            for language in os.getenv("PROCESS_SANDBOX_LANGUAGES", "").split(",")
+            if language.strip()
+        ],
+        zygote_languages=[
+            language.strip()
+            for language in os.getenv("ZYGOTE_LANGUAGES", "").split(",")
+            if language.strip()
+        ],
+        output_store=OutputBlobStore.from_env(),
+        inline_output_limit=int(os.getenv("OUTPUT_INLINE_LIMIT", str(64 * 1024)))
+    )
+    
+    # Syntax validators boot in the background; checks report checked: False until they are up
+    if os.getenv("PRESTART_VALIDATORS", "true").lower() == "true":
+        app.state.code_executor.validation_service.start()
+    
+    # Prepared JVM images take minutes to build the first time, so build them in the background
+    if os.getenv("PREPARE_JVM_IMAGES", "false").lower() == "true":
+        asyncio.create_task(app.state.code_executor.prepare_jvm_images())
     
     logger.info("Code Execution Service started successfully")
     
@@ -42,7 +83,12 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Code Execution Service...")
+    await app.state.code_executor.validation_service.close()
     await app.state.container_manager.cleanup_all_containers()
+    app.state.container_manager.stop_event_watchers()
+    if app.state.code_executor.output_store is not None:
+        app.state.code_executor.output_store.close()
+    get_tracer().close()
 
 app = FastAPI(
     title="Code Execution Service",
@@ -59,10 +105,29 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
+
+# Batch execution limits
+MAX_BATCH_SIZE = 20
+BATCH_CONCURRENCY = 4
+MAX_VALIDATION_BATCH_SIZE = 50
+
+# Largest slice of a stored output served by one request
+MAX_OUTPUT_READ = 4 * 1024 * 1024
 
 # Store active WebSocket connections
 active_connections: Dict[str, WebSocket] = {}
 
+def _require_session_id(session_id: Optional[str]) -> Optional[str]:
+    """Reject session ids that are not safe to use in container and workspace names"""
+    
+    if session_id is None:
+        return None
+    try:
+        return check_session_id(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/health")
 async def health_check():
     return {
@@ -71,17 +136,20 @@ async def health_check():
         "version": "1.0.0"
     }
 
-@app.post("/api/v1/execute", response_model=ExecutionResponse)
-async def execute_code(request: ExecutionRequest):
+@app.post("/api/v1/execute", response_model=StoredOutputExecutionResponse)
+async def execute_code(request: ExecutionRequest, session_id: Optional[str] = None):
     """Execute code in a secure Docker container"""
     
+    _require_session_id(session_id)
+    
     try:
         result = await app.state.code_executor.execute_code(
             code=request.code,
             language=request.language,
             input_data=request.input_data,
             timeout=request.timeout,
-            memory_limit=request.memory_limit
+            memory_limit=request.memory_limit,
+            session_id=session_id
         )
         
         return result
@@ -93,11 +161,104 @@ async def execute_code(request: ExecutionRequest):
             detail=f"Code execution failed: {str(e)}"
         )
 
+@app.post("/api/v1/execute/batch")
+async def execute_code_batch(requests: List[ExecutionRequest]):
+    """Execute several independent programs concurrently"""
+    
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size cannot exceed {MAX_BATCH_SIZE} executions"
+        )
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run(request: ExecutionRequest) -> ExecutionResponse:
+        with get_tracer().span("execution.queue"):
+            await semaphore.acquire()
+        try:
+            return await app.state.code_executor.execute_code(
+                code=request.code,
+                language=request.language,
+                input_data=request.input_data,
+                timeout=request.timeout,
+                memory_limit=request.memory_limit
+            )
+        finally:
+            semaphore.release()
+    
+    # execute_code reports failures in the response, so one bad run doesn't fail the batch
+    results = await asyncio.gather(*(run(request) for request in requests))
+    
+    return {
+        "results": results,
+        "total_processed": len(results)
+    }
+
+@app.post("/api/v1/projects/blobs/check")
+async def check_project_blobs(request: BlobCheckRequest):
+    """Report which manifest blobs must be uploaded before running a project"""
+    
+    return {"missing": app.state.code_executor.project_blobs.missing(request.hashes)}
+
+@app.post("/api/v1/projects/blobs")
+async def upload_project_blobs(request: BlobUploadRequest):
+    """Store project blobs keyed by the sha256 of their content"""
+    
+    store = app.state.code_executor.project_blobs
+    
+    try:
+        for digest, content in request.blobs.items():
+            store.put(content.encode('utf-8'), expected_hash=digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"stored": len(request.blobs)}
+
+@app.post("/api/v1/execute/project", response_model=StoredOutputExecutionResponse)
+async def execute_project(request: ProjectExecutionRequest, session_id: Optional[str] = None):
+    """Execute a multi-file project; with a session_id re-runs only send changed files"""
+    
+    _require_session_id(session_id)
+    
+    try:
+        files = app.state.code_executor.project_blobs.resolve(
+            request.files, request.manifest, request.blobs
+        )
+    except MissingProjectBlobs as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(e), "missing": e.hashes}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await app.state.code_executor.execute_project(
+        files=files,
+        language=request.language,
+        entry_point=request.entry_point,
+        build_command=request.build_command,
+        input_data=request.input_data,
+        timeout=request.timeout,
+        memory_limit=request.memory_limit,
+        session_id=session_id
+    )
+
 @app.websocket("/api/v1/execute/stream/{session_id}")
 async def execute_code_stream(websocket: WebSocket, session_id: str):
     """Execute code with real-time output streaming"""
     
-    await websocket.accept()
+    try:
+        check_session_id(session_id)
+    except ValueError:
+        # Policy violation; close before accepting so nothing is registered for it
+        await websocket.close(code=1008)
+        return
+    
+    # Clients that offer the binary subprotocol get raw output frames, others JSON
+    subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+    encoder = encoder_for(subprotocol)
+    await websocket.accept(subprotocol=subprotocol)
     active_connections[session_id] = websocket
     
     try:
@@ -105,25 +266,40 @@ async def execute_code_stream(websocket: WebSocket, session_id: str):
             # Receive execution request
             data = await websocket.receive_text()
             request_data = json.loads(data)
+            # A connection can carry executions from several traces, so each
+            # message may name its own; the handshake header is the fallback
+            traceparent = request_data.pop(TRACEPARENT_HEADER, None) or websocket.headers.get(TRACEPARENT_HEADER)
             
             request = ExecutionRequest(**request_data)
             
             # Execute code with streaming output
-            async for output_chunk in app.state.code_executor.execute_code_stream(
-                code=request.code,
+            with get_tracer().start_trace(
+                "execute.stream",
+                traceparent=traceparent,
+                trusted=get_tracer().is_trusted(websocket.headers.get(TRACE_TOKEN_HEADER)),
                 language=request.language,
-                input_data=request.input_data,
-                timeout=request.timeout,
-                memory_limit=request.memory_limit,
                 session_id=session_id
             ):
-                await websocket.send_text(json.dumps(output_chunk))
+                async with aclosing(app.state.code_executor.execute_code_stream(
+                    code=request.code,
+                    language=request.language,
+                    input_data=request.input_data,
+                    timeout=request.timeout,
+                    memory_limit=request.memory_limit,
+                    session_id=session_id
+                )) as output_chunks:
+                    async for output_chunk in output_chunks:
+                        message = encoder.encode(output_chunk)
+                        if isinstance(message, bytes):
+                            await websocket.send_bytes(message)
+                        else:
+                            await websocket.send_text(message)
                 
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for session {session_id}")
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {str(e)}")
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(encoder.encode({
             "type": "error",
             "message": str(e)
         }))
@@ -134,11 +310,59 @@ async def execute_code_stream(websocket: WebSocket, session_id: str):
         # Cleanup any running containers for this session
         await app.state.container_manager.cleanup_session_containers(session_id)
 
+@app.post("/api/v1/prewarm")
+async def prewarm_container(request: PrewarmRequest):
+    """Reserve a warm container for the language a session has open"""
+    
+    try:
+        return await app.state.code_executor.prewarm(
+            session_id=request.session_id,
+            language=request.language,
+            idle_ttl=request.idle_ttl
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WarmContainerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CapacityExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Prewarm failed for session {request.session_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Prewarm failed: {str(e)}"
+        )
+
+@app.post("/api/v1/prewarm/code", status_code=202)
+async def prewarm_code_changed(request: CodeChangedRequest):
+    """Debounced "code changed" signal; the latest code is pre-written into the warm container"""
+    
+    try:
+        app.state.code_executor.code_changed(
+            request.session_id,
+            request.language,
+            request.code
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"status": "accepted"}
+
+@app.delete("/api/v1/prewarm/{session_id}")
+async def release_prewarmed_container(session_id: str):
+    """Release a session's warm container before its idle TTL"""
+    
+    _require_session_id(session_id)
+    
+    await app.state.container_manager.release_warm_container(session_id)
+    
+    return {"status": "released"}
+
 @app.get("/api/v1/languages")
-async def get_supported_languages():
+async def get_supported_languages(request: Request):
     """Get list of supported programming languages"""
     
-    return app.state.code_executor.get_supported_languages()
+    return app.state.code_executor.supported_languages_response(request)
 
 @app.post("/api/v1/validate")
 async def validate_code(request: ExecutionRequest):
@@ -159,18 +383,118 @@ async def validate_code(request: ExecutionRequest):
             detail=f"Code validation failed: {str(e)}"
         )
 
+@app.post("/api/v1/validate/batch")
+async def validate_code_batch(requests: List[ExecutionRequest]):
+    """Validate several snippets in one call"""
+    
+    if len(requests) > MAX_VALIDATION_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size cannot exceed {MAX_VALIDATION_BATCH_SIZE} snippets"
+        )
+    
+    results = await app.state.code_executor.validate_code_batch(
+        [(request.code, request.language) for request in requests]
+    )
+    
+    return {
+        "results": results,
+        "total_processed": len(results)
+    }
+
+def _parse_byte_range(header: str, size: int) -> Tuple[int, int]:
+    """Parse a single-range Range header into [start, end)"""
+    
+    unit, _, spec = header.partition("=")
+    first, _, last = spec.strip().partition("-")
+    if unit.strip() != "bytes" or "," in spec or not (first or last):
+        raise ValueError(f"Unsupported range: {header}")
+    if not first:
+        # Suffix range: the last N bytes
+        return max(size - int(last), 0), size
+    return int(first), min(int(last) + 1, size) if last else size
+
+@app.get("/api/v1/outputs/{handle}")
+async def read_output(
+    handle: str,
+    request: Request,
+    start: int = 0,
+    end: Optional[int] = None,
+    tail: Optional[int] = None
+):
+    """Read a stored output: bytes [start, end), the last `tail` bytes, or a Range header"""
+    
+    store = app.state.code_executor.output_store
+    size = store.size(handle) if store is not None and is_output_handle(handle) else None
+    if size is None:
+        raise HTTPException(status_code=404, detail="Output not found")
+    
+    try:
+        if tail is not None:
+            start, end = max(size - tail, 0), size
+        elif request.headers.get("range"):
+            start, end = _parse_byte_range(request.headers["range"], size)
+    except ValueError as e:
+        raise HTTPException(status_code=416, detail=str(e))
+    
+    end = size if end is None else min(end, size)
+    # An empty slice of a non-empty output has no Content-Range to describe it
+    if start < 0 or start > end or (start == end and size > 0):
+        raise HTTPException(
+            status_code=416,
+            detail=f"Range outside output of {size} bytes",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    end = min(end, start + MAX_OUTPUT_READ)
+    
+    data = await run_in_executor(None, store.read, handle, start, end)
+    if data is None:
+        # Evicted since the size lookup
+        raise HTTPException(status_code=404, detail="Output not found")
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        # Content-addressed, so a handle's bytes never change
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{handle}"'
+    }
+    partial = start > 0 or end < size
+    if partial:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    
+    return Response(
+        content=data,
+        status_code=206 if partial else 200,
+        media_type="application/octet-stream",
+        headers=headers
+    )
+
 @app.get("/api/v1/stats")
 async def get_execution_stats():
     """Get execution service statistics"""
     
     stats = await app.state.container_manager.get_stats()
+    output_store = app.state.code_executor.output_store
     
     return {
         "active_containers": stats["active_containers"],
         "total_executions": stats["total_executions"],
         "average_execution_time": stats["average_execution_time"],
         "memory_usage": stats["memory_usage"],
-        "cpu_usage": stats["cpu_usage"]
+        "cpu_usage": stats["cpu_usage"],
+        "validation": app.state.code_executor.validation_service.get_stats(),
+        "outputs": output_store.get_stats() if output_store is not None else None,
+        "tracing": get_tracer().get_stats()
+    }
+
+@app.get("/api/v1/traces")
+async def get_traces(trace_id: Optional[str] = None, limit: int = 500):
+    """Recently sampled spans, optionally for one trace"""
+    
+    tracer = get_tracer()
+    return {
+        "spans": tracer.find(trace_id, min(limit, 5000)),
+        "stats": tracer.get_stats()
     }
 
 if __name__ == "__main__":
@@ -179,5 +503,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8002,
         reload=settings.DEBUG,
-        log_level="info"
+        log_level="info",
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
     )
@@ -0,0 +1,17 @@
+from typing import Optional
+from pydantic import BaseModel
+
+from .execution import ExecutionResponse
+
+class OutputRef(BaseModel):
+    """A large output kept in the output store, readable from /api/v1/outputs/{handle}"""
+    # sha256 of the full output
+    handle: str
+    size: int
+    # Bytes of it included inline in the response field
+    inline_bytes: int
+
+class StoredOutputExecutionResponse(ExecutionResponse):
+    """Execution response whose output or error may have spilled to the output store"""
+    output_ref: Optional[OutputRef] = None
+    error_ref: Optional[OutputRef] = None
@@ -0,0 +1,29 @@
+import re
+from typing import Optional
+from pydantic import BaseModel, Field, validator
+
+# Session ids name warm containers, labels and workspaces, so keep them plain
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def check_session_id(session_id: str) -> str:
+    """Return session_id if it is 1-64 letters, digits, '-' or '_', else raise ValueError"""
+    
+    if not SESSION_ID_PATTERN.fullmatch(session_id):
+        raise ValueError("session_id must be 1-64 letters, digits, '-' or '_'")
+    return session_id
+
+class PrewarmRequest(BaseModel):
+    """Reserve a warm container for the language open in an editor session"""
+    language: str
+    session_id: str
+    idle_ttl: Optional[int] = Field(default=None, ge=10, le=900)
+
+    _check_session_id = validator("session_id", allow_reuse=True)(check_session_id)
+
+class CodeChangedRequest(BaseModel):
+    """Editor buffer contents to pre-write into a session's warm container"""
+    session_id: str
+    language: str
+    code: str
+
+    _check_session_id = validator("session_id", allow_reuse=True)(check_session_id)
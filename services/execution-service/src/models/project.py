@@ -0,0 +1,27 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+class ProjectExecutionRequest(BaseModel):
+    """Run a multi-file project given as inline files and/or a content-addressed manifest"""
+    language: str
+    # path -> file content
+    files: Dict[str, str] = Field(default_factory=dict)
+    # path -> sha256 of the file content (UTF-8)
+    manifest: Dict[str, str] = Field(default_factory=dict)
+    # sha256 -> content for manifest entries the service reported missing
+    blobs: Dict[str, str] = Field(default_factory=dict)
+    # File the language's default project command runs, e.g. "app/main.py"
+    entry_point: Optional[str] = None
+    # Shell command run in /app instead of the default, e.g. "make && ./app"
+    build_command: Optional[str] = None
+    input_data: Optional[str] = None
+    timeout: Optional[int] = Field(default=None, ge=1, le=300)
+    memory_limit: Optional[str] = None
+
+class BlobCheckRequest(BaseModel):
+    """Hashes a client wants to reference from a project manifest"""
+    hashes: List[str]
+
+class BlobUploadRequest(BaseModel):
+    """Project blobs keyed by the sha256 of their content"""
+    blobs: Dict[str, str]
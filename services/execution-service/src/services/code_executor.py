@@ -1,20 +1,78 @@
 import asyncio
+import functools
+import hashlib
 import json
+import posixpath
+import shlex
 import time
 import uuid
+from contextlib import aclosing
 from typing import Dict, List, Optional, AsyncGenerator
 import docker
 from docker.errors import ContainerError, ImageNotFound, APIError
+from fastapi import Request, Response
 
 from ..models.execution import ExecutionRequest, ExecutionResponse, ExecutionStatus
+from ..models.output import OutputRef, StoredOutputExecutionResponse
 from ..utils.logger import get_logger
-from .container_manager import ContainerManager
+from .code_injector import CodeInjector
+from .container_manager import ContainerManager, CapacityExceeded
+from .project_store import ProjectBlobStore, normalize_project_path
+from .validation_service import ValidationService
+from .jvm_startup import JVM_IMAGES, PREPARED_JVM_CONFIGS, JvmImageBuilder, start_compile_daemon
+from .zygote import ZygoteRunner
+from .static_payload import CachedJSONPayload
+from .output_store import OutputBlobStore
+from .tracing import get_tracer, run_in_executor, traced
 
 logger = get_logger(__name__)
 
+OOM_MESSAGE = "Memory limit of {memory_limit} exceeded; the program was killed by the out-of-memory killer"
+
+def incremental_build_command(
+    source: str,
+    artifact: str,
+    compile_cmd: str,
+    run_cmd: str,
+    env: str = ""
+) -> List[str]:
+    """Shell command that recompiles only when the source differs from the last successful build"""
+    
+    script = (
+        f"cd /app && {env}"
+        f"if ! sha1sum -c .build.sha1 >/dev/null 2>&1 || [ ! -e {artifact} ]; then "
+        f"({compile_cmd} && sha1sum {source} > .build.sha1) || exit $?; "
+        f"fi; {run_cmd}"
+    )
+    return ["sh", "-c", script]
+
+# ccache keeps object files in the session workspace, capped to fit the /app tmpfs
+CCACHE_ENV = "export CCACHE_DIR=/app/.ccache CCACHE_MAXSIZE=50M; "
+CCACHE_PREFIX = "$(command -v ccache >/dev/null 2>&1 && echo ccache) "
+
 class CodeExecutor:
-    def __init__(self, container_manager: ContainerManager):
+    def __init__(
+        self,
+        container_manager: ContainerManager,
+        process_languages: Optional[List[str]] = None,
+        zygote_languages: Optional[List[str]] = None,
+        output_store: Optional[OutputBlobStore] = None,
+        inline_output_limit: int = 64 * 1024
+    ):
         self.container_manager = container_manager
+        # Languages run in process sandboxes instead of Docker containers when their rootfs exists
+        self.process_languages = set(process_languages or [])
+        # Languages whose warm containers fork executions from a preloaded interpreter
+        self.zygote_languages = {
+            language for language in (zygote_languages or []) if ZygoteRunner.supports(language)
+        }
+        self.code_injector = CodeInjector()
+        self.project_blobs = ProjectBlobStore()
+        self.validation_service = ValidationService(container_manager)
+        self.zygotes = ZygoteRunner(self.code_injector)
+        # Outputs longer than inline_output_limit characters go to the store, when there is one
+        self.output_store = output_store
+        self.inline_output_limit = inline_output_limit
         
         # Language configurations
         self.language_configs = {
@@ -44,6 +102,10 @@ class CodeExecutor:
                 "image": "openjdk:11-jdk-slim",
                 "file_extension": ".java",
                 "run_command": ["sh", "-c", "cd /app && javac Main.java && java Main"],
+                "incremental_command": incremental_build_command(
+                    "Main.java", "Main.class", "javac Main.java", "java Main"
+                ),
+                "project_command": "cd /app && javac -d .classes $(find . -name '*.java') && java -cp .classes {main_class}",
                 "timeout": 45,
                 "memory_limit": "256m",
                 "main_class": "Main"
@@ -52,6 +114,10 @@ class CodeExecutor:
                 "image": "gcc:latest",
                 "file_extension": ".cpp",
                 "run_command": ["sh", "-c", "cd /app && g++ -o main code.cpp && ./main"],
+                "incremental_command": incremental_build_command(
+                    "code.cpp", "main", CCACHE_PREFIX + "g++ -o main code.cpp", "./main", env=CCACHE_ENV
+                ),
+                "project_command": "cd /app && g++ -I. -o main $(find . -name '*.cpp') && ./main",
                 "timeout": 45,
                 "memory_limit": "256m"
             },
@@ -59,6 +125,10 @@ class CodeExecutor:
                 "image": "gcc:latest",
                 "file_extension": ".c",
                 "run_command": ["sh", "-c", "cd /app && gcc -o main code.c && ./main"],
+                "incremental_command": incremental_build_command(
+                    "code.c", "main", CCACHE_PREFIX + "gcc -o main code.c", "./main", env=CCACHE_ENV
+                ),
+                "project_command": "cd /app && gcc -I. -o main $(find . -name '*.c') && ./main",
                 "timeout": 45,
                 "memory_limit": "256m"
             },
@@ -66,6 +136,7 @@ class CodeExecutor:
                 "image": "golang:1.21-alpine",
                 "file_extension": ".go",
                 "run_command": ["go", "run", "/app/code.go"],
+                "project_command": "cd /app && if [ -f go.mod ]; then go run .; else go run $(ls *.go | grep -v '_test.go$'); fi",
                 "timeout": 30,
                 "memory_limit": "128m"
             },
@@ -73,6 +144,10 @@ class CodeExecutor:
                 "image": "rust:latest",
                 "file_extension": ".rs",
                 "run_command": ["sh", "-c", "cd /app && rustc code.rs && ./code"],
+                "incremental_command": incremental_build_command(
+                    "code.rs", "code", "rustc -C incremental=/app/.rustc-incremental code.rs", "./code"
+                ),
+                "project_command": "cd /app && rustc -C incremental=/app/.rustc-incremental -o main {entry} && ./main",
                 "timeout": 60,
                 "memory_limit": "256m"
             },
@@ -109,6 +184,10 @@ class CodeExecutor:
                 "image": "openjdk:11-jdk-slim",
                 "file_extension": ".kt",
                 "run_command": ["sh", "-c", "cd /app && kotlinc code.kt -include-runtime -d code.jar && java -jar code.jar"],
+                "incremental_command": incremental_build_command(
+                    "code.kt", "code.jar", "kotlinc code.kt -include-runtime -d code.jar", "java -jar code.jar"
+                ),
+                "project_command": "cd /app && kotlinc $(find . -name '*.kt') -include-runtime -d code.jar && java -jar code.jar",
                 "timeout": 60,
                 "memory_limit": "256m",
                 "setup_commands": ["apt-get update && apt-get install -y wget unzip && wget -O kotlin.zip https://github.com/JetBrains/kotlin/releases/download/v1.9.0/kotlin-compiler-1.9.0.zip && unzip kotlin.zip && mv kotlinc /opt/ && ln -s /opt/kotlinc/bin/kotlinc /usr/local/bin/kotlinc"]
@@ -149,19 +228,30 @@ class CodeExecutor:
                 "memory_limit": "128m"
             }
         }
+        
+        # Serialized on first request; invalidated whenever language_configs changes
+        self.languages_payload = CachedJSONPayload(self._build_supported_languages)
+        
+        # Debounced "code changed" writes into warm containers, keyed by session_id
+        self._pending_code_writes: Dict[str, asyncio.Task] = {}
+        self.code_write_debounce = 0.3
 
+    @traced("execution")
     async def execute_code(
         self,
         code: str,
         language: str,
         input_data: Optional[str] = None,
         timeout: Optional[int] = None,
-        memory_limit: Optional[str] = None
+        memory_limit: Optional[str] = None,
+        session_id: Optional[str] = None
     ) -> ExecutionResponse:
         """Execute code in a secure Docker container"""
         
         execution_id = str(uuid.uuid4())
         start_time = time.time()
+        warm = None
+        healthy = True
         
         try:
             # Validate language
@@ -177,34 +267,62 @@ class CodeExecutor:
             # Prepare code file
             code_content = self._prepare_code(code, language, config)
             
-            # Create and run container
-            container = await self.container_manager.create_container(
-                image=config["image"],
-                command=config["run_command"],
-                memory_limit=exec_memory_limit,
-                timeout=exec_timeout,
-                execution_id=execution_id
+            # Use the session's pre-warmed container when one is reserved
+            if session_id:
+                warm = await self._claim_session_container(
+                    session_id, language, config, exec_memory_limit
+                )
+            run_command = self._run_command(config, warm, exec_timeout)
+            # Compilation runs inside the same exec as the program, so it is
+            # part of the execution.run span rather than a span of its own
+            get_tracer().annotate(
+                language=language,
+                execution_id=execution_id,
+                warm=warm is not None,
+                compiles="incremental_command" in config
             )
             
-            # Write code to container
-            await self._write_code_to_container(container, code_content, config)
-            
-            # Execute setup commands if needed
-            if "setup_commands" in config:
-                for setup_cmd in config["setup_commands"]:
-                    await self._run_setup_command(container, setup_cmd)
+            if warm is not None:
+                container = warm["container"]
+                await self._prepare_warm_container(warm, code_content, config)
+            else:
+                # Create and run container
+                container = await self.container_manager.create_container(
+                    image=config["image"],
+                    command=config["run_command"],
+                    memory_limit=exec_memory_limit,
+                    timeout=exec_timeout,
+                    execution_id=execution_id,
+                    session_id=session_id,
+                    backend=self._sandbox_backend(language)
+                )
+                
+                # Write code to container
+                await self._write_code_to_container(container, code_content, config)
+                
+                # Execute setup commands if needed
+                if "setup_commands" in config:
+                    for setup_cmd in config["setup_commands"]:
+                        await self._run_setup_command(container, setup_cmd)
             
             # Run the code
+            oom_kills = self.container_manager.oom_kill_count(container)
             result = await self._execute_in_container(
                 container, 
-                config["run_command"], 
+                run_command, 
                 input_data, 
                 exec_timeout
             )
             
             execution_time = time.time() - start_time
             
-            return ExecutionResponse(
+            if await self.container_manager.oom_killed_since(container, oom_kills, result["exit_code"]):
+                # The OOM killer may have picked a zygote or daemon over the program
+                healthy = False
+                response = self._oom_response(execution_id, result, exec_memory_limit, execution_time)
+                return await self._spill_large_output(response)
+            
+            return await self._spill_large_output(ExecutionResponse(
                 execution_id=execution_id,
                 status=ExecutionStatus.COMPLETED,
                 output=result["output"],
@@ -212,9 +330,10 @@ class CodeExecutor:
                 execution_time=execution_time,
                 memory_used=result["memory_used"],
                 exit_code=result["exit_code"]
-            )
+            ))
             
         except asyncio.TimeoutError:
+            healthy = False
             return ExecutionResponse(
                 execution_id=execution_id,
                 status=ExecutionStatus.TIMEOUT,
@@ -226,6 +345,7 @@ class CodeExecutor:
             )
             
         except Exception as e:
+            healthy = False
             logger.error(f"Execution failed for {execution_id}: {str(e)}")
             return ExecutionResponse(
                 execution_id=execution_id,
@@ -240,7 +360,12 @@ class CodeExecutor:
         finally:
             # Cleanup container
             try:
-                await self.container_manager.cleanup_container(execution_id)
+                if warm is not None:
+                    await self.container_manager.return_warm_container(
+                        session_id, time.time() - start_time, healthy
+                    )
+                else:
+                    await self.container_manager.cleanup_container(execution_id)
             except Exception as e:
                 logger.error(f"Failed to cleanup container {execution_id}: {str(e)}")
 
@@ -257,6 +382,8 @@ class CodeExecutor:
         
         execution_id = str(uuid.uuid4())
         start_time = time.time()
+        warm = None
+        healthy = True
         
         try:
             # Send start event
@@ -282,40 +409,52 @@ class CodeExecutor:
             # Prepare code
             code_content = self._prepare_code(code, language, config)
             
-            yield {
-                "type": "status",
-                "message": "Creating container...",
-                "timestamp": time.time()
-            }
+            # Use the session's pre-warmed container when one is reserved
+            if session_id:
+                warm = await self._claim_session_container(
+                    session_id, language, config, exec_memory_limit
+                )
+            run_command = self._run_command(config, warm, exec_timeout)
             
-            # Create container
-            container = await self.container_manager.create_container(
-                image=config["image"],
-                command=config["run_command"],
-                memory_limit=exec_memory_limit,
-                timeout=exec_timeout,
-                execution_id=execution_id,
-                session_id=session_id
-            )
-            
-            yield {
-                "type": "status",
-                "message": "Setting up environment...",
-                "timestamp": time.time()
-            }
-            
-            # Write code to container
-            await self._write_code_to_container(container, code_content, config)
-            
-            # Setup commands
-            if "setup_commands" in config:
-                for setup_cmd in config["setup_commands"]:
-                    yield {
-                        "type": "setup",
-                        "command": setup_cmd,
-                        "timestamp": time.time()
-                    }
-                    await self._run_setup_command(container, setup_cmd)
+            if warm is not None:
+                container = warm["container"]
+                await self._prepare_warm_container(warm, code_content, config)
+            else:
+                yield {
+                    "type": "status",
+                    "message": "Creating container...",
+                    "timestamp": time.time()
+                }
+                
+                # Create container
+                container = await self.container_manager.create_container(
+                    image=config["image"],
+                    command=config["run_command"],
+                    memory_limit=exec_memory_limit,
+                    timeout=exec_timeout,
+                    execution_id=execution_id,
+                    session_id=session_id,
+                    backend=self._sandbox_backend(language)
+                )
+                
+                yield {
+                    "type": "status",
+                    "message": "Setting up environment...",
+                    "timestamp": time.time()
+                }
+                
+                # Write code to container
+                await self._write_code_to_container(container, code_content, config)
+                
+                # Setup commands
+                if "setup_commands" in config:
+                    for setup_cmd in config["setup_commands"]:
+                        yield {
+                            "type": "setup",
+                            "command": setup_cmd,
+                            "timestamp": time.time()
+                        }
+                        await self._run_setup_command(container, setup_cmd)
             
             yield {
                 "type": "status",
@@ -324,14 +463,23 @@ class CodeExecutor:
             }
             
             # Execute with streaming
-            async for chunk in self._execute_in_container_stream(
+            oom_kills = self.container_manager.oom_kill_count(container)
+            # Closed here rather than by the garbage collector, so its run span ends in this context
+            async with aclosing(self._execute_in_container_stream(
                 container, 
-                config["run_command"], 
+                run_command, 
                 input_data, 
                 exec_timeout
-            ):
-                chunk["execution_id"] = execution_id
-                yield chunk
+            )) as chunks:
+                async for chunk in chunks:
+                    chunk["execution_id"] = execution_id
+                    if chunk["type"] == "exit" and await self.container_manager.oom_killed_since(
+                        container, oom_kills, chunk["exit_code"]
+                    ):
+                        healthy = False
+                        chunk["oom_killed"] = True
+                        chunk["message"] = OOM_MESSAGE.format(memory_limit=exec_memory_limit)
+                    yield chunk
             
             execution_time = time.time() - start_time
             
@@ -343,6 +491,7 @@ class CodeExecutor:
             }
             
         except asyncio.TimeoutError:
+            healthy = False
             yield {
                 "type": "timeout",
                 "execution_id": execution_id,
@@ -352,6 +501,7 @@ class CodeExecutor:
             }
             
         except Exception as e:
+            healthy = False
             logger.error(f"Streaming execution failed for {execution_id}: {str(e)}")
             yield {
                 "type": "error",
@@ -364,10 +514,412 @@ class CodeExecutor:
         finally:
             # Cleanup
             try:
-                await self.container_manager.cleanup_container(execution_id)
+                if warm is not None:
+                    await self.container_manager.return_warm_container(
+                        session_id, time.time() - start_time, healthy
+                    )
+                else:
+                    await self.container_manager.cleanup_container(execution_id)
+            except Exception as e:
+                logger.error(f"Failed to cleanup container {execution_id}: {str(e)}")
+
+    @traced("execution.project")
+    async def execute_project(
+        self,
+        files: Dict[str, tuple],
+        language: str,
+        entry_point: Optional[str] = None,
+        build_command: Optional[str] = None,
+        input_data: Optional[str] = None,
+        timeout: Optional[int] = None,
+        memory_limit: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> ExecutionResponse:
+        """Execute a multi-file project given as path -> (sha256, content)"""
+        
+        execution_id = str(uuid.uuid4())
+        start_time = time.time()
+        warm = None
+        healthy = True
+        
+        try:
+            if language not in self.language_configs:
+                raise ValueError(f"Unsupported language: {language}")
+            
+            config = self.language_configs[language]
+            exec_timeout = timeout or config["timeout"]
+            exec_memory_limit = memory_limit or config["memory_limit"]
+            command = self._project_command(config, files, entry_point, build_command)
+            
+            # Session containers keep the project, so re-runs only send changed files
+            if session_id:
+                warm = await self._claim_session_container(
+                    session_id, language, config, exec_memory_limit, start_session=True
+                )
+            get_tracer().annotate(
+                language=language,
+                execution_id=execution_id,
+                warm=warm is not None,
+                files=len(files)
+            )
+            
+            if warm is not None:
+                container = warm["container"]
+                await self._sync_project_files(warm, files, config)
+                
+                if not warm["setup_done"] and "setup_commands" in config:
+                    for setup_cmd in config["setup_commands"]:
+                        await self._run_setup_command(container, setup_cmd)
+                    warm["setup_done"] = True
+            else:
+                container = await self.container_manager.create_container(
+                    image=config["image"],
+                    command=command,
+                    memory_limit=exec_memory_limit,
+                    timeout=exec_timeout,
+                    execution_id=execution_id,
+                    session_id=session_id,
+                    backend=self._sandbox_backend(language)
+                )
+                
+                self.code_injector.inject(
+                    container,
+                    [(path, data) for path, (_, data) in files.items()],
+                    config,
+                    workspace=self.container_manager.workspace_for(container)
+                )
+                
+                if "setup_commands" in config:
+                    for setup_cmd in config["setup_commands"]:
+                        await self._run_setup_command(container, setup_cmd)
+            
+            oom_kills = self.container_manager.oom_kill_count(container)
+            result = await self._execute_in_container(
+                container,
+                command,
+                input_data,
+                exec_timeout
+            )
+            
+            if await self.container_manager.oom_killed_since(container, oom_kills, result["exit_code"]):
+                healthy = False
+                response = self._oom_response(execution_id, result, exec_memory_limit, time.time() - start_time)
+                return await self._spill_large_output(response)
+            
+            return await self._spill_large_output(ExecutionResponse(
+                execution_id=execution_id,
+                status=ExecutionStatus.COMPLETED,
+                output=result["output"],
+                error=result["error"],
+                execution_time=time.time() - start_time,
+                memory_used=result["memory_used"],
+                exit_code=result["exit_code"]
+            ))
+            
+        except asyncio.TimeoutError:
+            healthy = False
+            return ExecutionResponse(
+                execution_id=execution_id,
+                status=ExecutionStatus.TIMEOUT,
+                output="",
+                error="Execution timed out",
+                execution_time=time.time() - start_time,
+                memory_used=0,
+                exit_code=-1
+            )
+            
+        except Exception as e:
+            healthy = False
+            logger.error(f"Project execution failed for {execution_id}: {str(e)}")
+            return ExecutionResponse(
+                execution_id=execution_id,
+                status=ExecutionStatus.ERROR,
+                output="",
+                error=str(e),
+                execution_time=time.time() - start_time,
+                memory_used=0,
+                exit_code=-1
+            )
+            
+        finally:
+            try:
+                if warm is not None:
+                    await self.container_manager.return_warm_container(
+                        session_id, time.time() - start_time, healthy
+                    )
+                else:
+                    await self.container_manager.cleanup_container(execution_id)
             except Exception as e:
                 logger.error(f"Failed to cleanup container {execution_id}: {str(e)}")
 
+    def _project_command(
+        self,
+        config: Dict,
+        files: Dict[str, tuple],
+        entry_point: Optional[str],
+        build_command: Optional[str]
+    ) -> List[str]:
+        """Command that builds and runs a project from its entry point"""
+        
+        if build_command:
+            return ["sh", "-c", f"cd /app && {build_command}"]
+        
+        extension = config["file_extension"]
+        if entry_point:
+            entry = normalize_project_path(entry_point)
+        else:
+            entry = f"{config.get('main_class', 'main')}{extension}"
+        
+        template = config.get("project_command")
+        if template is not None:
+            uses_entry = "{entry}" in template or "{main_class}" in template
+            main_class = posixpath.splitext(entry)[0].replace("/", ".")
+            command = ["sh", "-c", template.format(
+                entry=shlex.quote(entry),
+                main_class=shlex.quote(main_class)
+            )]
+        else:
+            # Point the single-file run command at the entry point instead
+            single_file = f"/app/code{extension}"
+            shell = config["run_command"][:2] == ["sh", "-c"]
+            target = "/app/" + (shlex.quote(entry) if shell else entry)
+            uses_entry = any(single_file in arg for arg in config["run_command"])
+            command = [arg.replace(single_file, target) for arg in config["run_command"]]
+        
+        if uses_entry and entry not in files:
+            raise ValueError(f"Entry point {entry} is not part of the project")
+        
+        return command
+
+    async def _sync_project_files(self, warm: Dict, files: Dict[str, tuple], config: Dict):
+        """Write only the project files that changed since the session's last run"""
+        
+        container = warm["container"]
+        workspace = self.container_manager.workspace_for(container)
+        previous = warm["project_files"] or {}
+        current = {path: digest for path, (digest, _) in files.items()}
+        
+        changed = [
+            (path, data) for path, (digest, data) in files.items()
+            if previous.get(path) != digest
+        ]
+        removed = [path for path in previous if path not in current]
+        
+        # Source left by a single-file run would be built with the project
+        single_file = self._code_filename(config)
+        if warm["code_hash"] is not None and single_file not in current:
+            removed.append(single_file)
+        warm["code_hash"] = None
+        
+        # Forget the old state first so a failed write forces a full upload next time
+        warm["project_files"] = None
+        if removed:
+            self.code_injector.remove(container, removed, workspace)
+        if changed:
+            self.code_injector.inject(container, changed, config, workspace)
+        warm["project_files"] = current
+        
+        logger.info(
+            f"Synced project for session {warm['session_id']}: "
+            f"{len(changed)} written, {len(removed)} removed, {len(files) - len(changed)} unchanged"
+        )
+
+    async def prewarm(self, session_id: str, language: str, idle_ttl: Optional[int] = None) -> Dict:
+        """Reserve a running container for a session's language ahead of execution"""
+        
+        if language not in self.language_configs:
+            raise ValueError(f"Unsupported language: {language}")
+        
+        config = self.language_configs[language]
+        
+        warm = await self.container_manager.reserve_warm_container(
+            session_id,
+            language,
+            config["image"],
+            memory_limit=config["memory_limit"],
+            idle_ttl=idle_ttl
+        )
+        
+        # Setup commands are slow; pay for them before the user presses Run
+        if not warm["in_use"] and not warm["setup_done"] and "setup_commands" in config:
+            warm["in_use"] = True
+            try:
+                for setup_cmd in config["setup_commands"]:
+                    await self._run_setup_command(warm["container"], setup_cmd)
+                warm["setup_done"] = True
+            finally:
+                # Carries out a release requested while the setup ran
+                await self.container_manager.return_warm_container(session_id)
+            if self.container_manager.warm_containers.get(session_id) is not warm:
+                raise ValueError(f"Warm container for session {session_id} was released during setup")
+        
+        if language in self.zygote_languages and not warm["zygote"]:
+            warm["zygote"] = self.zygotes.start(warm["container"], language)
+        if config.get("compile_daemon") and not warm["compile_daemon"]:
+            warm["compile_daemon"] = start_compile_daemon(warm["container"])
+        
+        return {
+            "session_id": session_id,
+            "language": language,
+            "container_id": warm["container"].id[:12],
+            "idle_ttl": warm["idle_ttl"]
+        }
+
+    def code_changed(self, session_id: str, language: str, code: str):
+        """Debounced signal that the editor buffer changed; pre-writes code into the warm container"""
+        
+        if language not in self.language_configs:
+            raise ValueError(f"Unsupported language: {language}")
+        
+        pending = self._pending_code_writes.pop(session_id, None)
+        if pending is not None:
+            pending.cancel()
+        
+        self._pending_code_writes[session_id] = asyncio.create_task(
+            self._write_code_after_debounce(session_id, language, code)
+        )
+
+    async def _write_code_after_debounce(self, session_id: str, language: str, code: str):
+        try:
+            await asyncio.sleep(self.code_write_debounce)
+            
+            warm = self.container_manager.warm_containers.get(session_id)
+            if warm is None or warm["in_use"] or warm["language"] != language:
+                return
+            
+            config = self.language_configs[language]
+            warm["in_use"] = True
+            try:
+                await self._write_code_if_changed(warm, self._prepare_code(code, language, config), config)
+            finally:
+                await self.container_manager.return_warm_container(session_id)
+                
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to pre-write code for session {session_id}: {str(e)}")
+        finally:
+            if self._pending_code_writes.get(session_id) is asyncio.current_task():
+                del self._pending_code_writes[session_id]
+
+    @traced("execution.claim_warm")
+    async def _claim_session_container(
+        self,
+        session_id: str,
+        language: str,
+        config: Dict,
+        memory_limit: str,
+        start_session: bool = False
+    ) -> Optional[Dict]:
+        """Claim the session's warm container, starting a build session for compiled languages"""
+        
+        warm = self.container_manager.claim_warm_container(session_id, language, memory_limit)
+        
+        # Reserved before the language switched to a prepared image
+        if warm is not None and warm["image"] != config["image"]:
+            await self.container_manager.return_warm_container(session_id, healthy=False)
+            warm = None
+        
+        # Compiled languages keep a per-session workspace so re-runs build incrementally
+        if (
+            warm is None
+            and (start_session or "incremental_command" in config)
+            and self._sandbox_backend(language) == "docker"
+            and memory_limit == config["memory_limit"]
+            and session_id not in self.container_manager.warm_containers
+        ):
+            try:
+                await self.prewarm(session_id, language)
+                warm = self.container_manager.claim_warm_container(session_id, language, memory_limit)
+            except CapacityExceeded:
+                logger.info(f"No capacity for a build session for {session_id}, running cold")
+        
+        return warm
+
+    async def prepare_jvm_images(self):
+        """Build the prepared JVM images if needed, then switch their languages over"""
+        
+        hosts = self.container_manager.hosts
+        
+        for name, image in JVM_IMAGES.items():
+            # The images are built locally, not pulled, so every host needs its own build.
+            # The pool places them only on hosts that have one and rebuilds on hosts that come back.
+            hosts.register_built_image(image["tag"], functools.partial(self._build_jvm_image, name))
+            if not await run_in_executor(None, hosts.build_image, image["tag"]):
+                logger.error(f"Failed to prepare JVM image {image['tag']} on any host")
+                continue
+            
+            for language in image["languages"]:
+                self.language_configs[language] = self._prepared_config(
+                    self.language_configs[language], PREPARED_JVM_CONFIGS[language]
+                )
+                logger.info(f"Using prepared image {image['tag']} for {language}")
+            self.languages_payload.invalidate()
+
+    def _build_jvm_image(self, name: str, host):
+        """Build a prepared JVM image on one host (blocking)"""
+        JvmImageBuilder(host.client, self.code_injector).ensure(name)
+
+    @staticmethod
+    def _prepared_config(config: Dict, changes: Dict) -> Dict:
+        """Apply a prepared image's config changes; a new dict, so running executions keep theirs"""
+        
+        prepared = dict(config)
+        for key, value in changes.items():
+            if key == "build":
+                source, artifact, compile_cmd, run_cmd = value
+                prepared["run_command"] = ["sh", "-c", f"cd /app && {compile_cmd} && {run_cmd}"]
+                prepared["incremental_command"] = incremental_build_command(
+                    source, artifact, compile_cmd, run_cmd
+                )
+            elif value is None:
+                prepared.pop(key, None)
+            else:
+                prepared[key] = value
+        return prepared
+
+    def _sandbox_backend(self, language: str) -> str:
+        """Process sandboxes start in milliseconds, so their languages don't need build sessions"""
+        return "process" if language in self.process_languages else "docker"
+
+    def _run_command(self, config: Dict, warm: Optional[Dict], timeout: int) -> List[str]:
+        """Warm session workspaces keep build outputs, so they can skip unchanged compiles"""
+        
+        if warm is not None and "incremental_command" in config:
+            return config["incremental_command"]
+        if warm is not None and warm["zygote"]:
+            # Falls back to the plain run command if the zygote has died
+            return self.zygotes.command(
+                f"/app/{self._code_filename(config)}", timeout, config["run_command"]
+            )
+        return config["run_command"]
+
+    @traced("execution.warm_prepare")
+    async def _prepare_warm_container(self, warm: Dict, code_content: str, config: Dict):
+        """Bring a claimed warm container up to date for this execution"""
+        
+        await self._write_code_if_changed(warm, code_content, config)
+        
+        if not warm["setup_done"] and "setup_commands" in config:
+            for setup_cmd in config["setup_commands"]:
+                await self._run_setup_command(warm["container"], setup_cmd)
+            warm["setup_done"] = True
+
+    async def _write_code_if_changed(self, warm: Dict, code_content: str, config: Dict):
+        """Skip the write when the warm container already holds this exact code"""
+        
+        data = code_content.encode('utf-8')
+        code_hash = hashlib.sha256(data).hexdigest()
+        if warm["code_hash"] == code_hash:
+            return
+        
+        await self._write_code_to_container(warm["container"], data, config)
+        warm["code_hash"] = code_hash
+        
+        # The file may also belong to a project synced into this container
+        if warm["project_files"]:
+            warm["project_files"].pop(self._code_filename(config), None)
+
     async def validate_code(self, code: str, language: str) -> Dict:
         """Validate code syntax without execution"""
         
@@ -378,18 +930,7 @@ class CodeExecutor:
                     "error": f"Unsupported language: {language}"
                 }
             
-            config = self.language_configs[language]
-            
-            # Language-specific validation
-            if language == "python":
-                return await self._validate_python_code(code)
-            elif language == "javascript":
-                return await self._validate_javascript_code(code)
-            elif language == "java":
-                return await self._validate_java_code(code)
-            else:
-                # For other languages, do basic validation in container
-                return await self._validate_code_in_container(code, language, config)
+            return (await self.validate_code_batch([(code, language)]))[0]
                 
         except Exception as e:
             return {
@@ -397,6 +938,44 @@ class CodeExecutor:
                 "error": str(e)
             }
 
+    async def validate_code_batch(self, snippets: List[tuple]) -> List[Dict]:
+        """Validate (code, language) pairs; compiled languages go to the validator containers in one batch"""
+        
+        results: List[Optional[Dict]] = [None] * len(snippets)
+        delegated = []
+        
+        for index, (code, language) in enumerate(snippets):
+            if language not in self.language_configs:
+                results[index] = {
+                    "valid": False,
+                    "error": f"Unsupported language: {language}"
+                }
+            elif language == "python":
+                results[index] = await self._validate_python_code(code)
+            elif language == "javascript":
+                results[index] = await self._validate_javascript_code(code)
+            elif self.validation_service.supports(language):
+                config = self.language_configs[language]
+                delegated.append((index, self._prepare_code(code, language, config), language))
+            else:
+                # No cheap syntax check for the remaining interpreted languages
+                results[index] = {"valid": True}
+        
+        if delegated:
+            checked = await self.validation_service.validate_batch(
+                [(code, language) for _, code, language in delegated]
+            )
+            for (index, _, language), result in zip(delegated, checked):
+                unavailable = result.get("checked") is False or (
+                    not result["valid"] and result["error"].startswith("Validation failed")
+                )
+                if language == "java" and unavailable:
+                    # Validator starting or unavailable; fall back to the structural check
+                    result = {**await self._validate_java_code(snippets[index][0]), "checked": False}
+                results[index] = result
+        
+        return results
+
     def _prepare_code(self, code: str, language: str, config: Dict) -> str:
         """Prepare code for execution based on language requirements"""
         
@@ -425,47 +1004,30 @@ class Program {{
         
         return code
 
-    async def _write_code_to_container(self, container, code_content: str, config: Dict):
-        """Write code to container filesystem"""
+    @traced("execution.code_write")
+    async def _write_code_to_container(self, container, code_content, config: Dict):
+        """Write code (str or already-encoded bytes) to container filesystem"""
         
-        filename = f"code{config['file_extension']}"
+        filename = self._code_filename(config)
+        
+        data = code_content if isinstance(code_content, bytes) else code_content.encode('utf-8')
+        
+        self.code_injector.inject(
+            container,
+            [(filename, data)],
+            config,
+            workspace=self.container_manager.workspace_for(container)
+        )
+
+    @staticmethod
+    def _code_filename(config: Dict) -> str:
+        """Name of the single source file a language's run command expects"""
         
         if config.get("main_class") == "Main":
-            filename = f"Main{config['file_extension']}"
-        
-        # Create a tar archive with the code file
-        import tarfile
-        import io
-        
-        tar_stream = io.BytesIO()
-        tar = tarfile.TarFile(fileobj=tar_stream, mode='w')
-        
-        # Add code file
-        code_info = tarfile.TarInfo(name=filename)
-        code_info.size = len(code_content.encode('utf-8'))
-        code_info.mode = 0o644
-        tar.addfile(code_info, io.BytesIO(code_content.encode('utf-8')))
-        
-        # For C# projects, add project file
-        if config.get("setup_commands"):
-            if "dotnet new console" in str(config["setup_commands"]):
-                project_content = """<Project Sdk="Microsoft.NET.Sdk">
-  <PropertyGroup>
-    <OutputType>Exe</OutputType>
-    <TargetFramework>net7.0</TargetFramework>
-  </PropertyGroup>
-</Project>"""
-                project_info = tarfile.TarInfo(name="app.csproj")
-                project_info.size = len(project_content.encode('utf-8'))
-                project_info.mode = 0o644
-                tar.addfile(project_info, io.BytesIO(project_content.encode('utf-8')))
-        
-        tar.close()
-        tar_stream.seek(0)
-        
-        # Extract to container
-        container.put_archive('/app', tar_stream.getvalue())
+            return f"Main{config['file_extension']}"
+        return f"code{config['file_extension']}"
 
+    @traced("execution.setup")
     async def _run_setup_command(self, container, command: str):
         """Run setup command in container"""
         
@@ -476,6 +1038,67 @@ class Program {{
         except Exception as e:
             logger.error(f"Failed to run setup command {command}: {str(e)}")
 
+    @traced("execution.spill_output")
+    async def _spill_large_output(self, response: ExecutionResponse) -> ExecutionResponse:
+        """Move output or error text past the inline limit to the output store, keeping its head inline"""
+        
+        if self.output_store is None:
+            return response
+        
+        fields = {"output": response.output, "error": response.error}
+        refs = {}
+        
+        for name, text in list(fields.items()):
+            if not text or len(text) <= self.inline_output_limit:
+                continue
+            data = text.encode('utf-8')
+            try:
+                handle = await run_in_executor(None, self.output_store.put, data)
+            except Exception as e:
+                logger.error(f"Failed to store {name} of execution {response.execution_id}: {str(e)}")
+                continue
+            # Cut on a character boundary
+            head = data[:self.inline_output_limit].decode('utf-8', 'ignore')
+            fields[name] = head
+            refs[f"{name}_ref"] = OutputRef(
+                handle=handle,
+                size=len(data),
+                inline_bytes=len(head.encode('utf-8'))
+            )
+        
+        if not refs:
+            return response
+        
+        return StoredOutputExecutionResponse(
+            execution_id=response.execution_id,
+            status=response.status,
+            output=fields["output"],
+            error=fields["error"],
+            execution_time=response.execution_time,
+            memory_used=response.memory_used,
+            exit_code=response.exit_code,
+            **refs
+        )
+
+    @staticmethod
+    def _oom_response(execution_id: str, result: Dict, memory_limit: str, execution_time: float) -> ExecutionResponse:
+        """Response for an execution the OOM killer stopped, keeping whatever it printed"""
+        
+        error = OOM_MESSAGE.format(memory_limit=memory_limit)
+        if result["error"]:
+            error += "\n" + result["error"]
+        
+        return ExecutionResponse(
+            execution_id=execution_id,
+            status=ExecutionStatus.ERROR,
+            output=result["output"],
+            error=error,
+            execution_time=execution_time,
+            memory_used=result["memory_used"],
+            exit_code=result["exit_code"]
+        )
+
+    @traced("execution.run")
     async def _execute_in_container(
         self, 
         container, 
@@ -548,66 +1171,64 @@ class Program {{
     ) -> AsyncGenerator[Dict, None]:
         """Execute command in container with streaming output"""
         
-        try:
-            container.start()
-            
-            # Create exec instance
-            exec_id = container.client.api.exec_create(
-                container.id,
-                command,
-                stdin=bool(input_data),
-                stdout=True,
-                stderr=True,
-                workdir='/app'
-            )['Id']
-            
-            # Start execution
-            exec_socket = container.client.api.exec_start(
-                exec_id,
-                detach=False,
-                stream=True,
-                socket=True
-            )
-            
-            # Send input if provided
-            if input_data:
-                exec_socket._sock.send(input_data.encode('utf-8'))
-                exec_socket._sock.shutdown(1)  # Close stdin
-            
-            # Stream output
-            for chunk in exec_socket:
-                if chunk:
-                    try:
-                        decoded = chunk.decode('utf-8')
+        # A span rather than @traced, which only wraps coroutines
+        with get_tracer().span("execution.run", stream=True) as span:
+            try:
+                container.start()
+                
+                # Create exec instance
+                exec_id = container.client.api.exec_create(
+                    container.id,
+                    command,
+                    stdin=bool(input_data),
+                    stdout=True,
+                    stderr=True,
+                    workdir='/app'
+                )['Id']
+                
+                # Start execution
+                exec_socket = container.client.api.exec_start(
+                    exec_id,
+                    detach=False,
+                    stream=True,
+                    socket=True
+                )
+                
+                # Send input if provided
+                if input_data:
+                    exec_socket._sock.send(input_data.encode('utf-8'))
+                    exec_socket._sock.shutdown(1)  # Close stdin
+                
+                # Stream output
+                # Raw bytes; the connection's stream encoder decides how to frame them
+                for chunk in exec_socket:
+                    if chunk:
                         yield {
                             "type": "output",
-                            "data": decoded,
+                            "data": chunk,
                             "timestamp": time.time()
                         }
-                    except UnicodeDecodeError:
-                        # Handle binary output
-                        yield {
-                            "type": "output",
-                            "data": chunk.hex(),
-                            "timestamp": time.time(),
-                            "encoding": "hex"
-                        }
-            
-            # Get final execution info
-            exec_info = container.client.api.exec_inspect(exec_id)
-            
-            yield {
-                "type": "exit",
-                "exit_code": exec_info['ExitCode'],
-                "timestamp": time.time()
-            }
-            
-        except Exception as e:
-            yield {
-                "type": "error",
-                "message": str(e),
-                "timestamp": time.time()
-            }
+                
+                # Get final execution info
+                exec_info = container.client.api.exec_inspect(exec_id)
+                if span is not None:
+                    span.set(exit_code=exec_info['ExitCode'])
+                
+                yield {
+                    "type": "exit",
+                    "exit_code": exec_info['ExitCode'],
+                    "timestamp": time.time()
+                }
+                
+            except Exception as e:
+                if span is not None:
+                    span.status = "error"
+                    span.set(error=str(e))
+                yield {
+                    "type": "error",
+                    "message": str(e),
+                    "timestamp": time.time()
+                }
 
     async def _validate_python_code(self, code: str) -> Dict:
         """Validate Python code syntax"""
@@ -646,71 +1267,20 @@ class Program {{
         
         return {"valid": True}
 
-    async def _validate_code_in_container(self, code: str, language: str, config: Dict) -> Dict:
-        """Validate code by attempting compilation in container"""
-        
-        try:
-            execution_id = str(uuid.uuid4())
-            
-            # Create container for validation
-            container = await self.container_manager.create_container(
-                image=config["image"],
-                command=["echo", "validation"],
-                memory_limit="64m",
-                timeout=10,
-                execution_id=execution_id
-            )
-            
-            # Write code to container
-            code_content = self._prepare_code(code, language, config)
-            await self._write_code_to_container(container, code_content, config)
-            
-            # Try to compile/validate
-            if language in ["cpp", "c"]:
-                # Try compilation
-                compile_cmd = ["gcc", "-fsyntax-only", f"/app/code{config['file_extension']}"]
-                result = container.exec_run(compile_cmd)
-                
-                if result.exit_code == 0:
-                    return {"valid": True}
-                else:
-                    return {
-                        "valid": False,
-                        "error": result.output.decode('utf-8')
-                    }
-            
-            elif language == "java":
-                # Try compilation
-                compile_cmd = ["javac", f"/app/Main{config['file_extension']}"]
-                result = container.exec_run(compile_cmd, workdir='/app')
-                
-                if result.exit_code == 0:
-                    return {"valid": True}
-                else:
-                    return {
-                        "valid": False,
-                        "error": result.output.decode('utf-8')
-                    }
-            
-            # For interpreted languages, assume valid if no obvious syntax errors
-            return {"valid": True}
-            
-        except Exception as e:
-            return {
-                "valid": False,
-                "error": str(e)
-            }
-        finally:
-            try:
-                await self.container_manager.cleanup_container(execution_id)
-            except:
-                pass
-
     def get_supported_languages(self) -> Dict:
         """Get list of supported programming languages"""
         
+        return self._build_supported_languages(self.language_configs)
+
+    def supported_languages_response(self, request: Request) -> Response:
+        """Serve the supported languages as pre-serialized JSON with an ETag"""
+        
+        return self.languages_payload.response(request, self.language_configs)
+
+    @staticmethod
+    def _build_supported_languages(language_configs: Dict) -> Dict:
         languages = {}
-        for lang, config in self.language_configs.items():
+        for lang, config in language_configs.items():
             languages[lang] = {
                 "name": lang.title(),
                 "file_extension": config["file_extension"],
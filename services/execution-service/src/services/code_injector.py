@@ -0,0 +1,149 @@
+import os
+import posixpath
+import tarfile
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+END_OF_ARCHIVE = b"\0" * (BLOCK_SIZE * 2)
+
+# Static project files written next to the user's code
+CSHARP_PROJECT = b"""<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup>
+    <OutputType>Exe</OutputType>
+    <TargetFramework>net7.0</TargetFramework>
+  </PropertyGroup>
+</Project>"""
+
+def _padding(size: int) -> bytes:
+    remainder = size % BLOCK_SIZE
+    return b"\0" * (BLOCK_SIZE - remainder) if remainder else b""
+
+def tar_header(name: str, size: int, mode: int = 0o644, type=tarfile.REGTYPE) -> bytes:
+    """Build the header block(s) for one tar member"""
+
+    info = tarfile.TarInfo(name=name)
+    info.size = size
+    info.mode = mode
+    info.type = type
+    return info.tobuf(format=tarfile.GNU_FORMAT)
+
+def tar_member(name: str, data: bytes, mode: int = 0o644) -> bytes:
+    """Build a complete tar member (header, data and padding)"""
+    return tar_header(name, len(data), mode) + data + _padding(len(data))
+
+class CodeInjector:
+    """Put source files into execution containers.
+
+    Archive mode builds the tar stream for `put_archive` by hand: headers
+    are tiny, static files such as the C# project are pre-built members, and
+    sources above `stream_threshold` bytes are streamed as chunks instead of
+    being copied into one buffer. Workspace mode writes straight into a
+    host directory that is bind-mounted at /app, skipping the Docker API.
+    """
+
+    def __init__(self, stream_threshold: int = 1024 * 1024):
+        self.stream_threshold = stream_threshold
+        self._static_members: Dict[str, bytes] = {
+            "app.csproj": tar_member("app.csproj", CSHARP_PROJECT)
+        }
+        self._static_files: Dict[str, bytes] = {
+            "app.csproj": CSHARP_PROJECT
+        }
+
+    def static_files_for(self, config: Dict) -> List[str]:
+        """Names of the static files a language needs"""
+
+        if config.get("setup_commands") and "dotnet new console" in str(config["setup_commands"]):
+            return ["app.csproj"]
+        return []
+
+    def _archive_chunks(self, files: List[Tuple[str, bytes]], static_names: List[str]) -> Iterator[bytes]:
+        directories = set()
+        for name, _ in files:
+            parent = posixpath.dirname(name)
+            while parent and parent not in directories:
+                directories.add(parent)
+                parent = posixpath.dirname(parent)
+        # Parents first; the sandbox user needs to write build output into them
+        for directory in sorted(directories):
+            yield tar_header(directory, 0, 0o777, tarfile.DIRTYPE)
+
+        for name, data in files:
+            yield tar_header(name, len(data))
+            # memoryview avoids copying the source when the chunk is sent
+            yield memoryview(data)
+            padding = _padding(len(data))
+            if padding:
+                yield padding
+        for name in static_names:
+            yield self._static_members[name]
+        yield END_OF_ARCHIVE
+
+    def build_archive(
+        self,
+        files: List[Tuple[str, bytes]],
+        static_names: Optional[List[str]] = None
+    ) -> Union[bytes, Iterator[bytes]]:
+        """Tar stream for put_archive: bytes for small inputs, a chunk iterator for large ones"""
+
+        chunks = self._archive_chunks(files, static_names or [])
+        if sum(len(data) for _, data in files) >= self.stream_threshold:
+            return chunks
+        return b"".join(chunks)
+
+    def inject(
+        self,
+        container,
+        files: List[Tuple[str, bytes]],
+        config: Dict,
+        workspace: Optional[str] = None
+    ):
+        """Write files (name, encoded content) into the container's /app"""
+
+        static_names = self.static_files_for(config)
+
+        if workspace is not None:
+            self.write_to_workspace(workspace, files, static_names)
+            return
+
+        container.put_archive('/app', self.build_archive(files, static_names))
+
+    def write_to_workspace(
+        self,
+        workspace: str,
+        files: List[Tuple[str, bytes]],
+        static_names: Optional[List[str]] = None
+    ):
+        """Write files into a bind-mounted host workspace"""
+
+        entries = list(files) + [(name, self._static_files[name]) for name in static_names or []]
+        for name, data in entries:
+            path = os.path.join(workspace, name)
+            directory = os.path.dirname(path)
+            if directory != workspace:
+                os.makedirs(directory, mode=0o777, exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+            finally:
+                os.close(fd)
+
+    def remove(self, container, paths: List[str], workspace: Optional[str] = None):
+        """Delete files from the container's /app"""
+
+        if workspace is not None:
+            for path in paths:
+                try:
+                    os.remove(os.path.join(workspace, path))
+                except FileNotFoundError:
+                    pass
+            return
+
+        container.exec_run(["rm", "-f", "--"] + list(paths), workdir='/app')
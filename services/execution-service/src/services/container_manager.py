@@ -1,18 +1,100 @@
 import asyncio
+import functools
+import hashlib
+import os
+import shutil
 import time
 import uuid
+from contextlib import contextmanager
 from typing import Dict, List, Optional
 import docker
-from docker.errors import ContainerError, ImageNotFound, APIError
+from docker.errors import ContainerError, ImageNotFound, APIError, NotFound
 
+from .docker_events import DockerEventWatcher
+from .docker_hosts import DockerHost, DockerHostPool
+from .sandbox import DockerSandboxBackend, ProcessSandboxBackend
+from .tracing import run_in_executor, traced
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Keeps a warm container running until an execution is exec'd into it
+WARM_CONTAINER_COMMAND = ["tail", "-f", "/dev/null"]
+
+# Exit code of a process killed with SIGKILL, which is what the OOM killer sends
+SIGKILL_EXIT_CODE = 137
+
+# Largest file a sandbox may write to a host workspace, matching the /app tmpfs
+WORKSPACE_FILE_SIZE = 100 * 1024 * 1024
+
+class CapacityExceeded(Exception):
+    """Raised when the container admission budget is used up"""
+
+class WarmContainerBusy(CapacityExceeded):
+    """Raised when a session's warm container can't be replaced because an execution is using it"""
+
 class ContainerManager:
-    def __init__(self, docker_client):
-        self.docker_client = docker_client
+    def __init__(
+        self,
+        docker_client,
+        max_containers: int = 50,
+        warm_idle_ttl: int = 120,
+        max_warm_containers: int = 25,
+        workspace_root: Optional[str] = None,
+        process_backend: Optional[ProcessSandboxBackend] = None,
+        host_check_interval: int = 10,
+        orphan_age: int = 300
+    ):
+        # A single client is treated as a pool of one host
+        if isinstance(docker_client, DockerHostPool):
+            self.hosts = docker_client
+        else:
+            self.hosts = DockerHostPool([DockerHost("local", docker_client)])
+        self.host_check_interval = host_check_interval
+        # Execution sandboxes by backend name; "process" exists only when configured
+        self.backends = {"docker": DockerSandboxBackend(self.hosts)}
+        if process_backend is not None:
+            self.backends["process"] = process_backend
         self.active_containers: Dict[str, dict] = {}
+        # Admission budget shared by execution and warm containers
+        self.max_containers = max_containers
+        # Containers admitted but still being created, counted against the budget
+        self._pending_admissions = 0
+        self._pending_warm = 0
+        # Warm containers reserved per editor session, keyed by session_id
+        self.warm_containers: Dict[str, dict] = {}
+        self.warm_idle_ttl = warm_idle_ttl
+        # Warm containers hold session build workspaces in memory (the /app tmpfs), so cap them
+        self.max_warm_containers = max_warm_containers
+        self._warm_locks: Dict[str, asyncio.Lock] = {}
+        # When set, /app is a bind-mounted host directory under this root
+        # instead of a tmpfs, so code can be written without the Docker API
+        self.workspace_root = workspace_root
+        if workspace_root and len(self.hosts.hosts) > 1:
+            # Bind mounts name directories on the daemon's machine, which is only this one for a single host
+            logger.warning("Host workspaces need a single local Docker host; using tmpfs workspaces")
+            self.workspace_root = None
+        elif workspace_root and not os.path.ismount(os.path.realpath(workspace_root)):
+            # A bind has no size cap of its own, so the root must be a size-limited
+            # filesystem (tmpfs, loop device or quota'd volume) that sandboxes can fill
+            # without filling the host's disk
+            logger.warning(
+                f"Workspace root {workspace_root} is not a dedicated mount; using tmpfs workspaces"
+            )
+            self.workspace_root = None
+        # Host workspace per container id
+        self.workspaces: Dict[str, str] = {}
+        # Long-lived helper containers such as syntax validators, keyed by name.
+        # There is at most one per language, so they sit outside the admission budget.
+        self.service_containers: Dict[str, dict] = {}
+        # Every container with our service label on the hosts, kept current from
+        # the Docker events stream; listed in full only at startup and when a host
+        # comes back. Untracked entries older than orphan_age get removed.
+        self.container_index: Dict[str, dict] = {}
+        self.orphan_age = orphan_age
+        self._event_watchers: Dict[str, DockerEventWatcher] = {}
+        # The event loop only keeps weak references to tasks
+        self._background_tasks = set()
         self.stats = {
             "total_executions": 0,
             "active_containers": 0,
@@ -21,9 +103,148 @@ class ContainerManager:
             "cpu_usage": 0
         }
         
-        # Start cleanup task
-        asyncio.create_task(self._periodic_cleanup())
+        # Start cleanup tasks
+        self._run_in_background(self._periodic_cleanup(), "periodic cleanup")
+        self._run_in_background(self._expire_warm_containers(), "warm container expiry")
+        self._run_in_background(self._check_hosts(), "host checks")
+        self._run_in_background(self._watch_docker_events(), "Docker event watch")
+
+    def _run_in_background(self, awaitable, description: str) -> asyncio.Future:
+        """Run a coroutine or executor future without awaiting it, logging if it fails"""
+        
+        task = asyncio.ensure_future(awaitable)
+        self._background_tasks.add(task)
+        task.add_done_callback(functools.partial(self._background_task_done, description))
+        return task
+
+    def _background_task_done(self, description: str, task: asyncio.Future):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background {description} failed: {str(task.exception())}")
+
+    def has_capacity(self) -> bool:
+        """Check whether another container fits in the admission budget"""
+        return (
+            len(self.active_containers) + len(self.warm_containers) + self._pending_admissions
+            < self.max_containers
+            and self.hosts.has_capacity()
+        )
+
+    def _warm_slots_full(self) -> bool:
+        return len(self.warm_containers) + self._pending_warm >= self.max_warm_containers
+
+    @contextmanager
+    def _admission(self, warm: bool = False):
+        """Hold a slot of the admission budget while a container is created.
+
+        The slot is counted before creation starts, so concurrent requests
+        can't all pass the same capacity check. Callers register the
+        container before leaving the block.
+        """
+        
+        if not self.has_capacity() or (warm and self._warm_slots_full()):
+            raise CapacityExceeded(
+                f"Container budget of {self.max_containers} is in use"
+            )
+        
+        self._pending_admissions += 1
+        if warm:
+            self._pending_warm += 1
+        try:
+            yield
+        finally:
+            self._pending_admissions -= 1
+            if warm:
+                self._pending_warm -= 1
+
+    def _container_config(
+        self,
+        image: str,
+        command: List[str],
+        memory_limit: str,
+        execution_id: str,
+        session_id: Optional[str],
+        warm: bool = False,
+        workspace: Optional[str] = None
+    ) -> Dict:
+        """Build the sandboxed container configuration"""
+        
+        if workspace:
+            # Host workspace bind on the size-limited workspace root; each file
+            # is also capped at the tmpfs size
+            volumes = {workspace: {"bind": "/app", "mode": "rw"}}
+            tmpfs = {}
+            ulimits = [docker.types.Ulimit(name="fsize", soft=WORKSPACE_FILE_SIZE, hard=WORKSPACE_FILE_SIZE)]
+        else:
+            volumes = {
+                # Create tmpfs for /app to allow writing
+                "/app": {"bind": "/app", "mode": "rw"}
+            }
+            tmpfs = {
+                "/app": "rw,size=100m,uid=1000"
+            }
+            ulimits = []
+        
+        return {
+            "image": image,
+            "command": command,
+            "detach": True,
+            "mem_limit": memory_limit,
+            "memswap_limit": memory_limit,  # Prevent swap usage
+            "cpu_quota": 50000,  # Limit CPU usage to 50%
+            "cpu_period": 100000,
+            "network_disabled": True,  # Disable network access
+            "read_only": False,  # Allow writing to /app
+            "working_dir": "/app",
+            "volumes": volumes,
+            "tmpfs": tmpfs,
+            "ulimits": ulimits,
+            "security_opt": [
+                "no-new-privileges:true"
+            ],
+            "cap_drop": ["ALL"],
+            "cap_add": ["CHOWN", "SETUID", "SETGID"],
+            "user": "1000:1000",  # Run as non-root user
+            "environment": {
+                "HOME": "/app",
+                "USER": "coderunner"
+            },
+            "labels": {
+                "execution_id": execution_id,
+                "session_id": session_id or "",
+                "created_at": str(time.time()),
+                "service": "code-execution",
+                "warm": "true" if warm else "false"
+            }
+        }
+
+    def _create_workspace(self, execution_id: str) -> Optional[str]:
+        """Create the host directory bind-mounted at /app, if workspaces are enabled"""
+        
+        if not self.workspace_root:
+            return None
+        
+        # Ids come from callers; a digest keeps them from naming paths of their own
+        root = os.path.realpath(self.workspace_root)
+        name = hashlib.sha256(execution_id.encode("utf-8", "surrogatepass")).hexdigest()[:32]
+        workspace = os.path.realpath(os.path.join(root, name))
+        if os.path.dirname(workspace) != root:
+            raise ValueError(f"Workspace for {execution_id!r} escapes {root}")
+        os.makedirs(workspace, exist_ok=True)
+        # The sandbox user (1000) writes build output next to the code
+        os.chmod(workspace, 0o777)
+        return workspace
+
+    def workspace_for(self, container) -> Optional[str]:
+        """Host workspace mounted at the container's /app, if any"""
+        return self.workspaces.get(container.id)
+
+    def _remove_workspace(self, container):
+        workspace = self.workspaces.pop(container.id, None)
+        if workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
 
+    @traced("execution.container_create")
     async def create_container(
         self,
         image: str,
@@ -31,91 +252,346 @@ class ContainerManager:
         memory_limit: str = "128m",
         timeout: int = 30,
         execution_id: str = None,
-        session_id: str = None
+        session_id: str = None,
+        backend: str = "docker"
     ):
-        """Create a new Docker container for code execution"""
+        """Create a new sandbox for code execution, a Docker container unless another backend is requested"""
         
         if not execution_id:
             execution_id = str(uuid.uuid4())
         
-        try:
-            # Ensure image is available
-            await self._ensure_image_available(image)
-            
-            # Container configuration
-            container_config = {
-                "image": image,
-                "command": command,
-                "detach": True,
-                "mem_limit": memory_limit,
-                "memswap_limit": memory_limit,  # Prevent swap usage
-                "cpu_quota": 50000,  # Limit CPU usage to 50%
-                "cpu_period": 100000,
-                "network_disabled": True,  # Disable network access
-                "read_only": False,  # Allow writing to /app
-                "working_dir": "/app",
-                "volumes": {
-                    # Create tmpfs for /app to allow writing
-                    "/app": {"bind": "/app", "mode": "rw"}
-                },
-                "tmpfs": {
-                    "/app": "rw,size=100m,uid=1000"
-                },
-                "security_opt": [
-                    "no-new-privileges:true"
-                ],
-                "cap_drop": ["ALL"],
-                "cap_add": ["CHOWN", "SETUID", "SETGID"],
-                "user": "1000:1000",  # Run as non-root user
-                "environment": {
-                    "HOME": "/app",
-                    "USER": "coderunner"
-                },
-                "labels": {
-                    "execution_id": execution_id,
-                    "session_id": session_id or "",
-                    "created_at": str(time.time()),
-                    "service": "code-execution"
+        sandbox_backend = self.backends.get(backend)
+        if sandbox_backend is None or not sandbox_backend.available_for(image):
+            if backend != "docker":
+                logger.debug(f"Backend {backend} cannot run {image}, using docker")
+            sandbox_backend = self.backends["docker"]
+        
+        with self._admission():
+            try:
+                if sandbox_backend.name == "docker":
+                    # The host pool pulls the image on whichever host it picks
+                    workspace = self._create_workspace(execution_id)
+                else:
+                    # Process sandboxes always run over a host directory of their own
+                    workspace = None
+                
+                # Container configuration
+                container_config = self._container_config(
+                    image, command, memory_limit, execution_id, session_id, workspace=workspace
+                )
+                
+                # Create container; docker-py blocks, and may pull the image first
+                try:
+                    container = await run_in_executor(None, sandbox_backend.create, container_config, timeout)
+                except Exception:
+                    if workspace:
+                        shutil.rmtree(workspace, ignore_errors=True)
+                    raise
+                # Code is written straight into a process sandbox's directory
+                workspace = workspace or getattr(container, "workdir", None)
+                if workspace:
+                    self.workspaces[container.id] = workspace
+                
+                # Store container info
+                self.active_containers[execution_id] = {
+                    "container": container,
+                    "created_at": time.time(),
+                    "session_id": session_id,
+                    "timeout": timeout,
+                    "image": image,
+                    "backend": sandbox_backend.name
                 }
-            }
-            
-            # Create container
-            container = self.docker_client.containers.create(**container_config)
-            
-            # Store container info
-            self.active_containers[execution_id] = {
-                "container": container,
-                "created_at": time.time(),
-                "session_id": session_id,
-                "timeout": timeout,
-                "image": image
-            }
-            
-            self.stats["active_containers"] = len(self.active_containers)
-            self.stats["total_executions"] += 1
-            
-            logger.info(f"Created container {container.id[:12]} for execution {execution_id}")
+                
+                self.stats["active_containers"] = len(self.active_containers)
+                self.stats["total_executions"] += 1
+                
+                logger.info(f"Created {sandbox_backend.name} sandbox {container.id[:12]} for execution {execution_id}")
+                
+                return container
+                
+            except Exception as e:
+                logger.error(f"Failed to create container for execution {execution_id}: {str(e)}")
+                raise
+
+    async def reserve_warm_container(
+        self,
+        session_id: str,
+        language: str,
+        image: str,
+        memory_limit: str = "128m",
+        idle_ttl: Optional[int] = None
+    ) -> dict:
+        """Start (or refresh) a running container reserved for a session's language"""
+        
+        lock = self._warm_locks.setdefault(session_id, asyncio.Lock())
+        
+        async with lock:
+            existing = self.warm_containers.get(session_id)
+            if existing is not None:
+                if (
+                    existing["language"] == language
+                    and existing["image"] == image
+                    and existing["memory_limit"] == memory_limit
+                ):
+                    existing["last_used"] = time.time()
+                    if idle_ttl:
+                        existing["idle_ttl"] = idle_ttl
+                    # Reserved again before a deferred release took effect
+                    existing["release_pending"] = False
+                    return existing
+                
+                # The session switched languages; never pull the container from under a run
+                if existing["in_use"]:
+                    raise WarmContainerBusy(
+                        f"Session {session_id} is running {existing['language']}; retry once it finishes"
+                    )
+                await self._remove_warm_container(session_id)
             
-            return container
+            if self._warm_slots_full() or not self.has_capacity():
+                await self._evict_idle_warm_container(exclude=session_id)
             
-        except Exception as e:
-            logger.error(f"Failed to create container for execution {execution_id}: {str(e)}")
+            # The slot stays counted as pending until the container is registered
+            with self._admission(warm=True):
+                container, workspace = await run_in_executor(
+                    None, self._start_warm_container, session_id, image, memory_limit
+                )
+                return self._register_warm_container(
+                    container, workspace, session_id, language, image, memory_limit, idle_ttl
+                )
+
+    def _start_warm_container(self, session_id: str, image: str, memory_limit: str):
+        """Create and start a session's warm container; returns it with its workspace (blocking)"""
+        
+        workspace = self._create_workspace(f"warm-{session_id}")
+        try:
+            container = self.hosts.create_container(
+                self._container_config(
+                    image,
+                    WARM_CONTAINER_COMMAND,
+                    memory_limit,
+                    execution_id=f"warm-{session_id}",
+                    session_id=session_id,
+                    warm=True,
+                    workspace=workspace
+                )
+            )
+        except Exception:
+            if workspace:
+                shutil.rmtree(workspace, ignore_errors=True)
+            raise
+        try:
+            container.start()
+        except Exception:
+            self._discard_container(container, workspace)
             raise
+        return container, workspace
+
+    def _discard_container(self, container, workspace: Optional[str]):
+        """Remove a container that never got registered (blocking)"""
+        
+        try:
+            container.remove(force=True)
+        except Exception as e:
+            logger.error(f"Failed to remove container {container.id[:12]}: {str(e)}")
+        self.hosts.release(container)
+        if workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def _register_warm_container(
+        self,
+        container,
+        workspace: Optional[str],
+        session_id: str,
+        language: str,
+        image: str,
+        memory_limit: str,
+        idle_ttl: Optional[int]
+    ) -> dict:
+        """Track a started warm container as the session's reservation"""
+        
+        if workspace:
+            self.workspaces[container.id] = workspace
+        now = time.time()
+        info = {
+            "container": container,
+            "session_id": session_id,
+            "language": language,
+            "image": image,
+            "memory_limit": memory_limit,
+            "created_at": now,
+            "last_used": now,
+            "idle_ttl": idle_ttl or self.warm_idle_ttl,
+            "in_use": False,
+            # Released while in use; removed when the execution gives it back
+            "release_pending": False,
+            "setup_done": False,
+            "code_hash": None,
+            # Whether a fork-server zygote is running in the container
+            "zygote": False,
+            # Whether the JVM compile daemon has been started in it
+            "compile_daemon": False,
+            # path -> sha256 of the project files last written (project mode)
+            "project_files": None
+        }
+        self.warm_containers[session_id] = info
+        
+        logger.info(f"Reserved warm container {container.id[:12]} for session {session_id} ({language})")
+        
+        return info
+
+    def claim_warm_container(self, session_id: str, language: str, memory_limit: str) -> Optional[dict]:
+        """Take a session's warm container for one execution, if it matches the request"""
+        
+        info = self.warm_containers.get(session_id)
+        if (
+            info is None
+            or info["in_use"]
+            or info["language"] != language
+            or info["memory_limit"] != memory_limit
+        ):
+            return None
+        
+        info["in_use"] = True
+        info["last_used"] = time.time()
+        self.stats["total_executions"] += 1
+        
+        return info
+
+    @traced("execution.cleanup")
+    async def return_warm_container(self, session_id: str, execution_time: float = 0, healthy: bool = True):
+        """Give a warm container back after an execution"""
+        
+        info = self.warm_containers.get(session_id)
+        if info is None:
+            return
+        
+        self.stats["total_execution_time"] += execution_time
+        info["in_use"] = False
+        info["last_used"] = time.time()
+        
+        # A container that exited during the execution can't take the next one
+        if not healthy or info.get("exited") or info["release_pending"]:
+            await self.release_warm_container(session_id)
+
+    async def release_warm_container(self, session_id: str, force: bool = False):
+        """Drop a session's warm container reservation.
+
+        A container that an execution is using is only marked, and removed
+        when return_warm_container gives it back; `force` removes it anyway.
+        """
+        
+        lock = self._warm_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            info = self.warm_containers.get(session_id)
+            if info is not None and info["in_use"] and not force:
+                info["release_pending"] = True
+                logger.info(f"Warm container for session {session_id} is in use; releasing it afterwards")
+                return
+            await self._remove_warm_container(session_id)
+        self._warm_locks.pop(session_id, None)
+
+    async def _evict_idle_warm_container(self, exclude: Optional[str] = None):
+        """Free a slot by releasing the least recently used idle warm container"""
+        
+        # Sessions whose lock is held are being reserved or released right now;
+        # waiting on them could deadlock with a reservation evicting ours
+        idle = [
+            info for session_id, info in self.warm_containers.items()
+            if session_id != exclude
+            and not info["in_use"]
+            and not self._warm_locks.get(session_id, asyncio.Lock()).locked()
+        ]
+        if not idle:
+            return
+        
+        victim = min(idle, key=lambda info: info["last_used"])
+        lock = self._warm_locks.setdefault(victim["session_id"], asyncio.Lock())
+        async with lock:
+            # Claimed or replaced while we waited for the lock
+            if self.warm_containers.get(victim["session_id"]) is not victim or victim["in_use"]:
+                return
+            logger.info(f"Evicting warm container for session {victim['session_id']} to make room")
+            await self._remove_warm_container(victim["session_id"])
 
-    async def _ensure_image_available(self, image: str):
-        """Ensure Docker image is available locally"""
+    async def _remove_warm_container(self, session_id: str):
+        info = self.warm_containers.pop(session_id, None)
+        if info is None:
+            return
         
         try:
-            self.docker_client.images.get(image)
-        except ImageNotFound:
-            logger.info(f"Pulling image {image}...")
+            info["container"].remove(force=True)
+        except Exception as e:
+            logger.error(f"Failed to remove warm container for session {session_id}: {str(e)}")
+        
+        self.hosts.release(info["container"])
+        self._remove_workspace(info["container"])
+        
+        logger.info(f"Released warm container for session {session_id}")
+
+    async def _expire_warm_containers(self):
+        """Release warm containers that have been idle longer than their TTL"""
+        
+        while True:
             try:
-                self.docker_client.images.pull(image)
-                logger.info(f"Successfully pulled image {image}")
+                current_time = time.time()
+                expired = [
+                    session_id
+                    for session_id, info in self.warm_containers.items()
+                    if not info["in_use"] and current_time - info["last_used"] > info["idle_ttl"]
+                ]
+                
+                for session_id in expired:
+                    logger.info(f"Warm container for session {session_id} idle, releasing")
+                    await self.release_warm_container(session_id)
+                    
             except Exception as e:
-                logger.error(f"Failed to pull image {image}: {str(e)}")
-                raise
+                logger.error(f"Error expiring warm containers: {str(e)}")
+            
+            await asyncio.sleep(5)
+
+    async def create_service_container(
+        self,
+        name: str,
+        image: str,
+        command: List[str],
+        memory_limit: str = "64m"
+    ):
+        """Create (but do not start) a long-lived helper container"""
+        
+        await self.remove_service_container(name)
+        
+        container = self.hosts.create_container(
+            self._container_config(
+                image,
+                command,
+                memory_limit,
+                execution_id=f"service-{name}",
+                session_id=None,
+                warm=True
+            )
+        )
+        self.service_containers[name] = {
+            "container": container,
+            "image": image,
+            "created_at": time.time()
+        }
+        
+        logger.info(f"Created service container {container.id[:12]} ({name})")
+        
+        return container
+
+    async def remove_service_container(self, name: str):
+        info = self.service_containers.pop(name, None)
+        if info is None:
+            return
+        
+        try:
+            info["container"].remove(force=True)
+        except Exception as e:
+            logger.error(f"Failed to remove service container {name}: {str(e)}")
+        self.hosts.release(info["container"])
 
+    @traced("execution.cleanup")
     async def cleanup_container(self, execution_id: str):
         """Clean up a specific container"""
         
@@ -138,6 +614,9 @@ class ContainerManager:
             except:
                 pass
             
+            self.hosts.release(container)
+            self._remove_workspace(container)
+            
             # Update stats
             execution_time = time.time() - container_info["created_at"]
             self.stats["total_execution_time"] += execution_time
@@ -163,6 +642,8 @@ class ContainerManager:
         for execution_id in containers_to_cleanup:
             await self.cleanup_container(execution_id)
         
+        await self.release_warm_container(session_id)
+        
         logger.info(f"Cleaned up {len(containers_to_cleanup)} containers for session {session_id}")
 
     async def cleanup_all_containers(self):
@@ -173,6 +654,12 @@ class ContainerManager:
         for execution_id in execution_ids:
             await self.cleanup_container(execution_id)
         
+        for session_id in list(self.warm_containers.keys()):
+            await self.release_warm_container(session_id, force=True)
+        
+        for name in list(self.service_containers.keys()):
+            await self.remove_service_container(name)
+        
         logger.info(f"Cleaned up all {len(execution_ids)} active containers")
 
     async def _periodic_cleanup(self):
@@ -204,35 +691,236 @@ class ContainerManager:
             await asyncio.sleep(60)
 
     async def _cleanup_orphaned_containers(self):
-        """Clean up containers that may have been left behind"""
+        """Remove indexed containers that nothing tracks and that are older than the orphan age"""
+        
+        tracked_ids = {
+            info["container"].id
+            for info in (
+                list(self.active_containers.values())
+                + list(self.warm_containers.values())
+                + list(self.service_containers.values())
+            )
+        }
+        current_time = time.time()
+        
+        for container_id, entry in list(self.container_index.items()):
+            if (
+                container_id not in tracked_ids
+                and entry["host"].healthy
+                and current_time - entry["created_at"] > self.orphan_age
+            ):
+                await self._remove_orphaned_container(container_id, entry)
+
+    async def _remove_orphaned_container(self, container_id: str, entry: dict):
+        if entry.get("removing"):
+            return
+        entry["removing"] = True
+        
+        logger.warning(f"Removing orphaned container {container_id[:12]} (execution: {entry['execution_id']})")
+        try:
+            await run_in_executor(
+                None, functools.partial(entry["host"].client.api.remove_container, container_id, force=True)
+            )
+        except NotFound:
+            pass
+        except Exception as e:
+            entry["removing"] = False
+            logger.error(f"Failed to cleanup orphaned container {container_id[:12]}: {str(e)}")
+            return
+        
+        self.container_index.pop(container_id, None)
+        self.hosts.forget(container_id)
+
+    async def _watch_docker_events(self):
+        """Follow every host's container events, then index the containers that already exist"""
+        
+        loop = asyncio.get_running_loop()
+        for host in self.hosts.hosts:
+            watcher = DockerEventWatcher(host, self._handle_docker_event, loop)
+            self._event_watchers[host.name] = watcher
+            watcher.start()
+        
+        # Watchers start first so nothing created during the listing is missed
+        for host in self.hosts.healthy_hosts():
+            await self._reconcile_host(host)
+        await self._cleanup_orphaned_containers()
+
+    def stop_event_watchers(self):
+        for watcher in self._event_watchers.values():
+            watcher.stop()
+
+    async def _reconcile_host(self, host: DockerHost):
+        """Rebuild a host's part of the container index from a full container list"""
         
         try:
-            # Get all containers with our service label
-            containers = self.docker_client.containers.list(
+            containers = await run_in_executor(None, functools.partial(
+                host.client.containers.list,
                 all=True,
                 filters={"label": "service=code-execution"}
-            )
+            ))
+        except Exception as e:
+            logger.error(f"Failed to list containers on {host.name}: {str(e)}")
+            return
+        
+        listed = set()
+        for container in containers:
+            listed.add(container.id)
+            entry = self._index_entry(host, container.id, container.labels)
+            entry["running"] = container.status == "running"
+        
+        for container_id, entry in list(self.container_index.items()):
+            if entry["host"] is host and container_id not in listed:
+                self.container_index.pop(container_id, None)
+        
+        logger.info(f"Indexed {len(listed)} containers on {host.name}")
+
+    def _index_entry(self, host: DockerHost, container_id: str, labels: Dict) -> dict:
+        entry = self.container_index.get(container_id)
+        if entry is None:
+            try:
+                created_at = float(labels.get("created_at", 0))
+            except ValueError:
+                created_at = 0.0
+            entry = {
+                "host": host,
+                "execution_id": labels.get("execution_id", "unknown"),
+                "created_at": created_at,
+                "running": True,
+                "exit_code": None,
+                "oom_kills": 0,
+                "last_event": 0
+            }
+            self.container_index[container_id] = entry
+        return entry
+
+    def _handle_docker_event(self, host: DockerHost, event: Dict):
+        """Apply one container event from a host's event stream (runs on the event loop)"""
+        
+        try:
+            actor = event.get("Actor") or {}
+            container_id = actor.get("ID") or event.get("id")
+            action = event.get("Action") or event.get("status")
+            attributes = actor.get("Attributes") or {}
+            if not container_id:
+                return
+            
+            if action == "destroy":
+                self.container_index.pop(container_id, None)
+                self.hosts.forget(container_id)
+                return
             
-            current_time = time.time()
+            entry = self._index_entry(host, container_id, attributes)
+            # A reconnected stream replays from the last event's second
+            event_time = event.get("timeNano", 0)
+            if event_time and event_time <= entry["last_event"]:
+                return
+            entry["last_event"] = event_time
             
-            for container in containers:
+            if action == "oom":
+                entry["oom_kills"] += 1
+                logger.warning(f"Container {container_id[:12]} (execution: {entry['execution_id']}) ran out of memory")
+            elif action == "die":
+                entry["running"] = False
                 try:
-                    created_at = float(container.labels.get("created_at", 0))
-                    age = current_time - created_at
-                    
-                    # Remove containers older than 5 minutes
-                    if age > 300:
-                        execution_id = container.labels.get("execution_id", "unknown")
-                        logger.warning(f"Removing orphaned container {container.id[:12]} (execution: {execution_id})")
-                        
-                        container.stop(timeout=5)
-                        container.remove(force=True)
-                        
-                except Exception as e:
-                    logger.error(f"Failed to cleanup orphaned container {container.id[:12]}: {str(e)}")
-                    
+                    entry["exit_code"] = int(attributes.get("exitCode", -1))
+                except ValueError:
+                    entry["exit_code"] = -1
+                self._container_exited(container_id, entry)
+                
         except Exception as e:
-            logger.error(f"Failed to cleanup orphaned containers: {str(e)}")
+            logger.error(f"Failed to handle Docker event on {host.name}: {str(e)}")
+
+    def _container_exited(self, container_id: str, entry: dict):
+        """React to a container exiting instead of waiting for the next sweep"""
+        
+        for session_id, info in list(self.warm_containers.items()):
+            if info["container"].id != container_id:
+                continue
+            info["exited"] = True
+            if not info["in_use"]:
+                logger.warning(f"Warm container for session {session_id} exited ({entry['exit_code']}), releasing")
+                self._run_in_background(
+                    self.release_warm_container(session_id), f"release of warm container for {session_id}"
+                )
+            return
+        
+        for name, info in self.service_containers.items():
+            if info["container"].id == container_id:
+                logger.warning(f"Service container {name} exited ({entry['exit_code']})")
+                return
+        
+        tracked = any(info["container"].id == container_id for info in self.active_containers.values())
+        if not tracked and time.time() - entry["created_at"] > self.orphan_age:
+            self._run_in_background(
+                self._remove_orphaned_container(container_id, entry), f"removal of orphan {container_id[:12]}"
+            )
+
+    def oom_kill_count(self, container) -> int:
+        """How many times the sandbox's memory limit has triggered the OOM killer"""
+        
+        oom_kills = getattr(container, "oom_kills", None)
+        if oom_kills is not None:
+            # Process sandboxes read their cgroup's counter directly
+            return oom_kills()
+        entry = self.container_index.get(container.id)
+        return entry["oom_kills"] if entry else 0
+
+    async def oom_killed_since(self, container, count: int, exit_code: int, grace: float = 0.5) -> bool:
+        """Whether the OOM killer fired after `count` was read, waiting briefly for a late event"""
+        
+        if self.oom_kill_count(container) > count:
+            return True
+        if exit_code not in (SIGKILL_EXIT_CODE, -1):
+            return False
+        
+        # The oom event comes from another thread and can trail the exec's exit
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            if self.oom_kill_count(container) > count:
+                return True
+        return False
+
+    async def _check_hosts(self):
+        """Ping every Docker host; forget the containers of hosts that go down"""
+        
+        while True:
+            for host in self.hosts.hosts:
+                try:
+                    was_healthy = host.healthy
+                    went_down = await run_in_executor(None, self.hosts.check, host)
+                    if went_down:
+                        self._forget_host_containers(host)
+                    elif host.healthy and not was_healthy:
+                        # Events were missed while it was away
+                        await self._reconcile_host(host)
+                        # Its images were forgotten; rebuild the local ones without holding up the checks
+                        self._run_in_background(
+                            run_in_executor(None, self.hosts.prepare_host, host), f"image preparation on {host.name}"
+                        )
+                except Exception as e:
+                    logger.error(f"Error checking Docker host {host.name}: {str(e)}")
+            
+            await asyncio.sleep(self.host_check_interval)
+
+    def _forget_host_containers(self, host: DockerHost):
+        """Drop warm and service containers on a dead host so they get recreated elsewhere"""
+        
+        lost = set(self.hosts.drop_host_containers(host))
+        for container_id, entry in list(self.container_index.items()):
+            if entry["host"] is host:
+                self.container_index.pop(container_id, None)
+        
+        for session_id, info in list(self.warm_containers.items()):
+            if info["container"].id in lost and not info["in_use"]:
+                self.warm_containers.pop(session_id, None)
+                self._remove_workspace(info["container"])
+                logger.warning(f"Dropped warm container for session {session_id}: host {host.name} is down")
+        
+        for name, info in list(self.service_containers.items()):
+            if info["container"].id in lost:
+                self.service_containers.pop(name, None)
+                logger.warning(f"Dropped service container {name}: host {host.name} is down")
 
     async def get_stats(self) -> Dict:
         """Get container manager statistics"""
@@ -246,7 +934,7 @@ class ContainerManager:
         total_memory = 0
         total_cpu = 0
         
-        for container_info in self.active_containers.values():
+        for container_info in list(self.active_containers.values()) + list(self.warm_containers.values()):
             try:
                 container = container_info["container"]
                 stats = container.stats(stream=False)
@@ -265,23 +953,28 @@ class ContainerManager:
         
         return {
             "active_containers": self.stats["active_containers"],
+            "warm_containers": len(self.warm_containers),
+            "max_containers": self.max_containers,
             "total_executions": self.stats["total_executions"],
             "average_execution_time": avg_execution_time,
             "memory_usage": total_memory,
             "cpu_usage": total_cpu,
-            "uptime": time.time()
+            "uptime": time.time(),
+            "hosts": self.hosts.get_stats(),
+            "indexed_containers": len(self.container_index),
+            "event_streams": {name: watcher.connected for name, watcher in self._event_watchers.items()}
         }
 
-    async def get_container_logs(self, execution_id: str) -> str:
-        """Get logs from a specific container"""
+    async def get_container_logs(self, execution_id: str, tail: int = 1000) -> str:
+        """Get the last `tail` lines of a container's logs; full outputs live in the output store"""
         
         if execution_id not in self.active_containers:
             return "Container not found"
         
         try:
             container = self.active_containers[execution_id]["container"]
-            logs = container.logs(stdout=True, stderr=True, timestamps=True)
-            return logs.decode('utf-8')
+            logs = container.logs(stdout=True, stderr=True, timestamps=True, tail=tail)
+            return logs.decode('utf-8', 'replace')
         except Exception as e:
             logger.error(f"Failed to get logs for container {execution_id}: {str(e)}")
             return f"Error retrieving logs: {str(e)}"
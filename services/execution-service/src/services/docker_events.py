@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .docker_hosts import DockerHost
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Container events the manager keeps its index with
+WATCHED_EVENTS = ["create", "die", "oom", "destroy"]
+
+class DockerEventWatcher:
+    """Follows one host's container events on a thread and hands them to the event loop.
+
+    docker-py's event stream is a blocking iterator, so it runs on a daemon
+    thread; each event is passed to `handler(host, event)` on the loop. After
+    a dropped connection the stream is reopened from the last event's time,
+    so events are not lost but may be delivered twice.
+    """
+
+    def __init__(
+        self,
+        host: DockerHost,
+        handler: Callable[[DockerHost, Dict], None],
+        loop: asyncio.AbstractEventLoop,
+        retry_interval: float = 2.0
+    ):
+        self.host = host
+        self.handler = handler
+        self.loop = loop
+        self.retry_interval = retry_interval
+        self.since = time.time()
+        self.connected = False
+        self._stream = None
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"docker-events-{self.host.name}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                self._stream = self.host.client.events(
+                    since=int(self.since),
+                    decode=True,
+                    filters={
+                        "type": "container",
+                        "label": "service=code-execution",
+                        "event": WATCHED_EVENTS
+                    }
+                )
+                self.connected = True
+                for event in self._stream:
+                    self.since = event.get("time", self.since)
+                    self.loop.call_soon_threadsafe(self.handler, self.host, event)
+            except Exception as e:
+                if not self._stopped:
+                    logger.warning(f"Docker event stream for {self.host.name} failed: {str(e)}")
+            finally:
+                self.connected = False
+                self._stream = None
+
+            if not self._stopped:
+                time.sleep(self.retry_interval)
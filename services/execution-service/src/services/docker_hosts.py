@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import docker
+from docker.errors import APIError, ImageNotFound, NotFound
+
+from .tracing import get_tracer
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class NoHealthyHost(Exception):
+    """Raised when no Docker host can take another container"""
+
+class ImageUnavailable(Exception):
+    """Raised when an image can't be had on a host, which says nothing about the host's health"""
+
+class DockerHost:
+    """One Docker endpoint and what we know about it"""
+
+    def __init__(self, name: str, client, max_containers: int = 50):
+        self.name = name
+        self.client = client
+        self.max_containers = max_containers
+        self.healthy = True
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_check = 0.0
+        # Images known to be present, so placement can skip an images.get per create
+        self.images: Set[str] = set()
+        # container id -> (image, warm) for containers created here and not yet removed
+        self.containers: Dict[str, tuple] = {}
+
+    @property
+    def load(self) -> float:
+        return len(self.containers) / self.max_containers if self.max_containers else 1.0
+
+    def has_capacity(self) -> bool:
+        return len(self.containers) < self.max_containers
+
+    def warm_count(self, image: str) -> int:
+        return sum(1 for placed_image, warm in self.containers.values() if warm and placed_image == image)
+
+    def get_stats(self) -> Dict:
+        return {
+            "healthy": self.healthy,
+            "containers": len(self.containers),
+            "max_containers": self.max_containers,
+            "warm_containers": sum(1 for _, warm in self.containers.values() if warm),
+            "images": len(self.images),
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+class DockerHostPool:
+    """Docker endpoints that execution containers are spread across.
+
+    Placement prefers healthy hosts that already have the image, then hosts
+    already running warm containers of it (their layers and page cache are
+    hot), then the least loaded. A host that fails `failure_threshold` calls
+    in a row is marked down and skipped until a health check succeeds.
+
+    Images that are built rather than pulled are registered with the function
+    that builds one on a host. They are placed only on hosts that have them
+    and are built again on hosts that come back.
+    """
+
+    def __init__(self, hosts: List[DockerHost], failure_threshold: int = 3):
+        if not hosts:
+            raise ValueError("At least one Docker host is required")
+        self.hosts = hosts
+        self.failure_threshold = failure_threshold
+        self._by_container: Dict[str, DockerHost] = {}
+        self._lock = threading.Lock()
+        # Image tag -> function that builds it on a host (blocking)
+        self.built_images: Dict[str, Callable[[DockerHost], None]] = {}
+
+    @classmethod
+    def from_env(cls) -> "DockerHostPool":
+        """Hosts from DOCKER_HOSTS ("name=url,..." or "url,..."), else the local daemon"""
+
+        max_containers = int(os.getenv("DOCKER_HOST_MAX_CONTAINERS", "50"))
+        spec = os.getenv("DOCKER_HOSTS", "").strip()
+        if not spec:
+            return cls([DockerHost("local", docker.from_env(), max_containers)])
+
+        hosts = []
+        for index, entry in enumerate(item.strip() for item in spec.split(",")):
+            if not entry:
+                continue
+            name, _, url = entry.rpartition("=")
+            hosts.append(DockerHost(name or f"host-{index}", docker.DockerClient(base_url=url), max_containers))
+        return cls(hosts)
+
+    @property
+    def primary(self) -> DockerHost:
+        """First healthy host, for work that isn't placed per container"""
+        return next((host for host in self.hosts if host.healthy), self.hosts[0])
+
+    def healthy_hosts(self) -> List[DockerHost]:
+        return [host for host in self.hosts if host.healthy]
+
+    def has_capacity(self) -> bool:
+        return any(host.healthy and host.has_capacity() for host in self.hosts)
+
+    def candidates(self, image: str) -> List[DockerHost]:
+        """Healthy hosts with room, best placement first"""
+
+        with self._lock:
+            hosts = [host for host in self.hosts if host.healthy and host.has_capacity()]
+            if image in self.built_images:
+                hosts = [host for host in hosts if image in host.images]
+            return sorted(
+                hosts,
+                key=lambda host: (image not in host.images, -host.warm_count(image), host.load)
+            )
+
+    def host_for(self, container) -> Optional[DockerHost]:
+        return self._by_container.get(container.id)
+
+    def create_container(self, config: Dict):
+        """Create a container on the best host, failing over to the next ones (blocking)"""
+
+        image = config["image"]
+        warm = (config.get("labels") or {}).get("warm") == "true"
+        last_error: Optional[Exception] = None
+        missing: Optional[ImageUnavailable] = None
+
+        for host in self.candidates(image):
+            try:
+                self._ensure_image(host, image)
+                try:
+                    container = host.client.containers.create(**config)
+                except ImageNotFound:
+                    # Removed behind our back since we cached it
+                    host.images.discard(image)
+                    self._ensure_image(host, image)
+                    container = host.client.containers.create(**config)
+            except ImageUnavailable as e:
+                # Another host may have it
+                logger.warning(str(e))
+                missing = e
+                continue
+            except Exception as e:
+                if not self._is_host_failure(e):
+                    raise
+                self.record_failure(host, e)
+                last_error = e
+                continue
+
+            self.record_success(host)
+            with self._lock:
+                host.containers[container.id] = (image, warm)
+                self._by_container[container.id] = host
+            return container
+
+        if last_error is not None:
+            raise NoHealthyHost(f"All Docker hosts failed, last error: {last_error}")
+        if missing is not None:
+            raise missing
+        if image in self.built_images:
+            raise ImageUnavailable(f"No healthy Docker host with capacity has {image}")
+        raise NoHealthyHost("No healthy Docker host has capacity")
+
+    def release(self, container):
+        """Forget a container that has been removed"""
+
+        self.forget(container.id)
+
+    def forget(self, container_id: str):
+        with self._lock:
+            host = self._by_container.pop(container_id, None)
+            if host is not None:
+                host.containers.pop(container_id, None)
+
+    def register_built_image(self, image: str, build: Callable[[DockerHost], None]):
+        """Mark an image as built per host by `build` instead of pulled"""
+        self.built_images[image] = build
+
+    def build_image(self, image: str, hosts: Optional[List[DockerHost]] = None) -> int:
+        """Build a registered image on hosts (default: the healthy ones); returns how many have it (blocking)"""
+
+        built = 0
+        for host in self.healthy_hosts() if hosts is None else hosts:
+            try:
+                self.built_images[image](host)
+            except Exception as e:
+                logger.error(f"Failed to build {image} on {host.name}: {str(e)}")
+                continue
+            host.images.add(image)
+            built += 1
+        return built
+
+    def prepare_host(self, host: DockerHost):
+        """Build the registered images on a host that came back (blocking)"""
+        for image in list(self.built_images):
+            self.build_image(image, [host])
+
+    def _ensure_image(self, host: DockerHost, image: str):
+        if image in host.images:
+            return
+        if image in self.built_images:
+            # Removed since it was built; there is nothing to pull
+            raise ImageUnavailable(f"Image {image} is not built on {host.name}")
+        with get_tracer().span("execution.image_check", host=host.name, image=image) as span:
+            try:
+                host.client.images.get(image)
+            except ImageNotFound:
+                logger.info(f"Pulling image {image} on {host.name}...")
+                if span is not None:
+                    span.set(pulled=True)
+                try:
+                    host.client.images.pull(image)
+                except NotFound as e:
+                    raise ImageUnavailable(f"Image {image} can't be pulled on {host.name}: {str(e)}") from e
+                logger.info(f"Successfully pulled image {image} on {host.name}")
+        host.images.add(image)
+
+    @staticmethod
+    def _is_host_failure(error: Exception) -> bool:
+        # 4xx answers mean the daemon is up and rejected this request
+        if isinstance(error, APIError):
+            return error.status_code is None or error.status_code >= 500
+        return True
+
+    def record_failure(self, host: DockerHost, error: Exception):
+        host.failures += 1
+        host.last_error = str(error)
+        if host.healthy and host.failures >= self.failure_threshold:
+            host.healthy = False
+            logger.error(f"Docker host {host.name} marked down: {str(error)}")
+        else:
+            logger.warning(f"Docker host {host.name} failed: {str(error)}")
+
+    def record_success(self, host: DockerHost):
+        host.failures = 0
+
+    def check(self, host: DockerHost) -> bool:
+        """Ping a host and update its health; returns whether it just went down (blocking)"""
+
+        was_healthy = host.healthy
+        host.last_check = time.time()
+        try:
+            host.client.ping()
+        except Exception as e:
+            host.failures = max(host.failures + 1, self.failure_threshold)
+            host.last_error = str(e)
+            host.healthy = False
+            if was_healthy:
+                logger.error(f"Docker host {host.name} is down: {str(e)}")
+            return was_healthy
+
+        if not was_healthy:
+            # Images may have changed while it was away
+            host.images.clear()
+            logger.info(f"Docker host {host.name} is back")
+        host.healthy = True
+        host.failures = 0
+        return False
+
+    def drop_host_containers(self, host: DockerHost) -> List[str]:
+        """Forget every container on a host that went down; returns their ids"""
+
+        with self._lock:
+            container_ids = list(host.containers)
+            for container_id in container_ids:
+                self._by_container.pop(container_id, None)
+            host.containers.clear()
+        return container_ids
+
+    def get_stats(self) -> Dict:
+        return {host.name: host.get_stats() for host in self.hosts}
@@ -0,0 +1,339 @@
+import io
+from typing import Dict
+
+from .code_injector import CodeInjector
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Helper files baked into the prepared images
+JVM_DIR = "/opt/jvm"
+# Runtime state of the compile daemon (control FIFO, pid, requests)
+COMPILE_DAEMON_DIR = "/tmp/jvm-compile"
+
+# Short-lived programs on small heaps: C1 only, the serial collector, no
+# perf data file, and the (regenerated) default CDS archive
+JVM_FLAGS = ["-XX:TieredStopAtLevel=1", "-XX:+UseSerialGC", "-XX:-UsePerfData", "-Xshare:auto"]
+JAVA_FLAGS = " ".join(JVM_FLAGS)
+JAVAC_FLAGS = " ".join(f"-J{flag}" for flag in JVM_FLAGS)
+JAVA_OPTS = f"export JAVA_OPTS='{JAVA_FLAGS}'; "
+
+# The daemon stays resident next to the program, so it returns heap between compiles
+COMPILE_DAEMON_FLAGS = (
+    "-XX:+UseSerialGC -XX:-UsePerfData -Xshare:auto -XX:MaxRAMPercentage=50 "
+    "-XX:MinHeapFreeRatio=10 -XX:MaxHeapFreeRatio=20 -Dkotlin.environment.keepalive=true"
+)
+
+KOTLIN_COMPILER_URL = "https://github.com/JetBrains/kotlin/releases/download/v1.9.0/kotlin-compiler-1.9.0.zip"
+
+# Compiles requests from a FIFO in one long-lived JVM, so javac and kotlinc
+# run with loaded classes and JIT-compiled code instead of starting cold.
+# Each request dir holds an `args` file (tool, then one argument per line);
+# the daemon writes `out` and then renames `status` into place.
+COMPILE_SERVER = r'''
+import java.io.*;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.*;
+import java.util.*;
+import javax.tools.ToolProvider;
+
+public class CompileServer {
+    private static Object kotlinCompiler;
+    private static Method kotlinExec;
+
+    public static void main(String[] args) throws Exception {
+        Path dir = Paths.get(args[0]);
+        Path control = dir.resolve("control");
+        Files.deleteIfExists(control);
+        new ProcessBuilder("mkfifo", control.toString()).inheritIO().start().waitFor();
+
+        warmUp(dir);
+
+        Files.write(dir.resolve("pid.tmp"), String.valueOf(ProcessHandle.current().pid()).getBytes());
+        Files.move(dir.resolve("pid.tmp"), dir.resolve("pid"), StandardCopyOption.ATOMIC_MOVE);
+
+        while (true) {
+            try (BufferedReader reader = Files.newBufferedReader(control)) {
+                String line;
+                while ((line = reader.readLine()) != null) {
+                    if (!line.isEmpty()) {
+                        handle(Paths.get(line));
+                    }
+                }
+            }
+        }
+    }
+
+    // Compile a small program once so the first real request finds a warm JIT
+    private static void warmUp(Path dir) throws Exception {
+        Path work = Files.createTempDirectory(dir, "warmup");
+        Path java = work.resolve("Hello.java");
+        Files.write(java, "public class Hello { public static void main(String[] a) { System.out.println(a.length); } }".getBytes());
+        PrintStream sink = new PrintStream(new ByteArrayOutputStream());
+        compile(Arrays.asList("javac", "-d", work.toString(), java.toString()), sink);
+        if (Files.isDirectory(Paths.get("/opt/kotlinc/lib"))) {
+            Path kotlin = work.resolve("hello.kt");
+            Files.write(kotlin, "fun main() { println(listOf(1, 2).sum()) }".getBytes());
+            compile(Arrays.asList("kotlinc", kotlin.toString(), "-d", work.resolve("kt").toString()), sink);
+        }
+        new ProcessBuilder("rm", "-rf", work.toString()).start();
+        System.gc();
+    }
+
+    private static void handle(Path request) {
+        ByteArrayOutputStream output = new ByteArrayOutputStream();
+        int status;
+        try (PrintStream out = new PrintStream(output, true, "UTF-8")) {
+            List<String> args = new ArrayList<>();
+            try {
+                for (String arg : Files.readAllLines(request.resolve("args"), StandardCharsets.UTF_8)) {
+                    // -J flags are for the cold launcher's JVM
+                    if (!arg.startsWith("-J")) {
+                        args.add(arg);
+                    }
+                }
+                status = compile(args, out);
+            } catch (Throwable e) {
+                e.printStackTrace(out);
+                status = 1;
+            }
+        } catch (UnsupportedEncodingException e) {
+            throw new RuntimeException(e);
+        }
+        try {
+            Files.write(request.resolve("out"), output.toByteArray());
+            Files.write(request.resolve("status.tmp"), (status + "\n").getBytes());
+            Files.move(request.resolve("status.tmp"), request.resolve("status"), StandardCopyOption.ATOMIC_MOVE);
+        } catch (IOException e) {
+            e.printStackTrace();
+        }
+        System.gc();
+    }
+
+    private static int compile(List<String> args, PrintStream out) throws Exception {
+        String tool = args.get(0);
+        String[] rest = args.subList(1, args.size()).toArray(new String[0]);
+        if (tool.equals("javac")) {
+            return ToolProvider.getSystemJavaCompiler().run(null, out, out, rest);
+        }
+        if (tool.equals("kotlinc")) {
+            return kotlinc(rest, out);
+        }
+        out.println("Unsupported compiler: " + tool);
+        return 2;
+    }
+
+    private static int kotlinc(String[] args, PrintStream out) throws Exception {
+        if (kotlinExec == null) {
+            File[] jars = new File("/opt/kotlinc/lib").listFiles((d, name) -> name.endsWith(".jar"));
+            URL[] urls = new URL[jars.length];
+            for (int i = 0; i < jars.length; i++) {
+                urls[i] = jars[i].toURI().toURL();
+            }
+            ClassLoader loader = new URLClassLoader(urls, ClassLoader.getPlatformClassLoader());
+            Thread.currentThread().setContextClassLoader(loader);
+            Class<?> compiler = Class.forName("org.jetbrains.kotlin.cli.jvm.K2JVMCompiler", true, loader);
+            kotlinCompiler = compiler.getDeclaredConstructor().newInstance();
+            kotlinExec = compiler.getMethod("exec", PrintStream.class, String[].class);
+        }
+        String[] full = new String[args.length + 2];
+        full[0] = "-kotlin-home";
+        full[1] = "/opt/kotlinc";
+        System.arraycopy(args, 0, full, 2, args.length);
+        Object code = kotlinExec.invoke(kotlinCompiler, out, (Object) full);
+        return (Integer) code.getClass().getMethod("getCode").invoke(code);
+    }
+}
+'''
+
+# Usage: compile TOOL ARGS...
+# Compiles through the compile daemon when it runs in this container,
+# otherwise runs TOOL ARGS as a normal cold compiler.
+COMPILE_CLIENT = f'''
+dir={COMPILE_DAEMON_DIR}
+
+alive() {{
+    pid=$(cat $dir/pid 2>/dev/null)
+    [ -n "$pid" ] && grep -q '^State:[[:space:]]*[RSD]' /proc/$pid/status 2>/dev/null
+}}
+
+if ! alive; then
+    # Restart a daemon that was ready here and died; one still warming up has no pid yet
+    if [ -f $dir/pid ]; then
+        rm -f $dir/pid
+        sh {JVM_DIR}/compile-daemon </dev/null >/dev/null 2>&1 &
+    fi
+    exec "$@"
+fi
+
+req=$(mktemp -d $dir/r.XXXXXX) || exec "$@"
+for arg in "$@"; do printf '%s\\n' "$arg"; done >$req/args
+echo "$req" >$dir/control
+
+while [ ! -e $req/status ]; do
+    if ! alive; then
+        rm -rf $req
+        exec "$@"
+    fi
+    sleep 0.01
+done
+
+cat $req/out
+status=$(cat $req/status)
+rm -rf $req
+exit "$status"
+'''
+
+COMPILE_DAEMON_START = (
+    f"mkdir -p {COMPILE_DAEMON_DIR} && cd /app && "
+    f"exec java {COMPILE_DAEMON_FLAGS} -cp {JVM_DIR} CompileServer {COMPILE_DAEMON_DIR} "
+    f"</dev/null >{COMPILE_DAEMON_DIR}/log 2>&1\n"
+)
+
+HELLO_PROGRAMS = {
+    "Hello.java": "public class Hello { public static void main(String[] a) { System.out.println(\"hello\"); } }\n",
+    "hello.kt": "fun main() { println(\"hello\") }\n",
+    "hello.scala": "println(\"hello\")\n"
+}
+
+# Record the classes a hello-world compile and run load, then rebuild the
+# JDK's default CDS archive from them so every JVM in the image maps them
+# instead of parsing and verifying them at startup.
+CDS_JAVA_STEPS = (
+    f"cd {JVM_DIR} "
+    "&& javac -J-Xshare:off -J-XX:DumpLoadedClassList=javac.classlist Hello.java "
+    "&& java -Xshare:off -XX:DumpLoadedClassList=java.classlist -cp . Hello "
+)
+CDS_KOTLIN_STEPS = (
+    "&& JAVA_OPTS='-Xshare:off -XX:DumpLoadedClassList=kotlinc.classlist' kotlinc hello.kt -include-runtime -d hello.jar "
+    "&& java -Xshare:off -XX:DumpLoadedClassList=kotlin.classlist -jar hello.jar "
+)
+CDS_SCALA_STEPS = (
+    f"cd {JVM_DIR} "
+    "&& JAVA_OPTS='-Xshare:off -XX:DumpLoadedClassList=scala.classlist' scala hello.scala "
+)
+CDS_DUMP = (
+    "&& sort -u *.classlist > default.classlist "
+    "&& java -Xshare:dump -XX:SharedClassListFile=default.classlist "
+    "&& rm -f *.classlist Hello* hello* "
+)
+
+# One image serves Java and Kotlin; Scala keeps its own base
+JVM_IMAGES = {
+    "jvm": {
+        "tag": "code-execution/jvm:11-cds",
+        "languages": ["java", "kotlin"],
+        "dockerfile": f"""FROM openjdk:11-jdk-slim
+RUN apt-get update && apt-get install -y --no-install-recommends wget unzip \\
+ && wget -q -O /tmp/kotlin.zip {KOTLIN_COMPILER_URL} \\
+ && unzip -q /tmp/kotlin.zip -d /opt && rm /tmp/kotlin.zip \\
+ && ln -s /opt/kotlinc/bin/kotlinc /usr/local/bin/kotlinc \\
+ && apt-get purge -y wget unzip && rm -rf /var/lib/apt/lists/*
+COPY jvm/ {JVM_DIR}/
+RUN {CDS_JAVA_STEPS}{CDS_KOTLIN_STEPS}{CDS_DUMP}\\
+ && javac -d {JVM_DIR} {JVM_DIR}/CompileServer.java && rm {JVM_DIR}/CompileServer.java
+"""
+    },
+    "scala": {
+        "tag": "code-execution/scala:2.13-cds",
+        "languages": ["scala"],
+        "dockerfile": f"""FROM hseeberger/scala-sbt:11.0.16_1.7.1_2.13.8
+COPY jvm/ {JVM_DIR}/
+RUN {CDS_SCALA_STEPS}{CDS_DUMP}&& rm {JVM_DIR}/CompileServer.java
+"""
+    }
+}
+
+COMPILE_JAVA = f"sh {JVM_DIR}/compile javac {JAVAC_FLAGS}"
+COMPILE_KOTLIN = f"{JAVA_OPTS}sh {JVM_DIR}/compile kotlinc"
+
+# Language config changes for the prepared images. "build" is
+# (source, artifact, compile, run) and replaces the run and incremental
+# commands; None removes a key.
+PREPARED_JVM_CONFIGS = {
+    "java": {
+        "image": JVM_IMAGES["jvm"]["tag"],
+        "build": ("Main.java", "Main.class", f"{COMPILE_JAVA} Main.java", f"java {JAVA_FLAGS} Main"),
+        "project_command": (
+            f"cd /app && {COMPILE_JAVA} -d .classes $(find . -name '*.java') "
+            f"&& java {JAVA_FLAGS} -cp .classes {{main_class}}"
+        ),
+        "compile_daemon": True
+    },
+    "kotlin": {
+        "image": JVM_IMAGES["jvm"]["tag"],
+        "build": (
+            "code.kt", "code.jar",
+            f"{COMPILE_KOTLIN} code.kt -include-runtime -d code.jar",
+            f"java {JAVA_FLAGS} -jar code.jar"
+        ),
+        "project_command": (
+            f"cd /app && {COMPILE_KOTLIN} $(find . -name '*.kt') -include-runtime -d code.jar "
+            f"&& java {JAVA_FLAGS} -jar code.jar"
+        ),
+        # The Kotlin compiler needs room next to the program when resident
+        "memory_limit": "512m",
+        # The prepared image already has the compiler
+        "setup_commands": None,
+        "compile_daemon": True
+    },
+    "scala": {
+        "image": JVM_IMAGES["scala"]["tag"],
+        "run_command": ["sh", "-c", f"{JAVA_OPTS}scala /app/code.scala"]
+    }
+}
+
+class JvmImageBuilder:
+    """Builds the prepared JVM images from in-memory build contexts"""
+
+    def __init__(self, docker_client, code_injector: CodeInjector):
+        self.docker_client = docker_client
+        self.code_injector = code_injector
+
+    def _context(self, name: str) -> bytes:
+        files = [
+            ("Dockerfile", JVM_IMAGES[name]["dockerfile"]),
+            ("jvm/CompileServer.java", COMPILE_SERVER),
+            ("jvm/compile", COMPILE_CLIENT),
+            ("jvm/compile-daemon", COMPILE_DAEMON_START)
+        ] + [(f"jvm/{filename}", source) for filename, source in HELLO_PROGRAMS.items()]
+        return bytes(self.code_injector.build_archive(
+            [(path, content.encode('utf-8')) for path, content in files]
+        ))
+
+    def ensure(self, name: str) -> str:
+        """Return the image's tag, building it first if it doesn't exist (blocking)"""
+
+        tag = JVM_IMAGES[name]["tag"]
+        try:
+            self.docker_client.images.get(tag)
+            return tag
+        except Exception:
+            pass
+
+        logger.info(f"Building prepared JVM image {tag}")
+        self.docker_client.images.build(
+            fileobj=io.BytesIO(self._context(name)),
+            custom_context=True,
+            tag=tag,
+            rm=True
+        )
+        logger.info(f"Built prepared JVM image {tag}")
+        return tag
+
+def start_compile_daemon(container) -> bool:
+    """Start the resident compiler in a running container of a prepared image"""
+
+    try:
+        container.exec_run(["sh", f"{JVM_DIR}/compile-daemon"], detach=True, workdir='/app')
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to start compile daemon in {container.id[:12]}: {str(e)}")
+        return False
+
+def compile_daemon_ready(container) -> bool:
+    result = container.exec_run(["test", "-f", f"{COMPILE_DAEMON_DIR}/pid"])
+    return result.exit_code == 0
@@ -0,0 +1,182 @@
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Each record in a segment file is this header (raw sha256, length) followed by the data
+RECORD_HEADER = struct.Struct(">32sQ")
+
+SEGMENT_NAME = re.compile(r"^(\d{8})\.seg$")
+HANDLE = re.compile(r"^[0-9a-f]{64}$")
+
+def is_output_handle(value: str) -> bool:
+    return bool(HANDLE.match(value))
+
+class OutputBlobStore:
+    """Content-addressed store for execution outputs too large to return inline.
+
+    Outputs are appended to segment files under `root` and read back through
+    mmap, so a ranged read touches only the pages it needs. Identical outputs
+    are stored once. A segment is closed at `segment_bytes`; once the store
+    exceeds `max_bytes` the oldest segments are deleted whole. The index is
+    rebuilt from the record headers at startup.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        max_bytes: int = 1024 * 1024 * 1024
+    ):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # digest -> (segment, data offset, length)
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+        # segment -> bytes written, oldest first
+        self._segments: Dict[int, int] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "deduplicated": 0, "reads": 0, "evicted_segments": 0}
+
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> "OutputBlobStore":
+        return cls(
+            os.getenv("OUTPUT_STORE_DIR", "/tmp/execution-outputs"),
+            max_bytes=int(os.getenv("OUTPUT_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+        )
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.root, f"{segment:08d}.seg")
+
+    def _load(self):
+        """Index the records of segments left by an earlier run"""
+
+        segments = sorted(
+            int(match.group(1))
+            for match in (SEGMENT_NAME.match(name) for name in os.listdir(self.root))
+            if match
+        )
+        for segment in segments:
+            path = self._path(segment)
+            size = os.path.getsize(path)
+            offset = 0
+            with open(path, "rb") as f:
+                while offset + RECORD_HEADER.size <= size:
+                    raw_digest, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                    if offset + RECORD_HEADER.size + length > size:
+                        break
+                    self._index[raw_digest.hex()] = (segment, offset + RECORD_HEADER.size, length)
+                    offset += RECORD_HEADER.size + length
+                    f.seek(offset)
+            if offset < size:
+                # A write cut short by a crash
+                logger.warning(f"Truncating partial record at {offset} in {path}")
+                os.truncate(path, offset)
+            self._segments[segment] = offset
+            self.total_bytes += offset
+
+        if self._index:
+            logger.info(f"Loaded {len(self._index)} stored outputs from {len(segments)} segments")
+
+    def put(self, data: bytes) -> str:
+        """Store an output and return its handle, the sha256 of its content (blocking)"""
+
+        digest = hashlib.sha256(data).digest()
+        handle = digest.hex()
+        record_size = RECORD_HEADER.size + len(data)
+
+        with self._lock:
+            self.stats["puts"] += 1
+            if handle in self._index:
+                self.stats["deduplicated"] += 1
+                return handle
+
+            if not self._segments:
+                self._segments[0] = 0
+            segment = max(self._segments)
+            if self._segments[segment] and self._segments[segment] + record_size > self.segment_bytes:
+                segment += 1
+                self._segments[segment] = 0
+
+            offset = self._segments[segment]
+            with open(self._path(segment), "ab") as f:
+                f.write(RECORD_HEADER.pack(digest, len(data)))
+                f.write(data)
+
+            self._index[handle] = (segment, offset + RECORD_HEADER.size, len(data))
+            self._segments[segment] = offset + record_size
+            self.total_bytes += record_size
+            self._evict()
+
+        return handle
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._segments) > 1:
+            segment = min(self._segments)
+            self.total_bytes -= self._segments.pop(segment)
+            stale = self._maps.pop(segment, None)
+            if stale is not None:
+                stale.close()
+            for handle in [handle for handle, location in self._index.items() if location[0] == segment]:
+                del self._index[handle]
+            try:
+                os.remove(self._path(segment))
+            except OSError as e:
+                logger.warning(f"Failed to remove output segment {segment}: {str(e)}")
+            self.stats["evicted_segments"] += 1
+
+    def _map(self, segment: int, needed: int) -> mmap.mmap:
+        # The open segment grows, so remap it when a record lies past the current mapping
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < needed:
+            if mapped is not None:
+                mapped.close()
+            with open(self._path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def size(self, handle: str) -> Optional[int]:
+        location = self._index.get(handle)
+        return location[2] if location else None
+
+    def read(self, handle: str, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        """Bytes [start, end) of a stored output, or None if it is not stored (blocking)"""
+
+        with self._lock:
+            location = self._index.get(handle)
+            if location is None:
+                return None
+            segment, offset, length = location
+            end = length if end is None else min(end, length)
+            start = min(max(start, 0), end)
+            self.stats["reads"] += 1
+            if start == end:
+                return b""
+            return self._map(segment, offset + length)[offset + start:offset + end]
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "outputs": len(self._index),
+            "segments": len(self._segments),
+            "bytes": self.total_bytes
+        }
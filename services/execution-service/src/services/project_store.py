@@ -0,0 +1,119 @@
+import hashlib
+import posixpath
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_PROJECT_FILES = 500
+MAX_PROJECT_BYTES = 20 * 1024 * 1024
+
+class MissingProjectBlobs(Exception):
+    """Raised when a manifest references blobs the service does not hold"""
+
+    def __init__(self, hashes: List[str]):
+        super().__init__(f"{len(hashes)} project blobs must be uploaded first")
+        self.hashes = hashes
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def normalize_project_path(path: str) -> str:
+    """Validate a project-relative path and return its normalized form"""
+
+    normalized = posixpath.normpath(path.replace("\\", "/"))
+    if (
+        not path
+        or path.startswith("/")
+        or normalized in (".", "..")
+        or normalized.startswith("../")
+        or "\0" in path
+    ):
+        raise ValueError(f"Invalid project path: {path!r}")
+    return normalized
+
+class ProjectBlobStore:
+    """Content-addressed store of project file contents.
+
+    Clients send a manifest of path -> sha256 and upload only the blobs the
+    store reports missing. Blobs are kept in memory, least recently used
+    first out once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def put(self, data: bytes, expected_hash: Optional[str] = None) -> str:
+        """Store a blob and return its hash"""
+
+        digest = blob_hash(data)
+        if expected_hash is not None and expected_hash.lower() != digest:
+            raise ValueError(f"Blob content does not match hash {expected_hash}")
+
+        if digest in self._blobs:
+            self._blobs.move_to_end(digest)
+            return digest
+
+        self._blobs[digest] = data
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes and len(self._blobs) > 1:
+            _, evicted = self._blobs.popitem(last=False)
+            self.total_bytes -= len(evicted)
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        data = self._blobs.get(digest.lower())
+        if data is not None:
+            self._blobs.move_to_end(digest.lower())
+        return data
+
+    def missing(self, hashes: List[str]) -> List[str]:
+        """Hashes from the list that are not stored"""
+        return [digest for digest in dict.fromkeys(hashes) if digest.lower() not in self._blobs]
+
+    def resolve(
+        self,
+        files: Dict[str, str],
+        manifest: Dict[str, str],
+        blobs: Dict[str, str]
+    ) -> Dict[str, Tuple[str, bytes]]:
+        """Turn inline files and a manifest into path -> (hash, content)"""
+
+        for digest, content in blobs.items():
+            self.put(content.encode('utf-8'), expected_hash=digest)
+
+        project: Dict[str, Tuple[str, bytes]] = {}
+        missing = []
+
+        for path, content in files.items():
+            data = content.encode('utf-8')
+            project[normalize_project_path(path)] = (self.put(data), data)
+
+        for path, digest in manifest.items():
+            data = self.get(digest)
+            if data is None:
+                missing.append(digest)
+                continue
+            project[normalize_project_path(path)] = (digest.lower(), data)
+
+        if missing:
+            raise MissingProjectBlobs(sorted(set(missing)))
+
+        if not project:
+            raise ValueError("Project has no files")
+        if len(project) > MAX_PROJECT_FILES:
+            raise ValueError(f"Project cannot exceed {MAX_PROJECT_FILES} files")
+        if sum(len(data) for _, data in project.values()) > MAX_PROJECT_BYTES:
+            raise ValueError(f"Project cannot exceed {MAX_PROJECT_BYTES} bytes")
+
+        return project
+
+    def get_stats(self) -> Dict:
+        return {
+            "blobs": len(self._blobs),
+            "bytes": self.total_bytes
+        }
@@ -0,0 +1,436 @@
+import io
+import os
+import re
+import resource
+import shlex
+import shutil
+import signal
+import subprocess
+import tarfile
+import tempfile
+import threading
+import uuid
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Same shape as docker-py's exec_run result
+ExecResult = namedtuple("ExecResult", ["exit_code", "output"])
+
+SANDBOX_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+
+# /app in containers is a 100m tmpfs; cap written files the same way
+MAX_FILE_SIZE = 100 * 1024 * 1024
+
+# Exec time limit when the sandbox is created without one, in seconds
+DEFAULT_EXEC_TIMEOUT = 60
+
+# Exit code of an exec killed at its deadline, as coreutils timeout reports it
+TIMEOUT_EXIT_CODE = 124
+
+MEMORY_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+def parse_memory_limit(limit: str) -> int:
+    """Convert a Docker-style memory limit ("128m") to bytes"""
+
+    match = re.fullmatch(r"\s*(\d+)\s*([bkmg]?)b?\s*", str(limit).lower())
+    if not match:
+        raise ValueError(f"Invalid memory limit: {limit}")
+    return int(match.group(1)) * MEMORY_UNITS[match.group(2)]
+
+class SandboxBackend:
+    """Creates isolated environments that code is written into and executed in.
+
+    `create` receives the configuration built by ContainerManager (image,
+    limits, labels) and the execution's time limit, and returns an object
+    with the subset of the docker-py Container API the executor uses: id,
+    labels, start, stop, remove, put_archive, exec_run, stats and
+    client.api.exec_create/exec_start/exec_inspect.
+    """
+
+    name = "base"
+
+    def available_for(self, image: str) -> bool:
+        return True
+
+    def create(self, config: Dict, timeout: Optional[int] = None):
+        raise NotImplementedError
+
+class DockerSandboxBackend(SandboxBackend):
+    """One Docker container per sandbox, placed on a host from the pool"""
+
+    name = "docker"
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    def create(self, config: Dict, timeout: Optional[int] = None):
+        # Containers past their timeout are removed by ContainerManager's cleanup
+        return self.hosts.create_container(config)
+
+class ProcessExecAPI:
+    """Stand-in for docker's low-level exec API, used for streamed output"""
+
+    def __init__(self, sandbox: "ProcessSandbox"):
+        self.sandbox = sandbox
+        self._execs: Dict[str, Dict] = {}
+
+    def exec_create(self, container_id: str, command, stdin: bool = False, **kwargs) -> Dict:
+        exec_id = uuid.uuid4().hex
+        self._execs[exec_id] = {"command": command, "stdin": stdin, "process": None}
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id: str, **kwargs) -> "ProcessOutputStream":
+        entry = self._execs[exec_id]
+        process = self.sandbox._spawn(
+            self.sandbox._normalize_command(entry["command"]),
+            stdin=subprocess.PIPE if entry["stdin"] else subprocess.DEVNULL
+        )
+        entry["process"] = process
+        # Streams are read by the executor until EOF, so the deadline has to come from here
+        entry["watchdog"] = threading.Timer(self.sandbox.timeout, self.sandbox.kill_process, [process])
+        entry["watchdog"].daemon = True
+        entry["watchdog"].start()
+        return ProcessOutputStream(process)
+
+    def exec_inspect(self, exec_id: str) -> Dict:
+        entry = self._execs.pop(exec_id, None)
+        process = entry and entry["process"]
+        if process is None:
+            return {"ExitCode": None, "Running": False}
+        exit_code = process.wait()
+        entry["watchdog"].cancel()
+        return {"ExitCode": exit_code, "Running": False}
+
+class ProcessOutputStream:
+    """Iterable of output chunks; `_sock` accepts stdin like docker's attach socket"""
+
+    def __init__(self, process: subprocess.Popen):
+        self.process = process
+        self._sock = self
+
+    def send(self, data: bytes) -> int:
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+        return len(data)
+
+    def shutdown(self, how: int):
+        if self.process.stdin:
+            self.process.stdin.close()
+
+    def __iter__(self):
+        while True:
+            chunk = self.process.stdout.read1(4096)
+            if not chunk:
+                break
+            yield chunk
+        self.process.wait()
+
+class ProcessSandbox:
+    """A bubblewrap sandbox over a read-only language rootfs.
+
+    Every exec runs in fresh user, PID, IPC, UTS and network namespaces
+    (so there is no network), as uid 1000, with the sandbox's work
+    directory mounted at /app, and is killed after `timeout` seconds.
+    Memory, CPU and process counts are limited by a per-sandbox cgroup v2
+    group when one can be created; otherwise rlimits bound the address
+    space and CPU time, and process counts are not limited.
+    """
+
+    def __init__(self, backend: "ProcessSandboxBackend", config: Dict, rootfs: str, timeout: int):
+        self.backend = backend
+        self.config = config
+        self.rootfs = rootfs
+        self.timeout = timeout
+        self.id = uuid.uuid4().hex + uuid.uuid4().hex
+        self.labels = dict(config.get("labels") or {})
+        self.workdir = tempfile.mkdtemp(prefix=f"{self.id[:12]}-", dir=backend.work_root)
+        os.chmod(self.workdir, 0o777)
+        self.memory_limit = parse_memory_limit(config.get("mem_limit", "128m"))
+        self.cpu_quota = config.get("cpu_quota")
+        self.cpu_period = config.get("cpu_period", 100000)
+        self.environment = dict(config.get("environment") or {})
+        self.cgroup = backend.create_cgroup(self)
+        self._processes: List[subprocess.Popen] = []
+        self._lock = threading.Lock()
+        self.client = self
+        self.api = ProcessExecAPI(self)
+        self.status = "created"
+
+    def start(self):
+        # Nothing runs between execs, so there is nothing to boot
+        self.status = "running"
+
+    def stop(self, timeout: int = 10):
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self.kill_process(process)
+        self.status = "exited"
+
+    def remove(self, force: bool = False):
+        self.stop()
+        if self.cgroup:
+            try:
+                os.rmdir(self.cgroup)
+            except OSError as e:
+                logger.warning(f"Failed to remove sandbox cgroup {self.cgroup}: {str(e)}")
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def put_archive(self, path: str, data) -> bool:
+        if path.rstrip("/") != "/app":
+            raise ValueError(f"Process sandboxes only accept files under /app, not {path}")
+        if not isinstance(data, (bytes, bytearray)):
+            data = b"".join(bytes(chunk) for chunk in data)
+
+        with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+            for member in archive.getmembers():
+                target = os.path.realpath(os.path.join(self.workdir, member.name))
+                if not target.startswith(os.path.realpath(self.workdir) + os.sep):
+                    raise ValueError(f"Archive member escapes the sandbox: {member.name}")
+                if not (member.isfile() or member.isdir()):
+                    raise ValueError(f"Unsupported archive member type: {member.name}")
+            archive.extractall(self.workdir)
+        return True
+
+    def exec_run(self, command, stdin=None, workdir: str = "/app", **kwargs) -> ExecResult:
+        # The executor passes input text through `stdin`; booleans just mean "attach stdin"
+        input_data = stdin.encode('utf-8') if isinstance(stdin, str) else None
+        process = self._spawn(
+            self._normalize_command(command),
+            stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+            workdir=workdir
+        )
+        try:
+            output, _ = process.communicate(input_data, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.kill_process(process)
+            output, _ = process.communicate()
+            return ExecResult(TIMEOUT_EXIT_CODE, output + f"\nTimed out after {self.timeout}s\n".encode())
+        return ExecResult(process.returncode, output)
+
+    def stats(self, stream: bool = False) -> Dict:
+        memory = 0
+        cpu = 0
+        if self.cgroup:
+            # Execs are short and finished by the time stats are read, so report the peak
+            memory = (
+                self.backend.read_cgroup_int(self.cgroup, "memory.peak")
+                or self.backend.read_cgroup_int(self.cgroup, "memory.current")
+            )
+            cpu = self.backend.read_cgroup_usage(self.cgroup) * 1000
+        return {
+            "memory_stats": {"usage": memory, "limit": self.memory_limit},
+            "cpu_stats": {"cpu_usage": {"total_usage": cpu}}
+        }
+
+    def oom_kills(self) -> int:
+        """Processes the OOM killer has killed in this sandbox's cgroup"""
+
+        if not self.cgroup:
+            return 0
+        return self.backend.read_cgroup_stat(self.cgroup, "memory.events", "oom_kill")
+
+    def logs(self, **kwargs) -> bytes:
+        return b""
+
+    @staticmethod
+    def _normalize_command(command) -> List[str]:
+        # docker-py splits string commands the same way
+        return shlex.split(command) if isinstance(command, str) else list(command)
+
+    def _spawn(self, command: List[str], stdin, workdir: str = "/app") -> subprocess.Popen:
+        argv = self.backend.bwrap_command(self, command, workdir)
+        process = subprocess.Popen(
+            argv,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            preexec_fn=self._limit_child,
+            close_fds=True,
+            # Its own process group, so a deadline kills bwrap and the shell wrapper together
+            start_new_session=True
+        )
+        with self._lock:
+            self._processes = [p for p in self._processes if p.poll() is None] + [process]
+        return process
+
+    @staticmethod
+    def kill_process(process: subprocess.Popen):
+        """Kill an exec's process group; bwrap takes the sandboxed processes with it"""
+
+        if process.poll() is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _limit_child(self):
+        """Runs in the child before exec: join the cgroup and apply rlimits"""
+
+        if self.cgroup:
+            with open(os.path.join(self.cgroup, "cgroup.procs"), "w") as f:
+                f.write("0")
+        else:
+            # Without a cgroup, bound the address space instead of resident memory, and
+            # CPU time instead of CPU share. RLIMIT_NPROC would count every process of
+            # the service's uid, so process counts are left to the cgroup.
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit * 2, self.memory_limit * 2))
+            resource.setrlimit(resource.RLIMIT_CPU, (self.timeout, self.timeout + 1))
+
+        resource.setrlimit(resource.RLIMIT_FSIZE, (MAX_FILE_SIZE, MAX_FILE_SIZE))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (256, 256))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+class ProcessSandboxBackend(SandboxBackend):
+    """bubblewrap-based sandboxes over pre-extracted image root filesystems.
+
+    Each image must be extracted once to `<rootfs_root>/<image name>`, where
+    the name has ":" and "/" replaced by "_", for example:
+
+        docker export $(docker create python:3.11-slim) | tar -x -C $ROOTFS/python_3.11-slim
+        mkdir -p $ROOTFS/python_3.11-slim/app
+
+    The rootfs is mounted read-only, so /app must already exist in it.
+    Images without an extracted rootfs are run in Docker instead.
+    """
+
+    name = "process"
+
+    def __init__(
+        self,
+        rootfs_root: str,
+        work_root: Optional[str] = None,
+        cgroup_root: Optional[str] = None,
+        seccomp_filter: Optional[str] = None,
+        bwrap_path: Optional[str] = None
+    ):
+        self.rootfs_root = rootfs_root
+        self.work_root = work_root or tempfile.gettempdir()
+        # A delegated cgroup v2 directory this process may create children in
+        self.cgroup_root = cgroup_root
+        # Compiled seccomp BPF program passed to bwrap --seccomp
+        self.seccomp_filter = seccomp_filter
+        self.bwrap_path = bwrap_path or shutil.which("bwrap")
+        self._warned_no_cgroup = False
+        os.makedirs(self.work_root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["ProcessSandboxBackend"]:
+        """Build the backend from SANDBOX_* settings, or None if it can't run here"""
+
+        rootfs_root = os.getenv("SANDBOX_ROOTFS_DIR")
+        if not rootfs_root:
+            return None
+
+        backend = cls(
+            rootfs_root,
+            work_root=os.getenv("SANDBOX_WORK_DIR"),
+            cgroup_root=os.getenv("SANDBOX_CGROUP_ROOT"),
+            seccomp_filter=os.getenv("SANDBOX_SECCOMP_FILTER")
+        )
+        if not backend.bwrap_path:
+            logger.warning("SANDBOX_ROOTFS_DIR is set but bwrap is not installed; process sandboxes disabled")
+            return None
+        return backend
+
+    def rootfs_for(self, image: str) -> str:
+        return os.path.join(self.rootfs_root, image.replace("/", "_").replace(":", "_"))
+
+    def available_for(self, image: str) -> bool:
+        return os.path.isdir(self.rootfs_for(image))
+
+    def create(self, config: Dict, timeout: Optional[int] = None) -> ProcessSandbox:
+        if config.get("network_disabled") is False:
+            raise ValueError("Process sandboxes never have network access")
+        return ProcessSandbox(self, config, self.rootfs_for(config["image"]), timeout or DEFAULT_EXEC_TIMEOUT)
+
+    def create_cgroup(self, sandbox: ProcessSandbox) -> Optional[str]:
+        if not self.cgroup_root:
+            if not self._warned_no_cgroup:
+                logger.warning(
+                    "No SANDBOX_CGROUP_ROOT; process sandboxes fall back to rlimits, "
+                    "with a CPU time limit but no CPU share or process count cap"
+                )
+                self._warned_no_cgroup = True
+            return None
+
+        path = os.path.join(self.cgroup_root, sandbox.id[:16])
+        try:
+            os.mkdir(path)
+            self._write(path, "memory.max", str(sandbox.memory_limit))
+            self._write(path, "memory.swap.max", "0")
+            self._write(path, "pids.max", "64")
+            if sandbox.cpu_quota:
+                self._write(path, "cpu.max", f"{sandbox.cpu_quota} {sandbox.cpu_period}")
+            return path
+        except OSError as e:
+            logger.error(f"Failed to create sandbox cgroup {path}: {str(e)}")
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _write(cgroup: str, name: str, value: str):
+        with open(os.path.join(cgroup, name), "w") as f:
+            f.write(value)
+
+    @staticmethod
+    def read_cgroup_int(cgroup: str, name: str) -> int:
+        try:
+            with open(os.path.join(cgroup, name)) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def read_cgroup_stat(cgroup: str, name: str, stat: str) -> int:
+        """One counter from a flat-keyed cgroup file such as cpu.stat"""
+
+        try:
+            with open(os.path.join(cgroup, name)) as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == stat:
+                        return int(value)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    @classmethod
+    def read_cgroup_usage(cls, cgroup: str) -> int:
+        """CPU time used by the cgroup, in microseconds"""
+
+        return cls.read_cgroup_stat(cgroup, "cpu.stat", "usage_usec")
+
+    def bwrap_command(self, sandbox: ProcessSandbox, command: List[str], workdir: str) -> List[str]:
+        argv = [
+            self.bwrap_path,
+            "--die-with-parent",
+            "--new-session",
+            "--unshare-all",
+            "--uid", "1000",
+            "--gid", "1000",
+            "--ro-bind", sandbox.rootfs, "/",
+            "--dev", "/dev",
+            "--proc", "/proc",
+            "--tmpfs", "/tmp",
+            "--bind", sandbox.workdir, "/app",
+            "--chdir", workdir,
+            "--clearenv",
+            "--setenv", "PATH", SANDBOX_PATH
+        ]
+        for key, value in sandbox.environment.items():
+            argv.extend(["--setenv", key, str(value)])
+
+        if self.seccomp_filter:
+            # bwrap reads the BPF program from an inherited descriptor
+            argv = ["sh", "-c", f'exec "$@" 3<{shlex.quote(self.seccomp_filter)}', "sh"] + argv + ["--seccomp", "3"]
+
+        return argv + ["--"] + command
@@ -0,0 +1,99 @@
+import json
+import struct
+import uuid
+from typing import Dict, List, Optional, Union
+
+# Wire formats for /api/v1/execute/stream/{session_id}, chosen through the
+# WebSocket subprotocol the client offers. Without one (or with
+# JSON_SUBPROTOCOL) every event is a JSON text frame, as it always was.
+#
+# With BINARY_SUBPROTOCOL, output chunks are binary frames:
+#
+#     byte 0      frame type (FRAME_OUTPUT)
+#     byte 1      stream (STREAM_OUTPUT: combined stdout and stderr)
+#     bytes 2-5   sequence number, big-endian uint32, from 0 per execution
+#     bytes 6-21  execution id, the UUID's 16 raw bytes
+#     rest        the output bytes, unencoded
+#
+# Every other event stays a compact JSON text frame without "timestamp".
+# The final event of an execution carries "output_frames", the number of
+# binary frames sent for it, so clients can tell nothing was dropped.
+JSON_SUBPROTOCOL = "execution.json.v1"
+BINARY_SUBPROTOCOL = "execution.binary.v1"
+
+FRAME_OUTPUT = 1
+STREAM_OUTPUT = 0
+
+FRAME_HEADER = struct.Struct(">BBI16s")
+
+FINAL_EVENT_TYPES = {"complete", "error", "timeout"}
+
+def negotiate(offered: List[str]) -> Optional[str]:
+    """Pick the subprotocol to accept from those the client offered, best first"""
+
+    for subprotocol in (BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL):
+        if subprotocol in offered:
+            return subprotocol
+    return None
+
+def encoder_for(subprotocol: Optional[str]) -> Union["JsonStreamEncoder", "BinaryStreamEncoder"]:
+    if subprotocol == BINARY_SUBPROTOCOL:
+        return BinaryStreamEncoder()
+    return JsonStreamEncoder()
+
+class JsonStreamEncoder:
+    """Every event as a JSON text frame; binary output is hex-encoded"""
+
+    def encode(self, event: Dict) -> str:
+        data = event.get("data")
+        if event.get("type") == "output" and isinstance(data, bytes):
+            try:
+                event = {**event, "data": data.decode('utf-8')}
+            except UnicodeDecodeError:
+                event = {**event, "data": data.hex(), "encoding": "hex"}
+        return json.dumps(event)
+
+class BinaryStreamEncoder:
+    """Output chunks as binary frames with a fixed header; other events as compact JSON"""
+
+    def __init__(self):
+        # execution id -> next sequence number
+        self.sequences: Dict[str, int] = {}
+
+    def encode(self, event: Dict) -> Union[str, bytes]:
+        execution_id = event.get("execution_id")
+        data = event.get("data")
+
+        if event.get("type") == "output" and execution_id:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            sequence = self.sequences.get(execution_id, 0)
+            self.sequences[execution_id] = sequence + 1
+            header = FRAME_HEADER.pack(
+                FRAME_OUTPUT,
+                STREAM_OUTPUT,
+                sequence & 0xFFFFFFFF,
+                uuid.UUID(execution_id).bytes
+            )
+            return header + data
+
+        event = {key: value for key, value in event.items() if key != "timestamp"}
+        if isinstance(data, bytes):
+            # Output without an execution id has no frame to go in
+            event["data"] = data.hex()
+            event["encoding"] = "hex"
+        if event.get("type") in FINAL_EVENT_TYPES and execution_id:
+            event["output_frames"] = self.sequences.pop(execution_id, 0)
+        return json.dumps(event, separators=(",", ":"))
+
+def decode_frame(frame: bytes) -> Dict:
+    """Parse a binary output frame (for clients and tests written in Python)"""
+
+    frame_type, stream, sequence, execution_id = FRAME_HEADER.unpack_from(frame)
+    return {
+        "type": "output" if frame_type == FRAME_OUTPUT else frame_type,
+        "stream": stream,
+        "sequence": sequence,
+        "execution_id": str(uuid.UUID(bytes=execution_id)),
+        "data": frame[FRAME_HEADER.size:]
+    }
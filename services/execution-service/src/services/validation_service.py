@@ -0,0 +1,417 @@
+import asyncio
+import hashlib
+import shlex
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+from .code_injector import CodeInjector, END_OF_ARCHIVE, tar_member
+from .container_manager import WARM_CONTAINER_COMMAND
+from .tracing import run_in_executor
+
+logger = get_logger(__name__)
+
+# Marks the start of each file's result in a batch check's output
+RESULT_MARKER = "@@@validate"
+
+MAX_ERROR_LENGTH = 4000
+
+# Exit status of a check that ran past its deadline (coreutils timeout)
+CHECK_TIMEOUT_STATUS = 124
+
+# Long-lived javac parser: reads file paths from a FIFO and writes "<path>.result"
+JAVA_SYNTAX_SERVER = b"""import com.sun.source.util.JavacTask;
+import javax.tools.*;
+import java.io.*;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.*;
+import java.util.List;
+
+public class SyntaxServer {
+    static JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+    static StandardJavaFileManager files = compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8);
+
+    static void check(String path) throws IOException {
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        JavacTask task = (JavacTask) compiler.getTask(
+            null, files, diagnostics, List.of("-proc:none"), null, files.getJavaFileObjects(path));
+        task.parse();
+        StringBuilder out = new StringBuilder();
+        for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+            if (d.getKind() == Diagnostic.Kind.ERROR) {
+                out.append("line ").append(d.getLineNumber()).append(": ").append(d.getMessage(null)).append('\\n');
+            }
+        }
+        Path tmp = Paths.get(path + ".tmp");
+        Files.write(tmp, out.toString().getBytes(StandardCharsets.UTF_8));
+        Files.move(tmp, Paths.get(path + ".result"), StandardCopyOption.ATOMIC_MOVE);
+    }
+
+    public static void main(String[] args) throws Exception {
+        Path warmup = Paths.get("/tmp/Warmup.java");
+        Files.write(warmup, "class Warmup { void run() { int x = 1; } }".getBytes(StandardCharsets.UTF_8));
+        check(warmup.toString());
+        while (true) {
+            try (BufferedReader in = new BufferedReader(new FileReader(args[0]))) {
+                String path;
+                while ((path = in.readLine()) != null) {
+                    try {
+                        check(path);
+                    } catch (Exception e) {
+                        Files.write(Paths.get(path + ".result"), ("error: " + e).getBytes(StandardCharsets.UTF_8));
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+JAVA_FIFO = "/tmp/syntax-server.fifo"
+
+# Per-language syntax check; "$f" is the file being checked and "$deadline" the
+# seconds a check may take
+VALIDATOR_CONFIGS = {
+    "c": {
+        "image": "gcc:latest",
+        "extension": ".c",
+        "check": 'gcc -fsyntax-only -x c "$f"',
+        "memory_limit": "64m"
+    },
+    "cpp": {
+        "image": "gcc:latest",
+        "extension": ".cpp",
+        "check": 'g++ -fsyntax-only -x c++ "$f"',
+        "memory_limit": "128m"
+    },
+    "go": {
+        "image": "golang:1.21-alpine",
+        # gofmt only parses, which takes a few milliseconds
+        "check": 'gofmt -e -l "$f" >/dev/null',
+        "extension": ".go",
+        "memory_limit": "64m"
+    },
+    "rust": {
+        "image": "rust:latest",
+        "extension": ".rs",
+        # rustfmt parses without type checking; fall back to a metadata-only build
+        "check": (
+            'if command -v rustfmt >/dev/null; then rustfmt --edition 2021 --emit stdout "$f" >/dev/null; '
+            'else rustc --edition 2021 --crate-type lib --emit=metadata -o /tmp/check.rmeta "$f"; fi'
+        ),
+        "memory_limit": "128m"
+    },
+    "java": {
+        "image": "openjdk:11-jdk-slim",
+        "extension": ".java",
+        # The JVM stays up in the container, so a check is one parse. If it has
+        # crashed, nothing reads the FIFO or writes the result, so give up in time.
+        "check": (
+            f'timeout "$deadline" sh -c \'while [ ! -p {JAVA_FIFO} ]; do sleep 0.05; done; '
+            f'echo "$1" > {JAVA_FIFO}; '
+            'while [ ! -f "$1.result" ]; do sleep 0.005; done\' _ "$f" || exit $?; '
+            'cat "$f.result"; [ ! -s "$f.result" ]'
+        ),
+        "command": [
+            "sh", "-c",
+            f"mkfifo {JAVA_FIFO} && javac -d /tmp/syntax-server /tmp/SyntaxServer.java && "
+            "exec java -Xshare:auto -XX:TieredStopAtLevel=1 -XX:+UseSerialGC -Xmx96m "
+            f"-cp /tmp/syntax-server SyntaxServer {JAVA_FIFO}"
+        ],
+        "files": {"SyntaxServer.java": JAVA_SYNTAX_SERVER},
+        "memory_limit": "192m"
+    }
+}
+
+class ValidationService:
+    """Syntax checks in long-lived, low-memory validator containers.
+
+    One container per language is started by `start()` (or on first use)
+    and kept running; until it has answered a check, snippets in that
+    language come back with `checked: False` instead of waiting for it to
+    boot. A batch of snippets is written in one archive and checked by a
+    single exec. Results are cached by (language, sha256 of the source),
+    and concurrent checks of the same source share one run.
+    """
+
+    def __init__(
+        self,
+        container_manager,
+        cache_size: int = 4096,
+        check_timeout: float = 10.0,
+        startup_timeout: float = 90.0
+    ):
+        self.container_manager = container_manager
+        self.cache_size = cache_size
+        self.check_timeout = check_timeout
+        # The first batch also waits for the validator to boot (javac, JVM warm-up)
+        self.startup_timeout = startup_timeout
+        self.code_injector = CodeInjector()
+        self._cache: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._containers: Dict[str, object] = {}
+        self._ready = set()
+        self._start_locks: Dict[str, asyncio.Lock] = {}
+        self._warm_ups: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "checks": 0,
+            "cache_hits": 0,
+            "batches": 0,
+            "total_check_time": 0.0
+        }
+
+    @staticmethod
+    def supports(language: str) -> bool:
+        return language in VALIDATOR_CONFIGS
+
+    def start(self):
+        """Boot every language's validator in the background"""
+        for language in VALIDATOR_CONFIGS:
+            self._warm_up(language)
+
+    def _warm_up(self, language: str):
+        """Start the language's validator and run a first check, unless already under way"""
+
+        task = self._warm_ups.get(language)
+        if task is None or task.done():
+            self._warm_ups[language] = asyncio.create_task(self._run_warm_up(language))
+
+    async def _run_warm_up(self, language: str):
+        try:
+            # An empty file is enough to boot the compiler (javac, JVM warm-up)
+            await self._run_checks(language, {"warmup": b""})
+        except Exception as e:
+            logger.error(f"Syntax validator for {language} failed to start: {str(e)}")
+            await self._drop_container(language)
+        else:
+            logger.info(f"Syntax validator for {language} is ready")
+
+    async def validate(self, code: str, language: str) -> Dict:
+        """Check one snippet"""
+        return (await self.validate_batch([(code, language)]))[0]
+
+    async def validate_batch(self, snippets: List[Tuple[str, str]]) -> List[Dict]:
+        """Check (code, language) pairs, returning results in the same order"""
+
+        results: List[Optional[Dict]] = [None] * len(snippets)
+        waiting: List[Tuple[int, asyncio.Future]] = []
+        pending: Dict[str, Dict[str, Tuple[bytes, asyncio.Future]]] = {}
+        loop = asyncio.get_running_loop()
+
+        for index, (code, language) in enumerate(snippets):
+            if not self.supports(language):
+                results[index] = {"valid": False, "error": f"No syntax validator for {language}"}
+                continue
+
+            if language not in self._ready:
+                # Booting can take far longer than a check; answer now rather than wait
+                self._warm_up(language)
+                results[index] = {
+                    "valid": None,
+                    "checked": False,
+                    "error": f"Syntax validator for {language} is starting"
+                }
+                continue
+
+            data = code.encode('utf-8')
+            key = (language, hashlib.sha256(data).hexdigest())
+
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                results[index] = dict(cached)
+                continue
+
+            future = self._in_flight.get(key)
+            if future is None:
+                future = loop.create_future()
+                self._in_flight[key] = future
+                pending.setdefault(language, {})[key[1]] = (data, future)
+            waiting.append((index, future))
+
+        try:
+            if pending:
+                await asyncio.gather(*(
+                    self._check_language(language, sources)
+                    for language, sources in pending.items()
+                ))
+        finally:
+            # Cancellation skips settling in _check_language; don't leave waiters on dead futures
+            for language, sources in pending.items():
+                for digest, (_, future) in sources.items():
+                    if not future.done():
+                        future.cancel()
+                    if self._in_flight.get((language, digest)) is future:
+                        del self._in_flight[(language, digest)]
+
+        for index, future in waiting:
+            try:
+                results[index] = dict(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The request that owned the check went away; run it again
+                results[index] = await self.validate(*snippets[index])
+
+        return results
+
+    async def _check_language(self, language: str, sources: Dict[str, Tuple[bytes, asyncio.Future]]):
+        """Check all pending sources of one language and settle their futures"""
+
+        try:
+            outcomes = await self._run_checks(language, {digest: data for digest, (data, _) in sources.items()})
+        except Exception as e:
+            logger.error(f"Syntax validation failed for {language}: {str(e)}")
+            # Drop the container; it is recreated on the next check
+            await self._drop_container(language)
+            outcomes = {digest: {"valid": False, "error": f"Validation failed: {str(e)}"} for digest in sources}
+            cacheable = False
+        else:
+            cacheable = True
+
+        for digest, (_, future) in sources.items():
+            key = (language, digest)
+            result = outcomes[digest]
+            if cacheable:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self._in_flight.pop(key, None)
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_checks(self, language: str, sources: Dict[str, bytes]) -> Dict[str, Dict]:
+        config = VALIDATOR_CONFIGS[language]
+        container = await self._get_container(language)
+        extension = config["extension"]
+
+        # Unique names per batch so concurrent batches don't collide
+        batch_dir = f"v{time.monotonic_ns()}"
+        names = {digest: f"{batch_dir}/c{digest[:16]}{extension}" for digest in sources}
+        archive = self.code_injector.build_archive(
+            [(names[digest], data) for digest, data in sources.items()]
+        )
+
+        timeout = self.check_timeout if language in self._ready else self.startup_timeout
+        paths = " ".join(shlex.quote(f"/app/{name}") for name in names.values())
+        # A check past its deadline means the validator is stuck; skip the rest of the batch
+        script = (
+            f"deadline={int(timeout)}; for f in {paths}; do "
+            f"out=$({config['check']} 2>&1); status=$?; "
+            f'echo "{RESULT_MARKER} $f $status"; printf "%s\\n" "$out"; '
+            f"[ $status -eq {CHECK_TIMEOUT_STATUS} ] && break; "
+            f"done; rm -rf /app/{batch_dir}"
+        )
+
+        start = time.monotonic()
+        output = await asyncio.wait_for(
+            run_in_executor(None, self._exec_batch, container, archive, script),
+            timeout=timeout
+        )
+        elapsed = time.monotonic() - start
+        self._ready.add(language)
+
+        self.stats["checks"] += len(sources)
+        self.stats["batches"] += 1
+        self.stats["total_check_time"] += elapsed
+
+        return self._parse_output(output, names)
+
+    @staticmethod
+    def _exec_batch(container, archive, script: str) -> str:
+        container.put_archive('/app', archive)
+        result = container.exec_run(["sh", "-c", script], workdir='/app')
+        return result.output.decode('utf-8', 'replace') if result.output else ""
+
+    @staticmethod
+    def _parse_output(output: str, names: Dict[str, str]) -> Dict[str, Dict]:
+        by_path = {f"/app/{name}": digest for digest, name in names.items()}
+        outcomes: Dict[str, Dict] = {}
+        current = None
+        lines: List[str] = []
+        status = 0
+
+        def finish():
+            if current is None:
+                return
+            error = "\n".join(lines).strip().replace(current, "input")
+            if status == 0:
+                outcomes[by_path[current]] = {"valid": True}
+            else:
+                outcomes[by_path[current]] = {
+                    "valid": False,
+                    "error": error[:MAX_ERROR_LENGTH] or "Syntax check failed"
+                }
+
+        for line in output.splitlines():
+            if line.startswith(RESULT_MARKER + " "):
+                finish()
+                _, path, code = line.rsplit(" ", 2)
+                current = path if path in by_path else None
+                status = int(code) if code.isdigit() else 1
+                if status == CHECK_TIMEOUT_STATUS:
+                    raise RuntimeError("Validator did not answer within its deadline")
+                lines = []
+            elif current is not None:
+                lines.append(line)
+        finish()
+
+        if len(outcomes) != len(names):
+            raise RuntimeError(f"Validator returned {len(outcomes)} of {len(names)} results")
+        return outcomes
+
+    async def _get_container(self, language: str):
+        """Get the language's validator container, starting it on first use"""
+
+        container = self._containers.get(language)
+        if container is not None:
+            return container
+
+        lock = self._start_locks.setdefault(language, asyncio.Lock())
+        async with lock:
+            container = self._containers.get(language)
+            if container is not None:
+                return container
+
+            config = VALIDATOR_CONFIGS[language]
+            container = await self.container_manager.create_service_container(
+                f"validator-{language}",
+                config["image"],
+                config.get("command", WARM_CONTAINER_COMMAND),
+                memory_limit=config["memory_limit"]
+            )
+
+            # /app is a tmpfs mounted at start, so helper files go to /tmp
+            if config.get("files"):
+                container.put_archive('/tmp', b"".join(
+                    tar_member(name, data) for name, data in config["files"].items()
+                ) + END_OF_ARCHIVE)
+
+            container.start()
+            self._containers[language] = container
+            logger.info(f"Started {language} validator container {container.id[:12]}")
+
+            return container
+
+    async def _drop_container(self, language: str):
+        self._containers.pop(language, None)
+        self._ready.discard(language)
+        await self.container_manager.remove_service_container(f"validator-{language}")
+
+    async def close(self):
+        for task in self._warm_ups.values():
+            task.cancel()
+        for language in list(self._containers):
+            await self._drop_container(language)
+
+    def get_stats(self) -> Dict:
+        checks = self.stats["checks"]
+        return {
+            **self.stats,
+            "average_check_time": self.stats["total_check_time"] / self.stats["batches"] if self.stats["batches"] else 0,
+            "cached_results": len(self._cache),
+            "validators": sorted(self._containers),
+            "cache_hit_rate": self.stats["cache_hits"] / (checks + self.stats["cache_hits"]) if checks + self.stats["cache_hits"] else 0
+        }
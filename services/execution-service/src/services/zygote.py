@@ -0,0 +1,283 @@
+from typing import Dict, List
+
+from .code_injector import CodeInjector
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Zygote files live outside /app so code and project syncs never touch them
+ZYGOTE_DIR = "/tmp/zygote"
+
+# Preloads the interpreter and common modules once, then forks a child per
+# execution. Requests arrive on a control FIFO as "<request dir> <timeout> <script>";
+# each request dir holds in/out/status FIFOs created by the client.
+PYTHON_ZYGOTE_SERVER = '''
+import atexit
+import errno
+import os
+import resource
+import runpy
+import select
+import signal
+import sys
+import threading
+import time
+import traceback
+
+PRELOAD = [
+    "abc", "bisect", "collections", "copy", "dataclasses", "datetime", "decimal",
+    "enum", "fractions", "functools", "heapq", "io", "itertools", "json", "math",
+    "operator", "random", "re", "statistics", "string", "textwrap", "typing"
+]
+
+for name in PRELOAD:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+
+ZYGOTE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTROL = os.path.join(ZYGOTE_DIR, "control")
+PID_FILE = os.path.join(ZYGOTE_DIR, "pid")
+
+def exit_code(error):
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    print(error.code, file=sys.stderr)
+    return 1
+
+def print_user_traceback(error, script):
+    # Hide the zygote and runpy frames, like a traceback from `python script`
+    tb = error.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != script:
+        tb = tb.tb_next
+    traceback.print_exception(type(error), error, tb)
+
+def run_child(request_dir, timeout, script, inherited_fds):
+    os.setsid()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    for fd in inherited_fds:
+        os.close(fd)
+
+    out = os.open(os.path.join(request_dir, "out"), os.O_WRONLY)
+    stdin = os.open(os.path.join(request_dir, "in"), os.O_RDONLY)
+    os.dup2(stdin, 0)
+    os.dup2(out, 1)
+    os.dup2(out, 2)
+    os.close(stdin)
+    os.close(out)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (timeout, timeout + 1))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    # Children would otherwise all replay the zygote's random sequence
+    if "random" in sys.modules:
+        sys.modules["random"].seed()
+
+    os.chdir(os.path.dirname(script))
+    sys.argv = [script]
+    sys.path[0] = os.path.dirname(script)
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        code = exit_code(e)
+    except BaseException as e:
+        print_user_traceback(e, script)
+        code = 1
+
+    # What interpreter shutdown would do: wait for threads, run atexit hooks
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join()
+    atexit._run_exitfuncs()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+def deliver(request_dir, status):
+    # The client holds the status FIFO open, so a missing reader means it is gone
+    try:
+        fd = os.open(os.path.join(request_dir, "status"), os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno not in (errno.ENXIO, errno.ENOENT):
+            print(f"zygote: status for {request_dir}: {e}", file=sys.stderr)
+        return
+    try:
+        os.write(fd, f"{status}\\n".encode())
+    finally:
+        os.close(fd)
+
+def main():
+    if os.path.exists(CONTROL):
+        os.remove(CONTROL)
+    os.mkfifo(CONTROL, 0o600)
+    # Holding a write end too means reads never see EOF between clients
+    control = os.open(CONTROL, os.O_RDWR)
+
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write, warn_on_full_buffer=False)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    # pid -> [request dir, deadline, timed out]
+    children = {}
+    buffer = b""
+
+    with open(PID_FILE + ".tmp", "w") as f:
+        f.write(str(os.getpid()))
+    os.rename(PID_FILE + ".tmp", PID_FILE)
+
+    while True:
+        # Reaping is driven by SIGCHLD; only timeouts need a timer
+        deadlines = [entry[1] for entry in children.values() if not entry[2]]
+        wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        readable, _, _ = select.select([control, wakeup_read], [], [], wait)
+
+        if wakeup_read in readable:
+            try:
+                while os.read(wakeup_read, 512):
+                    pass
+            except BlockingIOError:
+                pass
+
+        if control in readable:
+            buffer += os.read(control, 4096)
+            *lines, buffer = buffer.split(b"\\n")
+            for line in lines:
+                if not line:
+                    continue
+                try:
+                    request_dir, timeout, script = line.decode().split(" ", 2)
+                    timeout = int(timeout)
+                except ValueError:
+                    print(f"zygote: bad request {line!r}", file=sys.stderr)
+                    continue
+                sys.stdout.flush()
+                sys.stderr.flush()
+                try:
+                    pid = os.fork()
+                except OSError as e:
+                    print(f"zygote: fork failed: {e}", file=sys.stderr)
+                    # Release the client's reader before reporting the failure
+                    os.close(os.open(os.path.join(request_dir, "out"), os.O_WRONLY))
+                    deliver(request_dir, 1)
+                    continue
+                if pid == 0:
+                    try:
+                        run_child(request_dir, timeout, script, [control, wakeup_read, wakeup_write])
+                    finally:
+                        os._exit(1)
+                children[pid] = [request_dir, time.monotonic() + timeout, False]
+
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            request_dir, _, timed_out = children.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            deliver(request_dir, "timeout" if timed_out else (code if code >= 0 else 128 - code))
+
+        now = time.monotonic()
+        for pid, entry in children.items():
+            if not entry[2] and now >= entry[1]:
+                entry[2] = True
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+main()
+'''
+
+# Usage: run TIMEOUT SCRIPT FALLBACK...
+# Runs SCRIPT in a child forked from the zygote. If the zygote is not running,
+# restarts it in the background and runs FALLBACK (the plain run command) instead.
+ZYGOTE_CLIENT = f'''
+timeout=$1
+script=$2
+shift 2
+dir={ZYGOTE_DIR}
+
+# Warm containers don't reap orphans, so a dead zygote can linger as a zombie
+pid=$(cat $dir/pid 2>/dev/null)
+if ! {{ [ -n "$pid" ] && grep -q '^State:[[:space:]]*[RSD]' /proc/$pid/status 2>/dev/null; }}; then
+    rm -f $dir/pid
+    sh $dir/start </dev/null >/dev/null 2>&1 &
+    exec "$@"
+fi
+
+req=$(mktemp -d $dir/r.XXXXXX) || exec "$@"
+mkfifo $req/in $req/out $req/status
+# Open the status FIFO first so the zygote can always write the exit status
+exec 4<>$req/status
+exec 3<&0
+cat <&3 >$req/in &
+relay=$!
+
+echo "$req $timeout $script" >$dir/control
+cat $req/out
+read status <&4
+
+kill $relay 2>/dev/null
+rm -rf $req
+
+if [ "$status" = timeout ]; then
+    echo "Execution timed out after ${{timeout}}s" >&2
+    exit 124
+fi
+exit "$status"
+'''
+
+ZYGOTE_CONFIGS = {
+    "python": {
+        "server": PYTHON_ZYGOTE_SERVER,
+        "start": f"exec python {ZYGOTE_DIR}/server.py </dev/null >{ZYGOTE_DIR}/log 2>&1\n"
+    }
+}
+
+class ZygoteRunner:
+    """Starts fork-server zygotes in warm containers and builds the commands that run code through them"""
+
+    def __init__(self, code_injector: CodeInjector):
+        self.code_injector = code_injector
+        self.archives: Dict[str, bytes] = {}
+
+    @staticmethod
+    def supports(language: str) -> bool:
+        return language in ZYGOTE_CONFIGS
+
+    def _archive(self, language: str) -> bytes:
+        archive = self.archives.get(language)
+        if archive is None:
+            config = ZYGOTE_CONFIGS[language]
+            archive = bytes(self.code_injector.build_archive([
+                ("zygote/server.py", config["server"].encode('utf-8')),
+                ("zygote/start", config["start"].encode('utf-8')),
+                ("zygote/run", ZYGOTE_CLIENT.encode('utf-8'))
+            ]))
+            self.archives[language] = archive
+        return archive
+
+    def start(self, container, language: str) -> bool:
+        """Copy the zygote into a running container and start it in the background"""
+
+        try:
+            container.put_archive('/tmp', self._archive(language))
+            container.exec_run(["sh", f"{ZYGOTE_DIR}/start"], detach=True)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to start {language} zygote in {container.id[:12]}: {str(e)}")
+            return False
+
+    @staticmethod
+    def command(script: str, timeout: int, fallback: List[str]) -> List[str]:
+        return ["sh", f"{ZYGOTE_DIR}/run", str(timeout), script] + list(fallback)
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("docker")
+
+from benchmarks.fake_docker import DEFAULT_LATENCIES, FakeDockerClient
+from src.services.container_manager import CapacityExceeded, ContainerManager
+
+NO_LATENCY = {operation: 0 for operation in DEFAULT_LATENCIES}
+
+def run_with_manager(scenario, latencies=None, **options):
+    """Run scenario(manager, client) against a ContainerManager on a fake Docker host"""
+
+    async def main():
+        client = FakeDockerClient(latencies={**NO_LATENCY, **(latencies or {})})
+        manager = ContainerManager(client, **options)
+        try:
+            await scenario(manager, client)
+        finally:
+            manager.stop_event_watchers()
+
+    asyncio.run(main())
+
+def test_release_of_idle_warm_container_removes_it():
+    async def scenario(manager, client):
+        info = await manager.reserve_warm_container("s1", "python", "python:3.11-slim")
+        await manager.release_warm_container("s1")
+        assert "s1" not in manager.warm_containers
+        assert info["container"].id not in client._containers
+
+    run_with_manager(scenario)
+
+def test_release_of_in_use_warm_container_waits_for_return():
+    async def scenario(manager, client):
+        await manager.reserve_warm_container("s1", "python", "python:3.11-slim")
+        info = manager.claim_warm_container("s1", "python", "128m")
+        
+        await manager.release_warm_container("s1")
+        assert manager.warm_containers["s1"] is info
+        assert info["container"].id in client._containers
+        # Nothing else may claim it in the meantime
+        assert manager.claim_warm_container("s1", "python", "128m") is None
+        
+        await manager.return_warm_container("s1")
+        assert "s1" not in manager.warm_containers
+        assert info["container"].id not in client._containers
+
+    run_with_manager(scenario)
+
+def test_session_cleanup_keeps_in_use_warm_container_until_returned():
+    async def scenario(manager, client):
+        await manager.reserve_warm_container("s1", "python", "python:3.11-slim")
+        info = manager.claim_warm_container("s1", "python", "128m")
+        
+        await manager.cleanup_session_containers("s1")
+        assert info["container"].id in client._containers
+        
+        await manager.return_warm_container("s1")
+        assert info["container"].id not in client._containers
+
+    run_with_manager(scenario)
+
+def test_reserving_again_cancels_pending_release():
+    async def scenario(manager, client):
+        await manager.reserve_warm_container("s1", "python", "python:3.11-slim")
+        info = manager.claim_warm_container("s1", "python", "128m")
+        await manager.release_warm_container("s1")
+        
+        assert await manager.reserve_warm_container("s1", "python", "python:3.11-slim") is info
+        await manager.return_warm_container("s1")
+        assert manager.warm_containers["s1"] is info
+
+    run_with_manager(scenario)
+
+def test_forced_release_removes_in_use_warm_container():
+    async def scenario(manager, client):
+        info = await manager.reserve_warm_container("s1", "python", "python:3.11-slim")
+        manager.claim_warm_container("s1", "python", "128m")
+        
+        await manager.cleanup_all_containers()
+        assert "s1" not in manager.warm_containers
+        assert info["container"].id not in client._containers
+
+    run_with_manager(scenario)
+
+def test_concurrent_reservations_stay_within_capacity():
+    async def scenario(manager, client):
+        results = await asyncio.gather(*(
+            manager.reserve_warm_container(f"s{index}", "python", "python:3.11-slim")
+            for index in range(3)
+        ), return_exceptions=True)
+        
+        assert sum(isinstance(result, CapacityExceeded) for result in results) == 1
+        assert len(manager.warm_containers) == 2
+        assert len(client._containers) == 2
+
+    # Creation takes long enough for all three reservations to overlap
+    run_with_manager(scenario, latencies={"create": 0.05}, max_containers=2)
+
+def test_background_tasks_are_kept_until_done():
+    async def scenario(manager, client):
+        async def fail():
+            raise RuntimeError("boom")
+
+        task = manager._run_in_background(fail(), "test task")
+        assert task in manager._background_tasks
+        await asyncio.wait([task])
+        await asyncio.sleep(0)
+        assert task not in manager._background_tasks
+
+    run_with_manager(scenario)
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("docker")
+
+from docker.errors import APIError
+
+from benchmarks.fake_docker import DEFAULT_LATENCIES, FakeDockerClient
+from src.services.docker_hosts import DockerHost, DockerHostPool, ImageUnavailable, NoHealthyHost
+
+NO_LATENCY = {operation: 0 for operation in DEFAULT_LATENCIES}
+IMAGE = "python:3.11-slim"
+
+def make_pool(*clients, failure_threshold=3):
+    hosts = [DockerHost(f"host-{index}", client) for index, client in enumerate(clients)]
+    return DockerHostPool(hosts, failure_threshold=failure_threshold), hosts
+
+def api_error(status_code):
+    return APIError(f"status {status_code}", response=SimpleNamespace(status_code=status_code))
+
+def test_create_fails_over_when_a_host_errors():
+    down, up = FakeDockerClient(latencies=NO_LATENCY), FakeDockerClient(latencies=NO_LATENCY)
+    down.errors["create"] = api_error(500)
+    pool, (first, second) = make_pool(down, up, failure_threshold=1)
+    first.images.add(IMAGE)
+
+    container = pool.create_container({"image": IMAGE})
+
+    assert pool.host_for(container) is second
+    assert not first.healthy and first.failures == 1
+    assert second.healthy and second.failures == 0
+
+def test_create_raises_when_every_host_errors():
+    clients = [FakeDockerClient(latencies=NO_LATENCY) for _ in range(2)]
+    for client in clients:
+        client.errors["create"] = api_error(503)
+    pool, hosts = make_pool(*clients)
+
+    with pytest.raises(NoHealthyHost):
+        pool.create_container({"image": IMAGE})
+    assert all(host.failures == 1 and host.healthy for host in hosts)
+
+def test_rejected_request_is_not_a_host_failure():
+    client = FakeDockerClient(latencies=NO_LATENCY)
+    client.errors["create"] = api_error(400)
+    pool, (host,) = make_pool(client, failure_threshold=1)
+
+    with pytest.raises(APIError):
+        pool.create_container({"image": IMAGE})
+    assert host.healthy and host.failures == 0
+
+def test_unpullable_image_moves_on_without_marking_host_down():
+    without_image = FakeDockerClient(latencies=NO_LATENCY, missing_images=[IMAGE])
+    pool, (first, second) = make_pool(without_image, FakeDockerClient(latencies=NO_LATENCY), failure_threshold=1)
+    # Least loaded first, so the host without the image is tried first
+    second.containers["existing"] = ("other", False)
+
+    container = pool.create_container({"image": IMAGE})
+
+    assert pool.host_for(container) is second
+    assert first.healthy and first.failures == 0
+    assert IMAGE not in first.images and IMAGE in second.images
+
+def test_image_missing_on_every_host_raises_image_unavailable():
+    clients = [FakeDockerClient(latencies=NO_LATENCY, missing_images=[IMAGE]) for _ in range(2)]
+    pool, hosts = make_pool(*clients)
+
+    with pytest.raises(ImageUnavailable):
+        pool.create_container({"image": IMAGE})
+    assert all(host.healthy and host.failures == 0 for host in hosts)
+
+def test_placement_prefers_host_with_image():
+    pool, (first, second) = make_pool(FakeDockerClient(latencies=NO_LATENCY), FakeDockerClient(latencies=NO_LATENCY))
+    second.images.add(IMAGE)
+    second.containers["existing"] = ("other", False)
+
+    container = pool.create_container({"image": IMAGE})
+
+    assert pool.host_for(container) is second
+    assert first.client.call_counts.get("image", 0) == 0
+
+def test_built_image_is_placed_only_where_it_was_built():
+    pool, (first, second) = make_pool(FakeDockerClient(latencies=NO_LATENCY), FakeDockerClient(latencies=NO_LATENCY))
+    pool.register_built_image("jvm-prepared", lambda host: None)
+
+    with pytest.raises(ImageUnavailable):
+        pool.create_container({"image": "jvm-prepared"})
+
+    assert pool.build_image("jvm-prepared", [second]) == 1
+    container = pool.create_container({"image": "jvm-prepared"})
+    assert pool.host_for(container) is second
+    # Built images are never pulled
+    assert second.client.call_counts.get("image", 0) == 0
+
+def test_host_that_comes_back_forgets_images_until_prepared():
+    client = FakeDockerClient(latencies=NO_LATENCY)
+    pool, (host,) = make_pool(client)
+    pool.register_built_image("jvm-prepared", lambda host: None)
+    pool.build_image("jvm-prepared")
+
+    client.errors["ping"] = api_error(500)
+    assert pool.check(host) is True
+    assert not host.healthy and not pool.has_capacity()
+
+    del client.errors["ping"]
+    assert pool.check(host) is False
+    assert host.healthy and "jvm-prepared" not in host.images
+
+    pool.prepare_host(host)
+    assert "jvm-prepared" in host.images
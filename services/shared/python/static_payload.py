@@ -0,0 +1,52 @@
+import hashlib
+import json
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import Request, Response
+
+class CachedJSONPayload:
+    """Pre-serialized JSON response with a strong ETag.
+
+    The body is built from the source data on first use and kept until
+    `invalidate()` is called, so the owner must invalidate it whenever the
+    source changes. Responses default to `private, no-cache`: shared caches
+    don't store them, and clients revalidate with the ETag (a 304) rather
+    than reuse a stale copy.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[Any], Dict[str, Any]],
+        cache_control: str = "private, no-cache"
+    ):
+        self.build = build
+        self.cache_control = cache_control
+        self._body: bytes = b""
+        self._etag: str = ""
+
+    def invalidate(self):
+        """Rebuild the body from the source on the next request"""
+        self._body = b""
+        self._etag = ""
+
+    def get(self, source: Any) -> Tuple[bytes, str]:
+        """Get the serialized body and ETag, building them from `source` if invalidated"""
+
+        if not self._body:
+            self._body = json.dumps(self.build(source), separators=(",", ":")).encode("utf-8")
+            self._etag = '"' + hashlib.sha256(self._body).hexdigest()[:32] + '"'
+        return self._body, self._etag
+
+    def response(self, request: Request, source: Any) -> Response:
+        """Build a 200 response, or a 304 when the client already has this version"""
+
+        body, etag = self.get(source)
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if etag in candidates or "*" in candidates:
+                return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
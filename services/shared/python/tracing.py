@@ -0,0 +1,373 @@
+import asyncio
+import collections
+import contextvars
+import functools
+import hmac
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Trace context travels in the W3C "traceparent" header:
+# 00-<32 hex trace id>-<16 hex parent span id>-<2 hex flags, 01 = sampled>
+TRACEPARENT_HEADER = "traceparent"
+# Set to "1" on a request to trace it whatever the sample rate
+FORCE_SAMPLE_HEADER = "x-trace-sample"
+TRACE_ID_HEADER = "x-trace-id"
+# Carries TRACE_TRUST_TOKEN; only callers that send it decide sampling for us
+TRACE_TOKEN_HEADER = "x-trace-token"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a traceparent header, or None if malformed"""
+
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    """One timed operation; only sampled traces create these"""
+
+    __slots__ = (
+        "trace", "name", "span_id", "parent_id", "start_time", "_start",
+        "duration", "attributes", "status"
+    )
+
+    def __init__(self, trace: "TraceRecord", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.trace.service,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+class TraceRecord:
+    """The spans of one trace recorded in this process, exported when its local root ends"""
+
+    __slots__ = ("trace_id", "service", "spans")
+
+    def __init__(self, trace_id: str, service: str):
+        self.trace_id = trace_id
+        self.service = service
+        self.spans: List[Span] = []
+
+class SpanExporter:
+    """Receives the finished spans of each sampled trace"""
+
+    def export(self, spans: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the most recent spans for the traces endpoint"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: Deque[Dict[str, Any]] = collections.deque(maxlen=max_spans)
+
+    def export(self, spans: List[Dict[str, Any]]):
+        self.spans.extend(spans)
+
+    def find(self, trace_id: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        spans = [span for span in list(self.spans) if trace_id is None or span["trace_id"] == trace_id]
+        return spans[-limit:]
+
+class FileExporter(InMemoryExporter):
+    """Appends spans as JSON lines to a file, and keeps recent ones in memory too"""
+
+    def __init__(self, path: str, max_spans: int = 10000):
+        super().__init__(max_spans)
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, spans: List[Dict[str, Any]]):
+        super().export(spans)
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with self._lock:
+            self._file.write(lines)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class Tracer:
+    """Head-sampled tracing with W3C trace context propagation.
+
+    A request joins its caller's trace when it carries a traceparent header.
+    Trusted callers, those presenting `trust_token`, also pass on their
+    sampling decision and may force sampling with the force header; every
+    other request is sampled with `sample_rate`. Unsampled requests create
+    no spans, so `span()` costs one context variable lookup.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        sample_rate: float = 0.01,
+        exporter: Optional[SpanExporter] = None,
+        trust_token: Optional[str] = None
+    ):
+        self.service = service
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.trust_token = trust_token
+        self.stats = {"traces_sampled": 0, "traces_skipped": 0, "spans": 0}
+
+    @classmethod
+    def from_env(cls, service: str) -> "Tracer":
+        """TRACE_SAMPLE_RATE (0-1), TRACE_EXPORTER (memory, file or none), TRACE_FILE and TRACE_TRUST_TOKEN"""
+
+        kind = os.getenv("TRACE_EXPORTER", "memory").lower()
+        exporter: Optional[SpanExporter] = None
+        if kind == "file":
+            exporter = FileExporter(os.getenv("TRACE_FILE", f"/tmp/traces/{service}.jsonl"))
+        elif kind == "memory":
+            exporter = InMemoryExporter()
+        return cls(
+            service,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")) if exporter else 0.0,
+            exporter=exporter,
+            trust_token=os.getenv("TRACE_TRUST_TOKEN") or None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def is_trusted(self, token: Optional[str]) -> bool:
+        """Whether a caller presented the trust token"""
+        return bool(self.trust_token and token) and hmac.compare_digest(token, self.trust_token)
+
+    @contextmanager
+    def start_trace(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        force: bool = False,
+        trusted: bool = False,
+        **attributes
+    ) -> Iterator[Optional[Span]]:
+        """Local root span of a request, continuing the caller's trace if there is one"""
+
+        parent = parse_traceparent(traceparent)
+        if not self.enabled:
+            sampled = False
+        elif not trusted:
+            # Anyone could ask for every request to be traced
+            sampled = random.random() < self.sample_rate
+        elif parent is not None:
+            sampled = parent[2] or force
+        else:
+            sampled = force or random.random() < self.sample_rate
+
+        if not sampled:
+            self.stats["traces_skipped"] += 1
+            token = _current_span.set(None)
+            try:
+                yield None
+            finally:
+                _current_span.reset(token)
+            return
+
+        self.stats["traces_sampled"] += 1
+        trace = TraceRecord(parent[0] if parent else _new_id(128), self.service)
+        try:
+            with self._record(trace, name, parent[1] if parent else None, attributes) as span:
+                yield span
+        finally:
+            self._export(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Child of the current span; does nothing outside a sampled trace"""
+
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        with self._record(parent.trace, name, parent.span_id, attributes) as span:
+            yield span
+
+    @contextmanager
+    def _record(self, trace: TraceRecord, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        span = Span(trace, name, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes.setdefault("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._start
+            _current_span.reset(token)
+            trace.spans.append(span)
+
+    def _export(self, trace: TraceRecord):
+        self.stats["spans"] += len(trace.spans)
+        try:
+            self.exporter.export([span.to_dict() for span in trace.spans])
+        except Exception as e:
+            logger.warning(f"Failed to export trace {trace.trace_id}: {str(e)}")
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def annotate(self, **attributes):
+        """Add attributes to the current span, if the request is sampled"""
+
+        span = _current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def inject(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Headers that carry the current trace context to another service"""
+
+        headers = dict(headers or {})
+        span = _current_span.get()
+        if span is not None:
+            headers[TRACEPARENT_HEADER] = span.traceparent()
+            if self.trust_token:
+                headers[TRACE_TOKEN_HEADER] = self.trust_token
+        return headers
+
+    def find(self, trace_id: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        if isinstance(self.exporter, InMemoryExporter):
+            return self.exporter.find(trace_id, limit)
+        return []
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "sample_rate": self.sample_rate,
+            "exporter": type(self.exporter).__name__ if self.exporter else None
+        }
+
+class TracingMiddleware:
+    """Starts a trace for each HTTP request and returns its id in X-Trace-Id when sampled"""
+
+    def __init__(self, app, tracer: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracer = self.tracer or get_tracer()
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+
+        with tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent=headers.get(TRACEPARENT_HEADER),
+            force=headers.get(FORCE_SAMPLE_HEADER) == "1",
+            trusted=tracer.is_trusted(headers.get(TRACE_TOKEN_HEADER))
+        ) as span:
+            if span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    span.set(status_code=message["status"])
+                    message = {
+                        **message,
+                        "headers": list(message.get("headers", [])) + [
+                            (TRACE_ID_HEADER.encode("latin-1"), span.trace_id.encode("latin-1"))
+                        ]
+                    }
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+
+def traced(name: str, **attributes):
+    """Run a coroutine function inside a span of the process-wide tracer"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with get_tracer().span(name, **attributes):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def run_in_executor(executor, func, *args):
+    """loop.run_in_executor in a copy of the current context, so spans in the thread join the trace"""
+    return asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(contextvars.copy_context().run, func, *args)
+    )
+
+_tracer: Optional[Tracer] = None
+
+def configure_tracer(service: str) -> Tracer:
+    """Create the process-wide tracer from the environment"""
+
+    global _tracer
+    _tracer = Tracer.from_env(service)
+    return _tracer
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer; tracing is off until configure_tracer is called"""
+
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer("unknown", sample_rate=0.0)
+    return _tracer
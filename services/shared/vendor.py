@@ -0,0 +1,67 @@
+"""Copy the shared Python modules into the services that use them.
+
+Each Python service is built from its own directory (see docker-compose.yml
+and start-dev.sh), so modules they share live once in services/shared/python
+and are vendored into each service's src/services package. Edit the shared
+copy, then run this script; the vendored files are overwritten.
+
+Usage (from the repository root):
+
+    python services/shared/vendor.py          # update the vendored copies
+    python services/shared/vendor.py --check  # exit 1 if any copy is stale
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python")
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared module -> services that vendor it
+VENDORED: Dict[str, List[str]] = {
+    "static_payload.py": ["ai-service", "execution-service"],
+    "tracing.py": ["ai-service", "execution-service"],
+}
+
+HEADER = "# Vendored from services/shared/python/{module} by services/shared/vendor.py; edit that copy.\n"
+
+def vendored_source(module: str) -> str:
+    with open(os.path.join(SHARED_DIR, module)) as f:
+        return HEADER.format(module=module) + f.read()
+
+def vendor(check: bool = False) -> List[str]:
+    """Write (or with check, compare) every vendored copy; returns the stale paths"""
+
+    stale = []
+    for module, services in VENDORED.items():
+        source = vendored_source(module)
+        for service in services:
+            path = os.path.join(SERVICES_DIR, service, "src", "services", module)
+            try:
+                with open(path) as f:
+                    current = f.read()
+            except FileNotFoundError:
+                current = None
+            if current == source:
+                continue
+            stale.append(path)
+            if not check:
+                with open(path, "w") as f:
+                    f.write(source)
+    return stale
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Only report stale copies")
+    args = parser.parse_args()
+
+    stale = vendor(check=args.check)
+    for path in stale:
+        print(f"{'stale' if args.check else 'updated'}: {os.path.relpath(path)}", file=sys.stderr)
+    if args.check and stale:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -38,8 +38,12 @@ npm install
 npm run dev &
 TERMINAL_PID=$!
 
+# Shared Python modules are vendored into the Python services
+cd ..
+python shared/vendor.py
+
 # AI Service
-cd ../ai-service
+cd ai-service
 pip install -r requirements.txt
 python -m uvicorn src.main:app --reload --host 0.0.0.0 --port 8001 &
 AI_PID=$!